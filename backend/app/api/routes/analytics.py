@@ -0,0 +1,193 @@
+from datetime import datetime, timedelta, timezone
+from typing import Literal, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.database import get_db
+from app.db.models import LLMLogRollup, StageTimingRollup
+from app.services.user_cache import UserPrincipal
+from app.models.schemas import (
+    StageLatencyReport, StageLatencyStats, LLMUsageReport, LLMUsageBucket, StageLatencySeries, StageLatencyBucket
+)
+from app.utils.auth import get_current_admin
+
+router = APIRouter()
+
+Granularity = Literal["minute", "hour"]
+
+# Percentiles per stage, overall and per LLM provider, computed in Postgres
+STAGE_LATENCY_SQL = text("""
+    SELECT
+        s.key AS stage,
+        c.llm_provider AS provider,
+        GROUPING(c.llm_provider) AS all_providers,
+        count(*) AS samples,
+        percentile_cont(0.50) WITHIN GROUP (ORDER BY s.value::float) AS p50_ms,
+        percentile_cont(0.95) WITHIN GROUP (ORDER BY s.value::float) AS p95_ms,
+        percentile_cont(0.99) WITHIN GROUP (ORDER BY s.value::float) AS p99_ms
+    FROM conversations c
+    CROSS JOIN LATERAL json_each_text(c.stage_timings) AS s(key, value)
+    WHERE c.stage_timings IS NOT NULL
+      AND c.created_at >= :since
+      AND c.created_at < :until
+    GROUP BY GROUPING SETS ((s.key), (s.key, c.llm_provider))
+    ORDER BY stage, all_providers DESC, provider
+""")
+
+
+def _window(since: Optional[datetime], until: Optional[datetime], hours: int) -> Tuple[datetime, datetime]:
+    """Resolve a report window, defaulting to the last `hours` hours; times without an offset are UTC"""
+    if since is not None and since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    if until is not None and until.tzinfo is None:
+        until = until.replace(tzinfo=timezone.utc)
+
+    until = until or datetime.now(timezone.utc)
+    since = since or until - timedelta(hours=hours)
+
+    if since >= until:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="since must be before until"
+        )
+
+    return since, until
+
+
+@router.get("/stage-latency", response_model=StageLatencyReport)
+async def get_stage_latency(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    hours: int = 24,
+    current_user: UserPrincipal = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Latency percentiles (p50/p95/p99) per pipeline stage and per LLM provider
+
+    - Window defaults to the last `hours` hours
+    - Stages: stt, emergency, symptoms, retrieval, db, llm, tts, first_text,
+      first_audio, audio_store and total, as recorded on each conversation
+    """
+
+    since, until = _window(since, until, hours)
+
+    result = await db.execute(STAGE_LATENCY_SQL, {"since": since, "until": until})
+    rows = result.mappings().all()
+
+    return StageLatencyReport(
+        since=since,
+        until=until,
+        stages=[
+            StageLatencyStats(
+                stage=row["stage"],
+                provider=None if row["all_providers"] else row["provider"],
+                samples=row["samples"],
+                p50_ms=row["p50_ms"],
+                p95_ms=row["p95_ms"],
+                p99_ms=row["p99_ms"]
+            )
+            for row in rows
+        ]
+    )
+
+
+@router.get("/llm-usage", response_model=LLMUsageReport)
+async def get_llm_usage(
+    granularity: Granularity = "hour",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    hours: int = 24,
+    current_user: UserPrincipal = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    LLM calls, errors, latency percentiles and tokens per provider and model
+
+    Reads only the per-minute/per-hour rollups, never llm_logs, so the cost
+    does not grow with traffic. Buckets lag by up to ROLLUP_INTERVAL_SECONDS.
+    """
+
+    since, until = _window(since, until, hours)
+
+    result = await db.execute(
+        select(LLMLogRollup)
+        .where(
+            LLMLogRollup.granularity == granularity,
+            LLMLogRollup.bucket_start >= since,
+            LLMLogRollup.bucket_start < until
+        )
+        .order_by(LLMLogRollup.bucket_start, LLMLogRollup.provider, LLMLogRollup.model)
+    )
+
+    return LLMUsageReport(
+        since=since,
+        until=until,
+        granularity=granularity,
+        buckets=[
+            LLMUsageBucket(
+                bucket_start=row.bucket_start,
+                provider=row.provider,
+                model=row.model,
+                calls=row.calls,
+                errors=row.errors,
+                avg_ms=row.total_ms / row.calls if row.calls else 0.0,
+                max_ms=row.max_ms,
+                p50_ms=row.p50_ms,
+                p95_ms=row.p95_ms,
+                p99_ms=row.p99_ms,
+                prompt_tokens=row.prompt_tokens,
+                completion_tokens=row.completion_tokens,
+                total_tokens=row.total_tokens
+            )
+            for row in result.scalars()
+        ]
+    )
+
+
+@router.get("/stage-latency/series", response_model=StageLatencySeries)
+async def get_stage_latency_series(
+    granularity: Granularity = "hour",
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    hours: int = 24,
+    current_user: UserPrincipal = Depends(get_current_admin),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Stage latency percentiles per minute or hour, from the rollups only
+
+    Same stages and provider breakdown as /stage-latency, as a time series.
+    """
+
+    since, until = _window(since, until, hours)
+
+    result = await db.execute(
+        select(StageTimingRollup)
+        .where(
+            StageTimingRollup.granularity == granularity,
+            StageTimingRollup.bucket_start >= since,
+            StageTimingRollup.bucket_start < until
+        )
+        .order_by(StageTimingRollup.bucket_start, StageTimingRollup.stage, StageTimingRollup.provider)
+    )
+
+    return StageLatencySeries(
+        since=since,
+        until=until,
+        granularity=granularity,
+        buckets=[
+            StageLatencyBucket(
+                bucket_start=row.bucket_start,
+                stage=row.stage,
+                provider=row.provider or None,
+                samples=row.samples,
+                max_ms=row.max_ms,
+                p50_ms=row.p50_ms,
+                p95_ms=row.p95_ms,
+                p99_ms=row.p99_ms
+            )
+            for row in result.scalars()
+        ]
+    )
@@ -1,14 +1,16 @@
-import httpx
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 from loguru import logger
 
 from app.db.database import get_db
-from app.db.models import User, Appointment
+from app.db.models import Appointment
+from app.services.outbox_service import appointment_booked, outbox_dispatcher
+from app.services.user_cache import UserPrincipal
 from app.models.schemas import AppointmentCreate, AppointmentResponse
 from app.utils.auth import get_current_user
-from app.config import settings
+from app.utils.pagination import keyset_page, finish_page
 
 router = APIRouter()
 
@@ -16,15 +18,16 @@ router = APIRouter()
 @router.post("/book", response_model=AppointmentResponse, status_code=status.HTTP_201_CREATED)
 async def book_appointment(
     appointment_data: AppointmentCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Book an appointment
 
-    - Collects appointment details
-    - Sends data to n8n webhook for processing
-    - Stores appointment in database
+    - Stores the appointment and queues it for the n8n workflow in one
+      transaction
+    - Returns without waiting for n8n; the outbox dispatcher delivers it in
+      the background (with retries) and records the result on the appointment
     """
 
     try:
@@ -36,42 +39,18 @@ async def book_appointment(
             preferred_date=appointment_data.preferred_date,
             preferred_time=appointment_data.preferred_time,
             reason=appointment_data.reason,
-            status="pending"
+            status="pending",
+            n8n_response={"status": "queued", "attempts": 0}
         )
 
         db.add(appointment)
-        db.commit()
-        db.refresh(appointment)
-
-        # Send to n8n webhook
-        try:
-            async with httpx.AsyncClient() as client:
-                n8n_payload = {
-                    "appointment_id": appointment.id,
-                    "user_email": current_user.email,
-                    "full_name": appointment_data.full_name,
-                    "phone": appointment_data.phone,
-                    "preferred_date": appointment_data.preferred_date,
-                    "preferred_time": appointment_data.preferred_time,
-                    "reason": appointment_data.reason
-                }
-
-                response = await client.post(
-                    settings.N8N_WEBHOOK_URL,
-                    json=n8n_payload,
-                    headers={"Authorization": f"Bearer {settings.N8N_API_KEY}"} if settings.N8N_API_KEY else {},
-                    timeout=10.0
-                )
-
-                # Save n8n response
-                appointment.n8n_response = response.json() if response.status_code == 200 else None
-                db.commit()
-
-                logger.info(f"Appointment sent to n8n: {appointment.id}")
-
-        except Exception as e:
-            logger.error(f"n8n webhook error: {str(e)}")
-            # Continue even if n8n fails - appointment is saved
+        await db.flush()
+        db.add(appointment_booked(appointment, current_user.email))
+        await db.commit()
+        await db.refresh(appointment)
+
+        outbox_dispatcher.notify()
+        logger.info(f"Appointment {appointment.id} booked and queued for n8n")
 
         return appointment
 
@@ -85,30 +64,40 @@ async def book_appointment(
 
 @router.get("/my-appointments", response_model=List[AppointmentResponse])
 async def get_my_appointments(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    limit: int = Query(50, ge=1),
+    cursor: Optional[str] = None,
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Get current user's appointments"""
+    """
+    Get current user's appointments, newest first
 
-    appointments = db.query(Appointment).filter(
-        Appointment.user_id == current_user.id
-    ).order_by(Appointment.created_at.desc()).all()
+    At most PAGE_SIZE_MAX per page; the X-Next-Cursor response header holds the
+    cursor for the next page, if any.
+    """
 
-    return appointments
+    query = select(Appointment).where(Appointment.user_id == current_user.id)
+    result = await db.execute(keyset_page(query, Appointment, cursor, limit))
+
+    return finish_page(result.scalars().all(), limit, response)
 
 
 @router.get("/{appointment_id}", response_model=AppointmentResponse)
 async def get_appointment(
     appointment_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Get specific appointment"""
 
-    appointment = db.query(Appointment).filter(
-        Appointment.id == appointment_id,
-        Appointment.user_id == current_user.id
-    ).first()
+    result = await db.execute(
+        select(Appointment).where(
+            Appointment.id == appointment_id,
+            Appointment.user_id == current_user.id
+        )
+    )
+    appointment = result.scalar_one_or_none()
 
     if not appointment:
         raise HTTPException(
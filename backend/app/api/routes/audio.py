@@ -0,0 +1,194 @@
+import re
+import asyncio
+from typing import Dict, Optional, Tuple
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import Response, StreamingResponse
+from loguru import logger
+
+from app.config import settings
+from app.services.audio_storage import audio_storage
+from app.services.tts_service import tts_service
+
+router = APIRouter()
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# One lock per audio id so concurrent first fetches synthesize only once
+_synthesis_locks: Dict[str, asyncio.Lock] = {}
+
+
+async def store_audio(audio_content: bytes) -> Optional[str]:
+    """Store synthesized audio and return its URL"""
+    audio_id = audio_storage.new_audio_id()
+
+    try:
+        await run_in_threadpool(audio_storage.save_audio, audio_id, audio_content)
+    except Exception as e:
+        logger.error(f"Failed to store response audio: {str(e)}")
+        return None
+
+    return audio_storage.url_for(audio_id)
+
+
+async def prepare_response_audio(text: str, generate_audio: bool = True) -> Optional[str]:
+    """
+    Store audio for a response and return its URL
+
+    Args:
+        text: Response text to speak
+        generate_audio: Synthesize now; if False, synthesis is deferred until
+            the URL is first fetched
+
+    Returns:
+        Audio URL or None if audio could not be prepared
+    """
+    if generate_audio:
+        audio_content = await tts_service.synthesize_audio(text)
+        if not audio_content:
+            return None
+        return await store_audio(audio_content)
+
+    audio_id = audio_storage.new_audio_id()
+
+    try:
+        await run_in_threadpool(audio_storage.save_pending_text, audio_id, text)
+    except Exception as e:
+        logger.error(f"Failed to store deferred audio text: {str(e)}")
+        return None
+
+    return audio_storage.url_for(audio_id)
+
+
+async def _ensure_audio(audio_id: str) -> Optional[int]:
+    """Return the stored audio size, synthesizing deferred audio on first fetch"""
+    size = await run_in_threadpool(audio_storage.audio_size, audio_id)
+    if size is not None:
+        return size
+
+    lock = _synthesis_locks.setdefault(audio_id, asyncio.Lock())
+    try:
+        async with lock:
+            # Another request may have synthesized it while we waited
+            size = await run_in_threadpool(audio_storage.audio_size, audio_id)
+            if size is not None:
+                return size
+
+            text = await run_in_threadpool(audio_storage.load_pending_text, audio_id)
+            if text is None:
+                return None
+
+            logger.info(f"Synthesizing deferred audio {audio_id}")
+            audio_content = await tts_service.synthesize_audio(text)
+            if not audio_content:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Audio synthesis failed"
+                )
+
+            await run_in_threadpool(audio_storage.save_audio, audio_id, audio_content)
+            await run_in_threadpool(audio_storage.discard_pending_text, audio_id)
+            return len(audio_content)
+    finally:
+        if not lock.locked():
+            _synthesis_locks.pop(audio_id, None)
+
+
+def _parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single-range "bytes=" header
+
+    Returns:
+        (start, end) inclusive, or None to serve the full body
+
+    Raises a 416 only for ranges that are valid but unsatisfiable (starting
+    at or past the end, or an empty suffix); invalid ones are ignored.
+    """
+    match = _RANGE_PATTERN.match(range_header.strip())
+    if not match:
+        # Multi-range and unknown units are ignored (full response is allowed)
+        return None
+
+    start_str, end_str = match.groups()
+
+    if not start_str and not end_str:
+        return None
+
+    if not start_str:
+        # Suffix range: last N bytes
+        length = int(end_str)
+        if length == 0:
+            raise HTTPException(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers={"Content-Range": f"bytes */{size}"}
+            )
+        return max(size - length, 0), size - 1
+
+    start = int(start_str)
+    if end_str and int(end_str) < start:
+        # Invalid, not unsatisfiable: RFC 9110 says to ignore the header
+        return None
+
+    end = int(end_str) if end_str else size - 1
+
+    if start >= size:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+
+    return start, min(end, size - 1)
+
+
+@router.api_route("/{audio_id}.mp3", methods=["GET", "HEAD"])
+async def get_audio(audio_id: str, request: Request):
+    """
+    Stream synthesized audio
+
+    - Supports HTTP Range requests for seeking
+    - Audio is immutable, so it is served with a long-lived ETag and Cache-Control
+    - Deferred (lazy) audio is synthesized on first fetch
+    """
+
+    if not audio_storage.is_valid_audio_id(audio_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Audio not found")
+
+    size = await _ensure_audio(audio_id)
+    if size is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Audio not found")
+
+    etag = f'"{audio_id}"'
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Cache-Control": f"private, max-age={settings.AUDIO_CACHE_MAX_AGE}, immutable",
+    }
+
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range == etag):
+        byte_range = _parse_range(range_header, size)
+
+    if byte_range:
+        start, end = byte_range
+        status_code = status.HTTP_206_PARTIAL_CONTENT
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    else:
+        start, end = 0, size - 1
+        status_code = status.HTTP_200_OK
+
+    headers["Content-Length"] = str(end - start + 1)
+
+    if request.method == "HEAD":
+        return Response(status_code=status_code, headers=headers, media_type="audio/mpeg")
+
+    return StreamingResponse(
+        audio_storage.iter_audio(audio_id, start, end),
+        status_code=status_code,
+        headers=headers,
+        media_type="audio/mpeg"
+    )
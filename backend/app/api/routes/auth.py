@@ -1,25 +1,29 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from loguru import logger
 
 from app.db.database import get_db
 from app.db.models import User
 from app.models.schemas import UserCreate, UserLogin, UserResponse, Token
 from app.utils.auth import (
-    verify_password,
-    get_password_hash,
-    create_access_token,
+    hash_password,
+    verify_and_update_password,
+    create_user_token,
     get_current_user
 )
+from app.services.user_cache import UserPrincipal
 
 router = APIRouter()
 
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-async def register(user_data: UserCreate, db: Session = Depends(get_db)):
+async def register(user_data: UserCreate, db: AsyncSession = Depends(get_db)):
     """Register a new user"""
 
     # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    result = await db.execute(select(User).where(User.email == user_data.email))
+    existing_user = result.scalar_one_or_none()
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -27,7 +31,7 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
         )
 
     # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await hash_password(user_data.password)
     new_user = User(
         email=user_data.email,
         hashed_password=hashed_password,
@@ -36,20 +40,26 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
     )
 
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
 
     return new_user
 
 
 @router.post("/login", response_model=Token)
-async def login(credentials: UserLogin, db: Session = Depends(get_db)):
+async def login(credentials: UserLogin, db: AsyncSession = Depends(get_db)):
     """Login and get access token"""
 
     # Find user
-    user = db.query(User).filter(User.email == credentials.email).first()
+    result = await db.execute(select(User).where(User.email == credentials.email))
+    user = result.scalar_one_or_none()
 
-    if not user or not verify_password(credentials.password, user.hashed_password):
+    if user:
+        valid, new_hash = await verify_and_update_password(credentials.password, user.hashed_password)
+    else:
+        valid, new_hash = False, None
+
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -62,13 +72,30 @@ async def login(credentials: UserLogin, db: Session = Depends(get_db)):
             detail="Inactive user"
         )
 
+    # Upgrade hashes made with an old work factor while the password is known
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
+        logger.info(f"Rehashed password for user {user.id}")
+
     # Create access token
-    access_token = create_access_token(data={"sub": user.id})
+    access_token = create_user_token(user)
 
     return Token(access_token=access_token)
 
 
 @router.get("/me", response_model=UserResponse)
-async def get_me(current_user: User = Depends(get_current_user)):
+async def get_me(
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
     """Get current user profile"""
-    return current_user
+    user = await db.get(User, current_user.id)
+
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="User not found"
+        )
+
+    return user
@@ -1,42 +1,121 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional
+
+from app.config import settings
 
 from app.db.database import get_db
-from app.db.models import User, Conversation
-from app.models.schemas import ConversationResponse
-from app.utils.auth import get_current_user
+from app.db.models import Conversation
+from app.services.user_cache import UserPrincipal
+from app.models.schemas import ConversationResponse, ConversationListItem
+from app.utils.auth import get_current_admin, get_current_user
+from app.utils.export import export_conversations, export_filename
+from app.utils.pagination import keyset_page, finish_page
+
+# Characters of ai_response returned in history lists by default
+PREVIEW_CHARS = 200
 
 router = APIRouter()
 
 
-@router.get("/history", response_model=List[ConversationResponse])
+@router.get("/history", response_model=List[ConversationListItem])
 async def get_conversation_history(
-    limit: int = 50,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    limit: int = Query(50, ge=1),
+    cursor: Optional[str] = None,
+    include_response: bool = False,
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Get user's conversation history, newest first
+
+    - At most PAGE_SIZE_MAX entries per page
+    - If there are more, the X-Next-Cursor response header holds the cursor
+      for the next page (pass it back as `cursor`)
+    - Only a preview of each AI response is returned unless `include_response`
+      is set; the full conversation is at /api/conversations/{id}
+    """
+
+    columns = [
+        Conversation.id,
+        Conversation.user_message,
+        func.substr(Conversation.ai_response, 1, PREVIEW_CHARS).label("ai_response_preview"),
+        Conversation.response_audio_url,
+        Conversation.is_emergency,
+        Conversation.symptoms_extracted,
+        Conversation.llm_provider,
+        Conversation.created_at,
+    ]
+    if include_response:
+        columns.append(Conversation.ai_response)
+
+    query = select(*columns).where(Conversation.user_id == current_user.id)
+    result = await db.execute(keyset_page(query, Conversation, cursor, limit))
+
+    return finish_page(result.all(), limit, response)
+
+
+@router.get("/export")
+async def export_conversation_history(
+    format: Literal["ndjson", "csv"] = "ndjson",
+    gzip: bool = False,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    emergency: Optional[bool] = None,
+    current_user: UserPrincipal = Depends(get_current_admin)
 ):
-    """Get user's conversation history"""
+    """
+    Export all users' conversations for clinical review (admin)
 
-    conversations = db.query(Conversation).filter(
-        Conversation.user_id == current_user.id
-    ).order_by(Conversation.created_at.desc()).limit(limit).all()
+    - Filter by `since`/`until` (created_at, until exclusive) and `emergency`
+    - NDJSON or CSV, gzipped with `gzip=true`
+    - Streamed from a server-side cursor, so exports of any size use constant memory
+    """
 
-    return conversations
+    if since is not None and until is not None and since >= until:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="since must be before until"
+        )
+
+    if gzip:
+        media_type = "application/gzip"
+    else:
+        media_type = "application/x-ndjson" if format == "ndjson" else "text/csv"
+
+    return StreamingResponse(
+        export_conversations(
+            format=format,
+            compress=gzip,
+            since=since,
+            until=until,
+            emergency=emergency,
+            batch_size=settings.EXPORT_BATCH_SIZE
+        ),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{export_filename(format, gzip)}"'}
+    )
 
 
 @router.get("/{conversation_id}", response_model=ConversationResponse)
 async def get_conversation(
     conversation_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Get specific conversation"""
 
-    conversation = db.query(Conversation).filter(
-        Conversation.id == conversation_id,
-        Conversation.user_id == current_user.id
-    ).first()
+    result = await db.execute(
+        select(Conversation).where(
+            Conversation.id == conversation_id,
+            Conversation.user_id == current_user.id
+        )
+    )
+    conversation = result.scalar_one_or_none()
 
     if not conversation:
         raise HTTPException(
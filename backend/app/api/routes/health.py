@@ -1,7 +1,8 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Response, status
 from datetime import datetime
 from app.config import settings
-from app.models.schemas import HealthCheck
+from app.models.schemas import HealthCheck, ReadinessCheck
+from app.services.readiness_service import readiness_service
 
 router = APIRouter()
 
@@ -16,3 +17,19 @@ async def health_check():
         author=settings.AUTHOR,
         timestamp=datetime.utcnow()
     )
+
+
+@router.get("/health/ready", response_model=ReadinessCheck)
+async def readiness_check(response: Response):
+    """
+    Readiness check for load balancers
+
+    Probes the database, Redis, the vector index and the embedding model, and
+    reports the providers' recent call outcomes, with per-dependency latency.
+    Answers 503 when a critical dependency is down. Results are cached for
+    READINESS_CACHE_TTL seconds.
+    """
+    result = await readiness_service.check()
+    if result.status == "not_ready":
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return result
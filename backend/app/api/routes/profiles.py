@@ -0,0 +1,53 @@
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import HTMLResponse, Response
+
+from app.services.user_cache import UserPrincipal
+from app.utils.auth import get_current_admin
+from app.utils.profiling import RequestProfile, profile_store
+
+router = APIRouter()
+
+
+def _get_profile(profile_id: str) -> RequestProfile:
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found (profiles are kept per worker, and only the most recent)"
+        )
+    return profile
+
+
+@router.get("")
+async def list_profiles(current_user: UserPrincipal = Depends(get_current_admin)) -> List[dict]:
+    """Profiles kept by this worker, newest first, with their stage timings"""
+    return [profile.summary() for profile in profile_store.list()]
+
+
+@router.get("/{profile_id}.html", response_class=HTMLResponse)
+async def get_profile_html(profile_id: str, current_user: UserPrincipal = Depends(get_current_admin)):
+    """Interactive call tree (pyinstrument), or the top functions by cumulative time (cProfile)"""
+    return HTMLResponse(_get_profile(profile_id).html())
+
+
+@router.get("/{profile_id}.speedscope.json")
+async def get_profile_speedscope(profile_id: str, current_user: UserPrincipal = Depends(get_current_admin)):
+    """Profile in speedscope format, for https://www.speedscope.app"""
+    data = _get_profile(profile_id).speedscope()
+    if data is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="speedscope output needs pyinstrument; this profile was taken with cProfile"
+        )
+    return Response(
+        data,
+        media_type="application/json",
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.speedscope.json"'}
+    )
+
+
+@router.get("/{profile_id}")
+async def get_profile(profile_id: str, current_user: UserPrincipal = Depends(get_current_admin)) -> dict:
+    """Profile metadata and stage timings"""
+    return _get_profile(profile_id).summary()
@@ -1,148 +1,547 @@
-import time
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+import json
+import base64
+import asyncio
+from typing import AsyncIterator, List, Optional, Tuple
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from loguru import logger
 
-from app.db.database import get_db
-from app.db.models import User, Conversation
-from app.models.schemas import VoiceRequest, VoiceResponse
-from app.utils.auth import get_current_user
+from app.config import settings
+from app.db.database import get_db, AsyncSessionLocal
+from app.models.schemas import (
+    VoiceRequest, VoiceResponse, BatchTextRequest, BatchTextResult, BatchTextResponse
+)
+from app.utils.auth import get_current_user, get_user_from_token
 from app.services.stt_service import stt_service
-from app.services.tts_service import tts_service
 from app.services.llm_service import llm_service
 from app.services.rag_service import rag_service
+from app.services.memory_service import memory_service
+from app.services.speech_pipeline import speech_pipeline
+from app.services.voice_pipeline import VoicePipeline, BatchItemResult, EMERGENCY_RESPONSE
+from app.services.voice_session import VoiceSession
+from app.services.user_cache import UserPrincipal
+from app.api.routes.audio import prepare_response_audio, store_audio
+from app.utils.timing import StageTimer
 
 router = APIRouter()
 
+voice_pipeline = VoicePipeline(
+    rag=rag_service,
+    llm=llm_service,
+    prepare_audio=prepare_response_audio,
+    memory=memory_service,
+    background_save=settings.CONVERSATION_BACKGROUND_SAVE,
+    save_attempts=settings.CONVERSATION_SAVE_ATTEMPTS,
+    save_backoff=settings.CONVERSATION_SAVE_BACKOFF
+)
+
+
+async def _get_user_message(request: VoiceRequest, timer: StageTimer) -> str:
+    """Get user message from the request, transcribing audio if provided"""
+    if request.audio_data:
+        logger.info("Transcribing audio...")
+        with timer.stage("stt"):
+            user_message = await stt_service.transcribe_audio(request.audio_data)
+        if not user_message:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Failed to transcribe audio"
+            )
+        return user_message
+
+    if request.text_message:
+        return request.text_message
+
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Either audio_data or text_message must be provided"
+    )
+
 
 @router.post("/interact", response_model=VoiceResponse)
 async def voice_interact(
     request: VoiceRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    background_tasks: BackgroundTasks,
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Main voice interaction endpoint
 
     - Accepts audio (base64) or text input
     - Transcribes audio if provided
-    - Extracts symptoms and retrieves medical knowledge
-    - Generates AI response with fallback LLM chain
-    - Synthesizes speech response
     - Detects emergencies
-    - Stores conversation in database
+    - Extracts symptoms and retrieves medical knowledge concurrently
+    - Generates AI response with fallback LLM chain
+    - Synthesizes speech response and stores it for streaming
+      (or defers synthesis until first fetch when generate_audio is false)
+    - Stores conversation in database (in the background once the id is reserved)
     """
 
-    start_time = time.time()
+    timer = StageTimer()
 
     try:
         # Step 1: Get user message (transcribe if audio)
-        if request.audio_data:
-            logger.info("Transcribing audio...")
-            user_message = await stt_service.transcribe_audio(request.audio_data)
-            if not user_message:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Failed to transcribe audio"
-                )
-        elif request.text_message:
-            user_message = request.text_message
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Either audio_data or text_message must be provided"
-            )
+        user_message = await _get_user_message(request, timer)
 
         logger.info(f"User message: {user_message}")
 
-        # Step 2: Check for emergency
-        is_emergency = rag_service.is_emergency(user_message)
+        # Steps 2-7: Run the interaction stage graph
+        result = await voice_pipeline.run(
+            user_message=user_message,
+            user_id=current_user.id,
+            db=db,
+            background_tasks=background_tasks,
+            generate_audio=request.generate_audio,
+            transcribed=bool(request.audio_data),
+            timer=timer
+        )
 
-        if is_emergency:
-            emergency_response = (
-                "🚨 EMERGENCY DETECTED 🚨\n\n"
-                "Your symptoms suggest a medical emergency. "
-                "Please call 112 immediately or visit the nearest hospital. "
-                "Do not delay seeking professional medical care.\n\n"
-                "If you are unable to get to a hospital, ask someone nearby to help you."
-            )
+        return VoiceResponse(
+            text_response=result.ai_response,
+            audio_url=result.audio_url,
+            is_emergency=result.context.is_emergency,
+            symptoms_detected=result.context.symptoms,
+            conversation_id=result.conversation_id
+        )
 
-            # Generate audio response
-            audio_response = await tts_service.synthesize_speech(emergency_response)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Voice interaction error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred processing your request"
+        )
 
-            # Save conversation
-            conversation = Conversation(
-                user_id=current_user.id,
-                user_message=user_message,
-                transcription=user_message if request.audio_data else None,
-                ai_response=emergency_response,
-                is_emergency=True,
-                llm_provider="emergency_detection",
-                response_time_ms=int((time.time() - start_time) * 1000)
-            )
-            db.add(conversation)
-            db.commit()
-            db.refresh(conversation)
-
-            return VoiceResponse(
-                text_response=emergency_response,
-                audio_url=None,  # In production, save audio and return URL
-                is_emergency=True,
-                symptoms_detected=[],
-                conversation_id=conversation.id
-            )
 
-        # Step 3: Extract symptoms
-        symptoms = rag_service.extract_symptoms(user_message)
-        logger.info(f"Symptoms detected: {symptoms}")
+def _ndjson(event: dict) -> str:
+    return json.dumps(event) + "\n"
 
-        # Step 4: Retrieve relevant medical knowledge (RAG)
-        medical_context = rag_service.search(user_message, n_results=3)
-        logger.info(f"Retrieved medical context ({len(medical_context)} chars)")
 
-        # Step 5: Generate AI response with fallback chain
-        ai_response, provider_used = await llm_service.generate_response(
-            prompt=user_message,
-            medical_context=medical_context,
-            db=db
+async def _single_text(text: str) -> AsyncIterator[str]:
+    yield text
+
+
+async def _stream_turn(
+    user_message: str,
+    user_id: int,
+    generate_audio: bool,
+    transcribed: bool,
+    timer: StageTimer,
+    session_turns: Optional[List[Tuple[str, str]]] = None
+) -> AsyncIterator[dict]:
+    """
+    Run one interaction, yielding events as they become ready
+
+    Audio events carry raw MP3 bytes; transports encode them as they need.
+    session_turns, when given, are the recent turns used as conversation
+    memory instead of loading them from the database.
+    """
+    # Dependency sessions are closed before a response body streams, so use our own
+    db = AsyncSessionLocal()
+    provider_used = "emergency_detection"
+
+    try:
+        context = await voice_pipeline.gather_context(
+            user_message, db, timer, user_id=user_id, session_turns=session_turns
         )
 
-        logger.info(f"AI response generated using {provider_used}")
+        async def response_text() -> AsyncIterator[str]:
+            nonlocal provider_used
+            with timer.stage("llm"):
+                async for delta, provider in llm_service.generate_response_stream(
+                    prompt=user_message,
+                    medical_context=context.medical_context,
+                    db=db,
+                    history=context.history
+                ):
+                    if "first_text" not in timer.stages:
+                        timer.mark("first_text")
+                    provider_used = provider
+                    yield delta
 
-        # Step 6: Generate audio response
-        audio_response = await tts_service.synthesize_speech(ai_response)
+        yield {
+            "type": "meta",
+            "is_emergency": context.is_emergency,
+            "symptoms_detected": context.symptoms
+        }
 
-        # Step 7: Save conversation
-        response_time_ms = int((time.time() - start_time) * 1000)
+        text_stream = _single_text(EMERGENCY_RESPONSE) if context.is_emergency else response_text()
+        text_parts = []
+        audio_segments = []
 
-        conversation = Conversation(
-            user_id=current_user.id,
+        if generate_audio:
+            async for event in speech_pipeline.stream(text_stream):
+                if event.type == "text":
+                    text_parts.append(event.text)
+                    yield {"type": "text", "delta": event.text}
+                else:
+                    if not audio_segments:
+                        timer.mark("first_audio")
+                    audio_segments.append(event.audio)
+                    yield {"type": "audio", "index": event.index, "text": event.text, "audio": event.audio}
+        else:
+            async for delta in text_stream:
+                text_parts.append(delta)
+                yield {"type": "text", "delta": delta}
+
+        ai_response = "".join(text_parts)
+
+        # MP3 frames can be concatenated byte-for-byte
+        with timer.stage("audio_store"):
+            if audio_segments:
+                audio_url = await store_audio(b"".join(audio_segments))
+            else:
+                audio_url = await prepare_response_audio(ai_response, generate_audio=False)
+
+        stage_timings = timer.as_dict()
+        response_time_ms = stage_timings["total"]
+
+        # The response is already streaming, so save before the final event
+        conversation_id = await voice_pipeline.save_conversation(
+            db=db,
+            background_tasks=None,
+            conversation_id=context.conversation_id,
+            user_id=user_id,
             user_message=user_message,
-            transcription=user_message if request.audio_data else None,
-            symptoms_extracted=symptoms,
+            transcription=user_message if transcribed else None,
+            symptoms_extracted=context.symptoms,
             ai_response=ai_response,
-            is_emergency=False,
+            response_audio_url=audio_url,
+            is_emergency=context.is_emergency,
             llm_provider=provider_used,
-            response_time_ms=response_time_ms
+            response_time_ms=response_time_ms,
+            stage_timings=stage_timings
         )
-        db.add(conversation)
-        db.commit()
-        db.refresh(conversation)
 
-        logger.info(f"Conversation saved (ID: {conversation.id}, Time: {response_time_ms}ms)")
+        logger.info(f"Streamed conversation saved (ID: {conversation_id}, Time: {response_time_ms}ms)")
 
-        return VoiceResponse(
-            text_response=ai_response,
-            audio_url=None,  # In production, save audio to storage and return URL
-            is_emergency=False,
-            symptoms_detected=symptoms,
-            conversation_id=conversation.id
+        yield {
+            "type": "done",
+            "conversation_id": conversation_id,
+            "text_response": ai_response,
+            "audio_url": audio_url
+        }
+
+    finally:
+        await db.close()
+
+
+@router.post("/interact/stream")
+async def voice_interact_stream(
+    request: VoiceRequest,
+    current_user: UserPrincipal = Depends(get_current_user)
+):
+    """
+    Streaming voice interaction endpoint (NDJSON)
+
+    Same pipeline as /interact, but the response text is streamed as the LLM
+    generates it and speech is synthesized sentence by sentence while generation
+    continues. One JSON event per line:
+
+    - {"type": "meta", "is_emergency": bool, "symptoms_detected": [...]}
+    - {"type": "text", "delta": "..."}
+    - {"type": "audio", "index": 0, "text": "...", "audio": "<base64 mp3>"}
+    - {"type": "done", "conversation_id": int, "text_response": "...", "audio_url": "..."}
+
+    Audio segments arrive in playback order; audio_url points to the
+    concatenated MP3 of all segments.
+    """
+
+    timer = StageTimer()
+    user_id = current_user.id
+
+    user_message = await _get_user_message(request, timer)
+    logger.info(f"User message: {user_message}")
+
+    async def events() -> AsyncIterator[str]:
+        try:
+            async for event in _stream_turn(
+                user_message=user_message,
+                user_id=user_id,
+                generate_audio=request.generate_audio,
+                transcribed=bool(request.audio_data),
+                timer=timer
+            ):
+                if event["type"] == "audio":
+                    event = {**event, "audio": base64.b64encode(event["audio"]).decode("utf-8")}
+                yield _ndjson(event)
+
+        except Exception as e:
+            logger.error(f"Streaming voice interaction error: {str(e)}")
+            yield _ndjson({"type": "error", "detail": "An error occurred processing your request"})
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+async def _authenticate_session(websocket: WebSocket) -> Optional[UserPrincipal]:
+    """Authenticate a WebSocket from ?token= or a first {"type": "auth"} message"""
+    token = websocket.query_params.get("token")
+
+    if not token:
+        try:
+            message = await asyncio.wait_for(
+                websocket.receive_json(),
+                timeout=settings.VOICE_SESSION_AUTH_TIMEOUT
+            )
+        except (asyncio.TimeoutError, ValueError, KeyError):
+            return None
+        if message.get("type") != "auth":
+            return None
+        token = message.get("token")
+
+    if not token:
+        return None
+
+    # Only database access of the session until a turn is saved
+    async with AsyncSessionLocal() as db:
+        return await get_user_from_token(token, db)
+
+
+async def _run_session_turn(
+    websocket: WebSocket,
+    session: VoiceSession,
+    send_lock: asyncio.Lock,
+    audio: Optional[bytes] = None,
+    text: Optional[str] = None
+):
+    """Transcribe (if audio) and answer one utterance, pushing events as they are ready"""
+
+    async def send(event: dict, audio_bytes: Optional[bytes] = None):
+        # An audio header and its binary frame must not be split by another send
+        async with send_lock:
+            await websocket.send_json(event)
+            if audio_bytes is not None:
+                await websocket.send_bytes(audio_bytes)
+
+    timer = StageTimer()
+
+    try:
+        if audio is not None:
+            with timer.stage("stt"):
+                text = await stt_service.transcribe_bytes(audio, f"audio.{session.audio_format}")
+            if not text:
+                await send({"type": "error", "detail": "Failed to transcribe audio"})
+                return
+            await send({"type": "transcript", "text": text})
+
+        logger.info(f"Session {session.id} message: {text}")
+
+        async for event in _stream_turn(
+            user_message=text,
+            user_id=session.user_id,
+            generate_audio=session.generate_audio,
+            transcribed=audio is not None,
+            timer=timer,
+            session_turns=session.recent_turns()
+        ):
+            if event["type"] == "audio":
+                header = {key: value for key, value in event.items() if key != "audio"}
+                await send({**header, "bytes": len(event["audio"])}, event["audio"])
+            else:
+                if event["type"] == "done":
+                    session.add_turn(text, event["text_response"])
+                await send(event)
+
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Voice session {session.id} turn error: {str(e)}")
+        try:
+            await send({"type": "error", "detail": "An error occurred processing your request"})
+        except Exception:
+            pass
+
+
+@router.websocket("/session")
+async def voice_session_ws(websocket: WebSocket):
+    """
+    WebSocket voice session for multi-turn conversations
+
+    Authenticates once (?token=<jwt> or a first {"type": "auth", "token": "<jwt>"}
+    message), then accepts any number of turns.
+
+    Client -> server:
+    - binary frames: audio of the current utterance, sent while the user speaks
+    - {"type": "end_utterance"}: transcribe the buffered audio and respond
+    - {"type": "text", "text": "..."}: respond to a typed message
+    - {"type": "config", "generate_audio": bool, "audio_format": "webm"}
+    - {"type": "cancel"}: stop the response in progress
+
+    Server -> client:
+    - {"type": "ready", "session_id": "..."}
+    - {"type": "transcript", "text": "..."}
+    - meta / text / done / error events as in /interact/stream
+    - {"type": "audio", "index": 0, "text": "...", "bytes": n}, immediately
+      followed by one binary frame with that MP3 segment
+
+    Starting a new turn while a response is in progress replaces it.
+    """
+    await websocket.accept()
+
+    try:
+        user = await _authenticate_session(websocket)
+    except WebSocketDisconnect:
+        return
+
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Could not validate credentials")
+        return
+
+    session = VoiceSession(
+        user_id=user.id,
+        max_audio_bytes=settings.VOICE_SESSION_MAX_AUDIO_BYTES,
+        history_turns=settings.VOICE_SESSION_HISTORY_TURNS
+    )
+    # The session's memory starts from the user's latest turns; later turns are added as they happen
+    try:
+        for user_message, ai_response in (await memory_service.load_history(user.id)).turns:
+            session.add_turn(user_message, ai_response)
+    except Exception as e:
+        logger.warning(f"Voice session {session.id} starts without history: {str(e)}")
+    send_lock = asyncio.Lock()
+
+    async def send(event: dict):
+        async with send_lock:
+            await websocket.send_json(event)
+
+    async def start_turn(**kwargs):
+        await session.cancel_turn()
+        session.turn_task = asyncio.create_task(_run_session_turn(websocket, session, send_lock, **kwargs))
+
+    logger.info(f"Voice session {session.id} opened for user {user.id}")
+    await send({"type": "ready", "session_id": session.id})
+
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(
+                    websocket.receive(),
+                    timeout=settings.VOICE_SESSION_IDLE_TIMEOUT
+                )
+            except asyncio.TimeoutError:
+                await websocket.close(code=status.WS_1000_NORMAL_CLOSURE, reason="Idle timeout")
+                break
+
+            if message["type"] == "websocket.disconnect":
+                break
+
+            if message.get("bytes") is not None:
+                if not session.append_audio(message["bytes"]):
+                    session.take_audio()
+                    await send({"type": "error", "detail": "Utterance too long"})
+                continue
+
+            try:
+                event = json.loads(message.get("text") or "")
+            except ValueError:
+                await send({"type": "error", "detail": "Invalid message"})
+                continue
+
+            event_type = event.get("type")
+
+            if event_type == "end_utterance":
+                audio = session.take_audio()
+                if audio:
+                    await start_turn(audio=audio)
+                else:
+                    await send({"type": "error", "detail": "No audio received"})
+
+            elif event_type == "text" and event.get("text"):
+                await start_turn(text=event["text"])
+
+            elif event_type == "config":
+                session.generate_audio = bool(event.get("generate_audio", session.generate_audio))
+                session.audio_format = event.get("audio_format") or session.audio_format
+
+            elif event_type == "cancel":
+                await session.cancel_turn()
+                session.take_audio()
+
+            else:
+                await send({"type": "error", "detail": f"Unknown message type: {event_type}"})
+
+    except WebSocketDisconnect:
+        pass
+
+    finally:
+        await session.cancel_turn()
+        logger.info(f"Voice session {session.id} closed after {len(session.turns)} turns")
+
+
+def _batch_result(result: BatchItemResult) -> BatchTextResult:
+    return BatchTextResult(
+        index=result.index,
+        text_response=result.ai_response,
+        is_emergency=result.is_emergency,
+        symptoms_detected=result.symptoms,
+        llm_provider=result.provider,
+        conversation_id=result.conversation_id
+    )
+
+
+@router.post("/batch", response_model=BatchTextResponse)
+async def batch_text_query(
+    request: BatchTextRequest,
+    stream: bool = Query(False, description="Stream results as NDJSON as they complete"),
+    current_user: UserPrincipal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Batch text query endpoint for clinics and partner integrations
+
+    - Accepts up to BATCH_MAX_MESSAGES text messages (no audio)
+    - Detects emergencies for the whole batch
+    - Retrieves medical knowledge for all messages in one batched call
+    - Generates AI responses with bounded concurrency
+    - Stores all conversations in one bulk insert
+
+    Results are returned in input order. With ?stream=true each result is sent
+    as one NDJSON line as soon as it (and all before it) are ready; there,
+    conversation_id is null on databases without sequences.
+    """
+
+    if len(request.messages) > settings.BATCH_MAX_MESSAGES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch can contain at most {settings.BATCH_MAX_MESSAGES} messages"
         )
 
-    except HTTPException:
-        raise
+    user_id = current_user.id
+
+    if stream:
+        async def events() -> AsyncIterator[str]:
+            # Dependency sessions are closed before the body streams, so use our own
+            stream_db = AsyncSessionLocal()
+            try:
+                async for result in voice_pipeline.run_batch(
+                    request.messages, user_id, stream_db, settings.BATCH_LLM_CONCURRENCY
+                ):
+                    yield _ndjson({"type": "result", **_batch_result(result).model_dump()})
+                yield _ndjson({"type": "done", "count": len(request.messages)})
+
+            except Exception as e:
+                logger.error(f"Batch query error: {str(e)}")
+                yield _ndjson({"type": "error", "detail": "An error occurred processing your request"})
+
+            finally:
+                await stream_db.close()
+
+        return StreamingResponse(events(), media_type="application/x-ndjson")
+
+    try:
+        results = [
+            result async for result in voice_pipeline.run_batch(
+                request.messages, user_id, db, settings.BATCH_LLM_CONCURRENCY
+            )
+        ]
+
+        return BatchTextResponse(results=[_batch_result(result) for result in results])
+
     except Exception as e:
-        logger.error(f"Voice interaction error: {str(e)}")
+        logger.error(f"Batch query error: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="An error occurred processing your request"
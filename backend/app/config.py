@@ -15,9 +15,24 @@ class Settings(BaseSettings):
 
     # Database
     DATABASE_URL: str
+    DB_POOL_SIZE: int = 10  # Connections kept open by the async engine
+    DB_MAX_OVERFLOW: int = 20  # Extra connections allowed under load
+    DB_POOL_TIMEOUT: int = 30  # Seconds to wait for a free connection
+    DB_STATEMENT_TIMEOUT_MS: int = 30000  # Postgres statement_timeout per connection
 
     # Redis
     REDIS_URL: str
+    REDIS_MAX_CONNECTIONS: int = 20  # Shared async connection pool, per worker process
+    REDIS_SOCKET_TIMEOUT: float = 2.0  # Seconds; a slow cache is treated as a miss
+    CACHE_SERIALIZER: str = "msgpack"  # msgpack or json
+    CACHE_COMPRESS_MIN_BYTES: int = 1024  # Values at least this large are zlib-compressed; 0 disables
+    CACHE_LOCAL_MAX_ENTRIES: int = 10000  # In-process cache tier in front of Redis, per worker; 0 disables
+    CACHE_LOCAL_TTL: int = 30  # Max seconds a value is served from the in-process tier (staleness bound across workers)
+    CACHE_EARLY_REFRESH_BETA: float = 1.0  # Probabilistic early refresh of get_or_set keys; higher is earlier, 0 disables
+    REDIS_RECONNECT_MAX_DELAY: float = 30.0  # Seconds; backoff cap between reconnection attempts while Redis is down
+    CACHE_GENERATION_TTL: float = 5.0  # Seconds a worker reuses a namespace generation; delay before others see an invalidation
+    CACHE_SWEEP_INTERVAL_SECONDS: int = 600  # SCAN sweep for keys of invalidated namespaces; 0 disables
+    CACHE_SWEEP_BATCH_SIZE: int = 500  # Keys per SCAN call and per UNLINK
 
     # LLM APIs - Fallback Chain
     XAI_API_KEY: str = ""
@@ -31,13 +46,73 @@ class Settings(BaseSettings):
     # TTS
     GOOGLE_APPLICATION_CREDENTIALS: str = ""
     GCP_PROJECT_ID: str = ""
+    TTS_MAX_CHUNK_BYTES: int = 4500  # Google TTS limit is 5000 bytes per request
+    TTS_MAX_CONCURRENCY: int = 4  # Parallel chunk requests per synthesis
+    TTS_PIPELINE_CONCURRENCY: int = 3  # Concurrent sentence syntheses in streaming mode
+    TTS_SENTENCE_MIN_CHARS: int = 40  # Shorter sentences are merged with the next one
+
+    # Audio Storage
+    AUDIO_STORAGE_BACKEND: str = "local"
+    AUDIO_STORAGE_DIR: str = "./data/audio"
+    AUDIO_CACHE_MAX_AGE: int = 86400
+    PUBLIC_BASE_URL: str = ""  # Prefix for audio URLs, e.g. https://api.example.com
+
+    # Conversation memory
+    MEMORY_RECENT_TURNS: int = 4  # Turns included verbatim; 0 disables memory
+    MEMORY_TOKEN_BUDGET: int = 800  # Max tokens of history added to the prompt
+    MEMORY_SUMMARY_MAX_WORDS: int = 120
+    MEMORY_SUMMARY_TTL: int = 604800  # Seconds a cached summary is kept (7 days)
+    MEMORY_SUMMARY_BATCH: int = 20  # Max turns folded into the summary per refresh
+
+    # Knowledge retrieval
+    RAG_CACHE_TTL: int = 3600  # Seconds search results are cached per normalized question; 0 disables
+
+    # Conversation persistence
+    CONVERSATION_BACKGROUND_SAVE: bool = True  # Insert after the response is sent; False inserts first, so the id resolves at once
+    CONVERSATION_SAVE_ATTEMPTS: int = 4  # Background insert attempts before the conversation is logged and dropped
+    CONVERSATION_SAVE_BACKOFF: float = 0.5  # Seconds before the first retry; doubles per attempt
+
+    # Batch text queries
+    BATCH_MAX_MESSAGES: int = 50
+    BATCH_LLM_CONCURRENCY: int = 5  # Concurrent LLM calls per batch
+
+    # WebSocket voice sessions
+    VOICE_SESSION_AUTH_TIMEOUT: int = 10  # Seconds to send the auth message
+    VOICE_SESSION_IDLE_TIMEOUT: int = 300  # Close sessions with no messages for this long
+    VOICE_SESSION_MAX_AUDIO_BYTES: int = 10 * 1024 * 1024  # Per utterance
+    VOICE_SESSION_HISTORY_TURNS: int = 6  # Recent turns a session keeps and gives the LLM (within MEMORY_TOKEN_BUDGET)
 
     # n8n Integration
     N8N_WEBHOOK_URL: str
     N8N_API_KEY: str = ""
+    N8N_WEBHOOK_TIMEOUT: float = 10.0  # Seconds per webhook request
+    N8N_WEBHOOK_BATCH_SIZE: int = 1  # Appointments per request; >1 posts {"appointments": [...]}, which the workflow must accept
+    OUTBOX_DISPATCHER_ENABLED: bool = True  # Deliver queued webhooks from this process
+    OUTBOX_POLL_INTERVAL: float = 2.0  # Seconds between polls; a booking wakes its own worker's dispatcher at once
+    OUTBOX_BATCH_SIZE: int = 50  # Messages claimed per poll
+    OUTBOX_CONCURRENCY: int = 4  # Webhook requests in flight per worker process
+    OUTBOX_MAX_ATTEMPTS: int = 8  # Then the message is marked failed
+    OUTBOX_BACKOFF_BASE: float = 5.0  # Seconds before the first retry; doubles per attempt
+    OUTBOX_BACKOFF_MAX: float = 900.0
 
     # Telegram (Optional)
     TELEGRAM_BOT_TOKEN: str = ""
+    TELEGRAM_API_BASE: str = "https://api.telegram.org"  # Bot API server (a local Bot API server or a test stand-in)
+    TELEGRAM_TIMEOUT: float = 10.0  # Seconds per Bot API request
+    TELEGRAM_WEBHOOK_SECRET: str = ""  # secret_token given to setWebhook; updates without it are rejected
+    TELEGRAM_WORKERS: int = 8  # Updates processed concurrently per worker process; each chat's in order
+    TELEGRAM_QUEUE_SIZE: int = 100  # Updates waiting per Telegram worker and per chat; when full the webhook answers 503 and Telegram retries
+    TELEGRAM_DEDUP_TTL: int = 86400  # Seconds an update_id is remembered, so redelivered updates are skipped
+    TELEGRAM_CHAT_MIN_INTERVAL: float = 1.0  # Seconds between messages to the same chat
+    TELEGRAM_GLOBAL_RATE: float = 30.0  # Messages per second to all chats, across all worker processes
+    TELEGRAM_CHAT_LOCK_TTL: int = 300  # Seconds a worker process keeps a chat without progress; must exceed one reply
+
+    # Outbound HTTP clients (one keep-alive pool per upstream, per worker process)
+    HTTP_CLIENT_HTTP2: bool = True  # Needs the h2 package; HTTP/1.1 otherwise
+    HTTP_CLIENT_MAX_CONNECTIONS: int = 20
+    HTTP_CLIENT_MAX_KEEPALIVE: int = 10  # Idle connections kept open
+    HTTP_CLIENT_KEEPALIVE_EXPIRY: float = 30.0  # Seconds an idle connection is kept
+    HTTP_CLIENT_CONNECT_TIMEOUT: float = 5.0
 
     # CORS
     ALLOWED_ORIGINS: str = "http://localhost:3000"
@@ -46,6 +121,54 @@ class Settings(BaseSettings):
     JWT_SECRET_KEY: str
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 1440
+    AUTH_USER_CACHE_TTL: int = 60  # Seconds an authenticated user is cached; 0 disables
+    AUTH_USER_CACHE_REDIS: bool = True  # Share cached users between workers via Redis
+    AUTH_TRUST_TOKEN_CLAIMS: bool = False  # Authenticate from signed token claims, without a lookup
+    AUTH_TRUSTED_TOKEN_EXPIRE_MINUTES: int = 15  # Lifetime of such tokens: how long revoked or deactivated users keep access
+
+    # Password hashing
+    BCRYPT_ROUNDS: int = 12  # Work factor; existing hashes are upgraded on login
+    PASSWORD_HASH_WORKERS: int = 2  # Threads hashing/verifying passwords per worker process
+
+    # Production server (gunicorn.conf.py)
+    SERVER_WORKERS: int = 0  # Worker processes; 0 means one per CPU core
+    SERVER_PRELOAD: bool = True  # Load the app in the master before forking, so workers share its memory
+    SERVER_PRELOAD_MODELS: bool = True  # Also load retrieval's embedding model in the master (needs SERVER_PRELOAD)
+    SERVER_TIMEOUT: int = 120  # Seconds a worker may be unresponsive before it is restarted
+    SERVER_GRACEFUL_TIMEOUT: int = 30  # Seconds workers get to finish requests on shutdown
+    SERVER_KEEPALIVE: int = 5  # Seconds idle client connections are kept open
+    SERVER_MAX_REQUESTS: int = 0  # Restart a worker after this many requests (with 10% jitter); 0 never
+    SERVER_METRICS_DIR: str = ""  # Workers' Prometheus files, unless PROMETHEUS_MULTIPROC_DIR is set; empty: <tmp>/medivoice-metrics-<port>
+
+    # Monitoring
+    METRICS_ENABLED: bool = True  # Prometheus metrics at /metrics
+    READINESS_CACHE_TTL: float = 5.0  # Seconds readiness results are reused, so health checks add no load
+    READINESS_PROBE_TIMEOUT: float = 2.0  # Seconds each readiness probe may take
+    PROVIDER_FAILURE_THRESHOLD: int = 5  # Consecutive failed calls before a provider is reported down
+    PROVIDER_HEALTH_WINDOW: float = 60.0  # Seconds a down provider stays down without further failures
+    PROFILER_ENABLED: bool = False  # Request profiling middleware; no overhead at all when off
+    PROFILER_SECRET: str = ""  # Requests with an X-Profile header equal to this are profiled; reading profiles still needs an admin
+    PROFILER_SAMPLE_RATE: float = 0.0  # Fraction of all requests profiled at random
+    PROFILER_MAX_PROFILES: int = 20  # Profiles kept per worker process (oldest dropped)
+    PROFILER_INTERVAL: float = 0.001  # Seconds between pyinstrument samples
+
+    # Analytics rollups and retention
+    ROLLUP_ENABLED: bool = True  # Aggregate llm_logs and stage timings in the background (Postgres)
+    ROLLUP_INTERVAL_SECONDS: int = 60
+    ROLLUP_BACKFILL_HOURS: int = 24  # Re-aggregated on startup
+    LLM_LOG_RETENTION_DAYS: int = 30  # Raw llm_logs rows older than this are deleted; 0 keeps them
+    ROLLUP_MINUTE_RETENTION_DAYS: int = 14  # Per-minute rollups; hourly rollups are kept
+    RETENTION_INTERVAL_SECONDS: int = 3600
+    RETENTION_BATCH_SIZE: int = 1000  # Rows deleted per statement
+
+    # Conversation export
+    EXPORT_BATCH_SIZE: int = 1000  # Rows fetched per server-side cursor round trip
+
+    # Pagination
+    PAGE_SIZE_MAX: int = 100  # Largest page list endpoints return
+
+    # Admin access (comma-separated emails allowed to use admin endpoints)
+    ADMIN_EMAILS: str = ""
 
     class Config:
         env_file = ".env"
@@ -55,5 +178,9 @@ class Settings(BaseSettings):
     def allowed_origins_list(self) -> List[str]:
         return [origin.strip() for origin in self.ALLOWED_ORIGINS.split(",")]
 
+    @property
+    def admin_emails_list(self) -> List[str]:
+        return [email.strip().lower() for email in self.ADMIN_EMAILS.split(",") if email.strip()]
+
 
 settings = Settings()
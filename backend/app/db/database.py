@@ -1,26 +1,100 @@
-from sqlalchemy import create_engine
+from typing import AsyncIterator, List, Optional
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
 from app.config import settings
+from app.utils.metrics import InstrumentedAsyncQueuePool, InstrumentedQueuePool, instrument_engine
 
-# Create database engine
+# Async drivers for the URL schemes DATABASE_URL may use
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def _async_url(database_url: str) -> URL:
+    url = make_url(database_url)
+    url = url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+    # asyncpg takes ssl as a connect argument, not libpq's sslmode
+    return url.difference_update_query(["sslmode"])
+
+
+def _async_connect_args(database_url: str) -> dict:
+    url = make_url(database_url)
+    if url.get_backend_name() != "postgresql":
+        return {}
+
+    connect_args = {
+        "server_settings": {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)}
+    }
+    sslmode = url.query.get("sslmode")
+    if sslmode and sslmode != "disable":
+        connect_args["ssl"] = sslmode
+    return connect_args
+
+
+# Sync engine: schema creation, migrations and scripts
 engine = create_engine(
     settings.DATABASE_URL,
+    poolclass=InstrumentedQueuePool,
+    pool_pre_ping=True,
+    pool_recycle=300,
+)
+instrument_engine(engine, "sync")
+
+# Async engine: all request handling
+async_engine = create_async_engine(
+    _async_url(settings.DATABASE_URL),
+    poolclass=InstrumentedAsyncQueuePool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
     pool_pre_ping=True,
     pool_recycle=300,
+    connect_args=_async_connect_args(settings.DATABASE_URL),
 )
+instrument_engine(async_engine.sync_engine, "async")
 
 # Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Objects stay usable after commit; nothing is lazily reloaded under asyncio
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
 
 # Create base class for models
 Base = declarative_base()
 
 
-def get_db():
+def dispose_inherited_connections():
+    """
+    Forget pooled connections inherited from the parent process
+
+    Called in forked workers (gunicorn.conf.py): the pools are replaced
+    without closing their connections, which still belong to the parent.
+    """
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+
+
+async def get_db() -> AsyncIterator[AsyncSession]:
     """Dependency to get database session"""
-    db = SessionLocal()
-    try:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+async def allocate_ids(db: AsyncSession, table_name: str, count: int = 1) -> Optional[List[int]]:
+    """
+    Pre-allocate primary keys from a table's Postgres id sequence
+
+    Lets a row's id be returned to the client before the row is inserted.
+    Returns None on databases without sequences; ids are then assigned on insert.
+    """
+    if db.bind.dialect.name != "postgresql":
+        return None
+
+    result = await db.execute(
+        text("SELECT nextval(pg_get_serial_sequence(:table_name, 'id')) FROM generate_series(1, :count)"),
+        {"table_name": table_name, "count": count}
+    )
+    return [row[0] for row in result]
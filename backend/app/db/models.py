@@ -1,4 +1,6 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, JSON
+from sqlalchemy import (
+    Column, Integer, BigInteger, Float, String, Text, DateTime, ForeignKey, Boolean, JSON, Index, UniqueConstraint
+)
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.database import Base
@@ -14,6 +16,7 @@ class User(Base):
     full_name = Column(String(255), nullable=True)
     phone = Column(String(20), nullable=True)
     is_active = Column(Boolean, default=True)
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")  # Bump to revoke issued tokens
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
@@ -45,12 +48,20 @@ class Conversation(Base):
     is_emergency = Column(Boolean, default=False)
     llm_provider = Column(String(50), nullable=True)  # Which LLM was used
     response_time_ms = Column(Integer, nullable=True)  # Response time in milliseconds
+    stage_timings = Column(JSON, nullable=True)  # Per-stage latency in ms, e.g. {"stt": 850, "llm": 1200, "total": 2400}
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     # Relationships
     user = relationship("User", back_populates="conversations")
 
+    __table_args__ = (
+        # History is listed per user, newest first (keyset pagination on created_at, id)
+        Index("ix_conversations_user_id_created_at", user_id, created_at.desc(), id.desc()),
+        # Time-range scans across all users (stage latency analytics and rollups)
+        Index("ix_conversations_created_at", created_at),
+    )
+
 
 class Appointment(Base):
     """Appointment model"""
@@ -76,6 +87,39 @@ class Appointment(Base):
     # Relationships
     user = relationship("User", back_populates="appointments")
 
+    __table_args__ = (
+        Index("ix_appointments_user_id_created_at", user_id, created_at.desc(), id.desc()),
+    )
+
+
+class OutboxMessage(Base):
+    """
+    Webhook waiting to be delivered (transactional outbox)
+
+    Written in the same transaction as the change it announces, then sent by
+    the outbox dispatcher, so a committed booking is never lost and the
+    request never waits on the webhook.
+    """
+    __tablename__ = "outbox_messages"
+
+    id = Column(Integer, primary_key=True)
+    topic = Column(String(50), nullable=False)  # appointment.booked
+    appointment_id = Column(Integer, ForeignKey("appointments.id"), nullable=True)
+    payload = Column(JSON, nullable=False)
+
+    status = Column(String(20), nullable=False, default="pending")  # pending, delivered, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    last_error = Column(Text, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    delivered_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # The dispatcher polls for due pending messages
+        Index("ix_outbox_messages_status_next_attempt_at", status, next_attempt_at),
+    )
+
 
 class LLMLog(Base):
     """LLM call logging for monitoring"""
@@ -97,4 +141,56 @@ class LLMLog(Base):
     success = Column(Boolean, default=True)
     error_message = Column(Text, nullable=True)
 
-    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+
+class LLMLogRollup(Base):
+    """LLM calls aggregated per minute or hour, built from llm_logs by the rollup job"""
+    __tablename__ = "llm_log_rollups"
+
+    id = Column(Integer, primary_key=True)
+    granularity = Column(String(10), nullable=False)  # minute, hour
+    bucket_start = Column(DateTime(timezone=True), nullable=False)
+    provider = Column(String(50), nullable=False)
+    model = Column(String(100), nullable=False)
+
+    calls = Column(Integer, nullable=False)
+    errors = Column(Integer, nullable=False)
+    total_ms = Column(BigInteger, nullable=False)  # Sum of response times, for averages
+    max_ms = Column(Integer, nullable=False)
+    p50_ms = Column(Float, nullable=False)
+    p95_ms = Column(Float, nullable=False)
+    p99_ms = Column(Float, nullable=False)
+
+    prompt_tokens = Column(BigInteger, nullable=False)
+    completion_tokens = Column(BigInteger, nullable=False)
+    total_tokens = Column(BigInteger, nullable=False)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("granularity", "bucket_start", "provider", "model", name="uq_llm_log_rollups_bucket"),
+    )
+
+
+class StageTimingRollup(Base):
+    """Conversation stage latencies aggregated per minute or hour by the rollup job"""
+    __tablename__ = "stage_timing_rollups"
+
+    id = Column(Integer, primary_key=True)
+    granularity = Column(String(10), nullable=False)  # minute, hour
+    bucket_start = Column(DateTime(timezone=True), nullable=False)
+    stage = Column(String(50), nullable=False)
+    provider = Column(String(50), nullable=False)  # LLM provider; "" = all providers
+
+    samples = Column(Integer, nullable=False)
+    max_ms = Column(Float, nullable=False)
+    p50_ms = Column(Float, nullable=False)
+    p95_ms = Column(Float, nullable=False)
+    p99_ms = Column(Float, nullable=False)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("granularity", "bucket_start", "stage", "provider", name="uq_stage_timing_rollups_bucket"),
+    )
@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -5,8 +6,16 @@ from loguru import logger
 import sys
 
 from app.config import settings
-from app.api.routes import auth, health, voice, appointments, conversations, telegram
-from app.db.database import engine, Base
+from app.api.routes import auth, health, voice, audio, appointments, conversations, telegram, analytics, profiles
+from app.db.database import engine, async_engine, Base
+from app.services.cache_service import cache_service
+from app.services.http_clients import http_clients
+from app.services.outbox_service import outbox_dispatcher
+from app.services.rollup_service import rollup_service
+from app.services.telegram_service import telegram_service
+from app.utils.metrics import MetricsMiddleware, metrics_endpoint
+from app.utils.pagination import NEXT_CURSOR_HEADER
+from app.utils.profiling import PROFILE_ID_HEADER, ProfilerMiddleware, profile_store
 
 # Configure logging
 logger.remove()
@@ -19,12 +28,35 @@ logger.add(
 # Create database tables
 Base.metadata.create_all(bind=engine)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup and shutdown of shared resources"""
+    await cache_service.connect()
+    cache_service.start_sweeper()
+    http_clients.start()
+    if settings.ROLLUP_ENABLED:
+        rollup_service.start()
+    if settings.OUTBOX_DISPATCHER_ENABLED:
+        outbox_dispatcher.start()
+    if settings.TELEGRAM_BOT_TOKEN:
+        telegram_service.start()
+    yield
+    await telegram_service.stop()
+    await outbox_dispatcher.stop()
+    await rollup_service.stop()
+    await http_clients.close()
+    await cache_service.close()
+    await async_engine.dispose()
+
+
 # Initialize FastAPI app
 app = FastAPI(
     title=settings.APP_NAME,
     version=settings.VERSION,
     description=f"AI Voice Health Advisor for Ghana | Author: {settings.AUTHOR}",
-    debug=settings.DEBUG
+    debug=settings.DEBUG,
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -34,15 +66,35 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, PROFILE_ID_HEADER],
 )
 
+# Request metrics (exported at /metrics)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    app.add_route("/metrics", metrics_endpoint, include_in_schema=False)
+
+# Request profiling (requests with X-Profile, or a random sample; served at /api/profiles)
+if settings.PROFILER_ENABLED:
+    app.add_middleware(
+        ProfilerMiddleware,
+        store=profile_store,
+        sample_rate=settings.PROFILER_SAMPLE_RATE,
+        secret=settings.PROFILER_SECRET,
+        interval=settings.PROFILER_INTERVAL
+    )
+
 # Include routers
 app.include_router(health.router, prefix="/api", tags=["Health Check"])
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
 app.include_router(voice.router, prefix="/api/voice", tags=["Voice Interaction"])
+app.include_router(audio.router, prefix="/api/audio", tags=["Audio"])
 app.include_router(appointments.router, prefix="/api/appointments", tags=["Appointments"])
 app.include_router(conversations.router, prefix="/api/conversations", tags=["Conversations"])
 app.include_router(telegram.router, prefix="/api/telegram", tags=["Telegram Bot"])
+app.include_router(analytics.router, prefix="/api/analytics", tags=["Analytics"])
+if settings.PROFILER_ENABLED:
+    app.include_router(profiles.router, prefix="/api/profiles", tags=["Profiling"])
 
 
 @app.get("/")
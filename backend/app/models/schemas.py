@@ -35,12 +35,18 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     user_id: Optional[int] = None
+    token_version: int = 0
+    # Present only in tokens issued with AUTH_TRUST_TOKEN_CLAIMS
+    email: Optional[str] = None
+    is_active: Optional[bool] = None
+    expires_at: Optional[datetime] = None
 
 
 # Voice Interaction Schemas
 class VoiceRequest(BaseModel):
     audio_data: Optional[str] = None  # Base64 encoded audio
     text_message: Optional[str] = None  # Alternative to audio
+    generate_audio: bool = True  # False defers TTS until audio_url is first fetched
 
 
 class VoiceResponse(BaseModel):
@@ -51,6 +57,23 @@ class VoiceResponse(BaseModel):
     conversation_id: int
 
 
+class BatchTextRequest(BaseModel):
+    messages: List[str] = Field(..., min_length=1)
+
+
+class BatchTextResult(BaseModel):
+    index: int
+    text_response: str
+    is_emergency: bool = False
+    symptoms_detected: List[str] = []
+    llm_provider: str
+    conversation_id: Optional[int] = None
+
+
+class BatchTextResponse(BaseModel):
+    results: List[BatchTextResult]
+
+
 # Appointment Schemas
 class AppointmentCreate(BaseModel):
     full_name: str
@@ -85,12 +108,86 @@ class ConversationResponse(BaseModel):
     symptoms_extracted: Optional[List[str]]
     llm_provider: Optional[str]
     response_time_ms: Optional[int]
+    stage_timings: Optional[Dict[str, int]] = None
     created_at: datetime
 
     class Config:
         from_attributes = True
 
 
+class ConversationListItem(BaseModel):
+    """History entry; the full ai_response is only included when requested"""
+    id: int
+    user_message: str
+    ai_response: Optional[str] = None
+    ai_response_preview: str
+    response_audio_url: Optional[str]
+    is_emergency: bool
+    symptoms_extracted: Optional[List[str]]
+    llm_provider: Optional[str]
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+# Analytics Schemas
+class StageLatencyStats(BaseModel):
+    stage: str
+    provider: Optional[str] = None  # None = all providers
+    samples: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+
+
+class StageLatencyReport(BaseModel):
+    since: datetime
+    until: datetime
+    stages: List[StageLatencyStats]
+
+
+class LLMUsageBucket(BaseModel):
+    bucket_start: datetime
+    provider: str
+    model: str
+    calls: int
+    errors: int
+    avg_ms: float
+    max_ms: int
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+
+
+class LLMUsageReport(BaseModel):
+    since: datetime
+    until: datetime
+    granularity: str
+    buckets: List[LLMUsageBucket]
+
+
+class StageLatencyBucket(BaseModel):
+    bucket_start: datetime
+    stage: str
+    provider: Optional[str] = None  # None = all providers
+    samples: int
+    max_ms: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+
+
+class StageLatencySeries(BaseModel):
+    since: datetime
+    until: datetime
+    granularity: str
+    buckets: List[StageLatencyBucket]
+
+
 # Health Check Schema
 class HealthCheck(BaseModel):
     status: str
@@ -98,3 +195,16 @@ class HealthCheck(BaseModel):
     version: str
     author: str
     timestamp: datetime
+
+
+class DependencyStatus(BaseModel):
+    status: str  # ok, degraded, cold, unknown or down
+    critical: bool  # down makes the instance not ready
+    latency_ms: Optional[float] = None
+    detail: Optional[str] = None
+
+
+class ReadinessCheck(BaseModel):
+    status: str  # ready, degraded or not_ready
+    checked_at: datetime
+    dependencies: Dict[str, DependencyStatus]
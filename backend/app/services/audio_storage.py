@@ -0,0 +1,150 @@
+import os
+import re
+import uuid
+import tempfile
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Iterator, Optional
+from loguru import logger
+
+from app.config import settings
+
+
+class AudioStorage(ABC):
+    """
+    Pluggable blob store for synthesized audio
+
+    Backends implement the raw object operations (put/get/size/iter_range/delete).
+    Audio responses are stored as "<audio_id>.mp3"; when TTS is deferred, the text
+    to synthesize is stored as "<audio_id>.txt" until the audio is first fetched.
+    """
+
+    AUDIO_ID_PATTERN = re.compile(r"^[a-f0-9]{32}$")
+
+    @abstractmethod
+    def put(self, key: str, data: bytes) -> None:
+        """Store an object"""
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        """Read a whole object, or None if missing"""
+
+    @abstractmethod
+    def size(self, key: str) -> Optional[int]:
+        """Size of an object in bytes, or None if missing"""
+
+    @abstractmethod
+    def iter_range(self, key: str, start: int, end: int, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """Yield the bytes of an object from start to end (inclusive)"""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """Delete an object if it exists"""
+
+    @staticmethod
+    def new_audio_id() -> str:
+        """Generate an unguessable audio id"""
+        return uuid.uuid4().hex
+
+    @classmethod
+    def is_valid_audio_id(cls, audio_id: str) -> bool:
+        return bool(cls.AUDIO_ID_PATTERN.match(audio_id))
+
+    def url_for(self, audio_id: str) -> str:
+        """Public URL the client uses to stream the audio"""
+        return f"{settings.PUBLIC_BASE_URL.rstrip('/')}/api/audio/{audio_id}.mp3"
+
+    def save_audio(self, audio_id: str, audio_bytes: bytes) -> None:
+        self.put(f"{audio_id}.mp3", audio_bytes)
+
+    def audio_size(self, audio_id: str) -> Optional[int]:
+        return self.size(f"{audio_id}.mp3")
+
+    def iter_audio(self, audio_id: str, start: int, end: int) -> Iterator[bytes]:
+        return self.iter_range(f"{audio_id}.mp3", start, end)
+
+    def save_pending_text(self, audio_id: str, text: str) -> None:
+        """Store text whose synthesis is deferred until first fetch"""
+        self.put(f"{audio_id}.txt", text.encode("utf-8"))
+
+    def load_pending_text(self, audio_id: str) -> Optional[str]:
+        data = self.get(f"{audio_id}.txt")
+        return data.decode("utf-8") if data is not None else None
+
+    def discard_pending_text(self, audio_id: str) -> None:
+        self.delete(f"{audio_id}.txt")
+
+
+class LocalAudioStorage(AudioStorage):
+    """Audio storage on the local filesystem"""
+
+    KEY_PATTERN = re.compile(r"^[a-f0-9]{32}\.(mp3|txt)$")
+
+    def __init__(self, root_directory: str):
+        self.root = Path(root_directory)
+        self.root.mkdir(parents=True, exist_ok=True)
+        logger.info(f"Local audio storage at {self.root}")
+
+    def _path(self, key: str) -> Path:
+        if not self.KEY_PATTERN.match(key):
+            raise ValueError(f"Invalid audio storage key: {key}")
+        # Shard by prefix to keep directories small
+        return self.root / key[:2] / key
+
+    def put(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write atomically so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self._path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def size(self, key: str) -> Optional[int]:
+        try:
+            return self._path(key).stat().st_size
+        except FileNotFoundError:
+            return None
+
+    def iter_range(self, key: str, start: int, end: int, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        with open(self._path(key), "rb") as f:
+            f.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = f.read(min(chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+    def delete(self, key: str) -> None:
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _create_audio_storage() -> AudioStorage:
+    """Create the configured audio storage backend"""
+    backend = settings.AUDIO_STORAGE_BACKEND.lower()
+
+    if backend == "local":
+        return LocalAudioStorage(settings.AUDIO_STORAGE_DIR)
+
+    raise ValueError(f"Unsupported AUDIO_STORAGE_BACKEND: {settings.AUDIO_STORAGE_BACKEND}")
+
+
+# Singleton instance
+audio_storage = _create_audio_storage()
@@ -1,86 +1,617 @@
-import redis
-import json
-from typing import Optional, Any
+import math
+import time
+import random
+import asyncio
+from collections import OrderedDict
+from fnmatch import fnmatchcase
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
 from loguru import logger
+from redis.asyncio import ConnectionPool, Redis
+from redis.exceptions import ConnectionError as RedisConnectionError, TimeoutError as RedisTimeoutError
 from app.config import settings
+from app.utils.metrics import CACHE_LOADS, CACHE_REDIS_UP, record_cache_lookup
+from app.utils.serialization import ValueCodec
+
+# Errors that mean Redis itself is unreachable, rather than one bad command
+_CONNECTION_ERRORS = (RedisConnectionError, RedisTimeoutError, OSError)
+
+# Namespace generation counters, and the lock that lets one worker sweep at a time
+GENERATION_PREFIX = "cache:gen:"
+SWEEP_LOCK_KEY = "cache:sweep:lock"
+
+_MISSING = object()
+
+
+class LocalCache:
+    """
+    In-process LRU with per-entry TTL
+
+    Values are stored as-is, not copied: callers must treat what they get
+    back as read-only.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Any:
+        """Value for key, or _MISSING if absent or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return _MISSING
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: str, value: Any, ttl: float):
+        if self.max_entries <= 0 or ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, *keys: str):
+        for key in keys:
+            self._entries.pop(key, None)
+
+    def clear_pattern(self, pattern: str):
+        for key in [key for key in self._entries if fnmatchcase(key, pattern)]:
+            del self._entries[key]
+
+
+class _LoadCancelled(Exception):
+    """The request running a shared load was cancelled; waiters load for themselves"""
 
 
 class CacheService:
-    """Redis cache service using Upstash"""
+    """
+    Two-tier async cache: an in-process LRU in front of Redis (Upstash)
+
+    Reads check the local tier first, then Redis; Redis hits are kept locally
+    for at most local_ttl seconds, which bounds how stale one worker's view
+    can be after another worker changes a key. Writes and deletes go to both
+    tiers. All requests share one Redis connection pool, and values are
+    encoded by a ValueCodec (msgpack by default, zlib-compressed when large).
+
+    If Redis is unreachable at startup or a command fails to connect, the
+    cache keeps working from the local tier only (degraded mode) while a
+    background task reconnects with exponential backoff.
 
-    def __init__(self):
+    Groups of keys can be invalidated together by putting them in a
+    namespace (namespace_key()) and bumping its generation counter
+    (invalidate_namespace()): O(1), and visible to every worker within
+    generation_ttl seconds. Keys of old generations expire on their own; a
+    SCAN-based sweeper removes them sooner.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        max_connections: int = 20,
+        socket_timeout: float = 2.0,
+        codec: Optional[ValueCodec] = None,
+        local_max_entries: int = 10000,
+        local_ttl: float = 30,
+        early_refresh_beta: float = 1.0,
+        reconnect_max_delay: float = 30.0,
+        generation_ttl: float = 5.0,
+        sweep_interval: int = 600,
+        sweep_batch_size: int = 500
+    ):
+        self.codec = codec or ValueCodec()
+        self.pool = ConnectionPool.from_url(
+            url,
+            max_connections=max_connections,
+            socket_timeout=socket_timeout,
+            socket_connect_timeout=socket_timeout,
+            health_check_interval=30
+        )
+        self.redis_client = Redis(connection_pool=self.pool)
+        self.local = LocalCache(local_max_entries)
+        self.local_ttl = local_ttl
+        self.early_refresh_beta = early_refresh_beta
+        self.reconnect_max_delay = reconnect_max_delay
+        self.generation_ttl = generation_ttl
+        self.sweep_interval = sweep_interval
+        self.sweep_batch_size = sweep_batch_size
+        self.available = False  # Redis reachable; False means local tier only
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._reconnect_task: Optional[asyncio.Task] = None
+        self._sweep_task: Optional[asyncio.Task] = None
+        # namespace -> (monotonic time the copy goes stale, generation)
+        self._generations: Dict[str, Tuple[float, int]] = {}
+        # Namespaces invalidated while Redis was down; bumped there on reconnect
+        self._pending_bumps: Set[str] = set()
+
+    async def connect(self) -> bool:
+        """Check the connection; if Redis is unreachable, keep retrying in the background"""
         try:
-            self.redis_client = redis.from_url(
-                settings.REDIS_URL,
-                decode_responses=True
-            )
-            # Test connection
-            self.redis_client.ping()
+            await self.redis_client.ping()
+            self._set_available(True)
             logger.info("Redis cache connected successfully")
         except Exception as e:
-            logger.warning(f"Redis connection failed: {str(e)}")
-            self.redis_client = None
+            logger.warning(f"Redis connection failed, using the local cache tier only: {str(e)}")
+            self._set_available(False)
+            self._start_reconnect()
+        return self.available
 
-    def get(self, key: str) -> Optional[Any]:
-        """Get value from cache"""
-        if not self.redis_client:
-            return None
+    def start_sweeper(self):
+        """Periodically remove keys of old namespace generations (app lifespan only)"""
+        if self.sweep_interval <= 0 or (self._sweep_task is not None and not self._sweep_task.done()):
+            return
+        self._sweep_task = asyncio.get_running_loop().create_task(self._sweep_loop())
+        logger.info(f"Cache sweeper started (every {self.sweep_interval}s)")
+
+    async def close(self):
+        for task in (self._reconnect_task, self._sweep_task):
+            if task is None:
+                continue
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._reconnect_task = self._sweep_task = None
+
+        await self.redis_client.aclose()
+        await self.pool.disconnect()
+
+    def _set_available(self, available: bool):
+        self.available = available
+        CACHE_REDIS_UP.set(1 if available else 0)
+
+    def _start_reconnect(self):
+        if self._reconnect_task is not None and not self._reconnect_task.done():
+            return
+        try:
+            self._reconnect_task = asyncio.get_running_loop().create_task(self._reconnect())
+        except RuntimeError:
+            pass  # No event loop (e.g. at import time); connect() starts it later
 
+    async def _reconnect(self):
+        """Ping with exponential backoff (and jitter) until Redis answers"""
+        delay = 1.0
+        while True:
+            await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+            try:
+                await self.redis_client.ping()
+            except Exception as e:
+                logger.debug(f"Redis still unreachable: {str(e)}")
+                delay = min(delay * 2, self.reconnect_max_delay)
+                continue
+
+            self._set_available(True)
+            logger.info("Redis cache reconnected")
+            await self._flush_pending_bumps()
+            return
+
+    async def _flush_pending_bumps(self):
+        """Apply invalidations made in degraded mode to the shared generation counters"""
+        for namespace in list(self._pending_bumps):
+            try:
+                await self.redis_client.incr(GENERATION_PREFIX + namespace)
+            except Exception as e:
+                self._failed("invalidate", e)
+                return
+            self._pending_bumps.discard(namespace)
+            self._generations.pop(namespace, None)
+
+    def _failed(self, operation: str, error: Exception):
+        """Log a failed Redis command; connection failures switch to degraded mode"""
+        if not isinstance(error, _CONNECTION_ERRORS):
+            logger.error(f"Cache {operation} error: {str(error)}")
+            return
+
+        if self.available:
+            logger.warning(f"Redis unreachable, using the local cache tier only: {str(error)}")
+            self._set_available(False)
+        self._start_reconnect()
+
+    def _decode(self, key: str, data: Optional[bytes]) -> Optional[Any]:
+        record_cache_lookup("redis", hit=data is not None)
+        if data is None:
+            return None
         try:
-            value = self.redis_client.get(key)
-            if value:
-                return json.loads(value)
+            return self.codec.decode(data)
+        except Exception as e:
+            logger.warning(f"Cache value for {key} could not be decoded: {str(e)}")
+            return None
+
+    def _get_local(self, key: str) -> Any:
+        value = self.local.get(key)
+        record_cache_lookup("local", hit=value is not _MISSING)
+        return value
+
+    async def get(self, key: str, shared: bool = True) -> Optional[Any]:
+        """
+        Get value from cache
+
+        Args:
+            key: Cache key
+            shared: Fall back to Redis on a local miss (False: this process only)
+        """
+        value = self._get_local(key)
+        if value is not _MISSING:
+            return value
+
+        return await self._get_redis(key) if shared else None
+
+    async def _get_redis(self, key: str) -> Optional[Any]:
+        """Redis lookup for a local miss; the value is then kept locally"""
+        if not self.available:
             return None
+
+        try:
+            value = self._decode(key, await self.redis_client.get(key))
         except Exception as e:
-            logger.error(f"Cache get error: {str(e)}")
+            self._failed("get", e)
             return None
 
-    def set(self, key: str, value: Any, expire: int = 3600):
+        if value is not None:
+            self.local.set(key, value, self.local_ttl)
+        return value
+
+    async def set(self, key: str, value: Any, expire: int = 3600, shared: bool = True) -> bool:
         """
         Set value in cache
 
         Args:
             key: Cache key
-            value: Value to cache (will be JSON serialized)
+            value: Value to cache (serialized by the codec)
             expire: Expiration time in seconds (default 1 hour)
+            shared: Also store in Redis (False: this process only)
+
+        Returns:
+            Whether the value reached Redis
         """
-        if not self.redis_client:
+        self.local.set(key, value, min(expire, self.local_ttl))
+
+        if not shared or not self.available:
             return False
 
         try:
-            serialized = json.dumps(value)
-            self.redis_client.setex(key, expire, serialized)
+            await self.redis_client.set(key, self.codec.encode(value), ex=expire)
             return True
         except Exception as e:
-            logger.error(f"Cache set error: {str(e)}")
+            self._failed("set", e)
             return False
 
-    def delete(self, key: str):
-        """Delete key from cache"""
-        if not self.redis_client:
+    async def add(self, key: str, value: Any = 1, expire: int = 3600) -> bool:
+        """
+        Set a key only if it is not already set (SET NX), e.g. to deduplicate events
+
+        While Redis is unreachable, only this process's keys are checked.
+
+        Returns:
+            True if the key was set, False if it already existed
+        """
+        if self.local.get(key) is not _MISSING:
+            return False
+        self.local.set(key, value, expire)
+
+        if not self.available:
+            return True
+
+        try:
+            return bool(await self.redis_client.set(key, self.codec.encode(value), nx=True, ex=expire))
+        except Exception as e:
+            self._failed("add", e)
+            return True
+
+    async def mget(self, keys: List[str]) -> List[Optional[Any]]:
+        """Get several values, fetching local misses from Redis in one round trip; None for each miss"""
+        values = [self._get_local(key) for key in keys]
+        missing = [i for i, value in enumerate(values) if value is _MISSING]
+
+        if missing and self.available:
+            try:
+                found = await self.redis_client.mget([keys[i] for i in missing])
+            except Exception as e:
+                self._failed("mget", e)
+            else:
+                for i, data in zip(missing, found):
+                    values[i] = self._decode(keys[i], data)
+                    if values[i] is not None:
+                        self.local.set(keys[i], values[i], self.local_ttl)
+
+        return [None if value is _MISSING else value for value in values]
+
+    async def mset(self, values: Dict[str, Any], expire: int = 3600) -> bool:
+        """
+        Set several values with the same expiry in one round trip
+
+        MSET cannot set a TTL, so this pipelines one SET per key instead.
+        """
+        for key, value in values.items():
+            self.local.set(key, value, min(expire, self.local_ttl))
+
+        if not self.available or not values:
             return False
 
         try:
-            self.redis_client.delete(key)
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for key, value in values.items():
+                    pipe.set(key, self.codec.encode(value), ex=expire)
+                await pipe.execute()
             return True
         except Exception as e:
-            logger.error(f"Cache delete error: {str(e)}")
+            self._failed("mset", e)
             return False
 
-    def clear_pattern(self, pattern: str):
-        """Delete all keys matching pattern"""
-        if not self.redis_client:
+    async def get_or_set(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        expire: int = 3600,
+        shared: bool = True
+    ) -> Optional[Any]:
+        """
+        Cached value for key, computed by loader when missing
+
+        Guards hot keys against stampedes in two ways: concurrent misses in
+        this process share one loader call, and each hit may refresh the
+        entry shortly before it expires, with a probability that grows as
+        expiry nears and with how long the loader took (XFetch). The entry is
+        then usually rebuilt by one caller while the rest are still served
+        from the cache. None results are not cached.
+
+        Entries carry their load time and expiry, so keys written here must
+        only be read through get_or_set.
+
+        Args:
+            key: Cache key
+            loader: Coroutine function computing the value
+            expire: Expiration time in seconds
+            shared: Also store in Redis (False: this process only)
+
+        Returns:
+            The cached or freshly loaded value
+        """
+        entry = self._get_local(key)
+        if entry is _MISSING:
+            # A load already in flight will fill the local tier; skip Redis
+            entry = await self._get_redis(key) if shared and key not in self._inflight else None
+        entry = entry if isinstance(entry, list) and len(entry) == 3 else None
+
+        if entry is not None:
+            value, delta, expires_at = entry
+            now = time.time()
+            if now < expires_at:
+                if key in self._inflight or not self._refresh_early(now, delta, expires_at):
+                    return value
+                try:
+                    return await self._load(key, loader, expire, shared, "early_refresh")
+                except Exception as e:
+                    logger.warning(f"Early refresh of {key} failed, serving the cached value: {str(e)}")
+                    return value
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            CACHE_LOADS.labels("collapsed").inc()
+            try:
+                return await asyncio.shield(inflight)
+            except _LoadCancelled:
+                pass
+
+        return await self._load(key, loader, expire, shared, "miss")
+
+    def _refresh_early(self, now: float, delta: float, expires_at: float) -> bool:
+        # -log(U) is exponentially distributed, so early refreshes are rare
+        # until expires_at - now is within a few multiples of the load time
+        return now - delta * self.early_refresh_beta * math.log(1.0 - random.random()) >= expires_at
+
+    async def _load(self, key: str, loader: Callable[[], Awaitable[Any]], expire: int, shared: bool, reason: str):
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        CACHE_LOADS.labels(reason).inc()
+
+        try:
+            start = time.perf_counter()
+            value = await loader()
+            delta = time.perf_counter() - start
+
+            if value is not None:
+                await self.set(key, [value, delta, time.time() + expire], expire, shared=shared)
+            future.set_result(value)
+            return value
+
+        except asyncio.CancelledError:
+            future.set_exception(_LoadCancelled())
+            raise
+
+        except Exception as e:
+            future.set_exception(e)
+            raise
+
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            if not future.done():
+                future.cancel()
+            elif not future.cancelled():
+                future.exception()  # Retrieved, so an unawaited failure is not logged again
+
+    def pipeline(self):
+        """
+        Raw pipeline for other batched commands, e.g.
+
+            async with cache_service.pipeline() as pipe:
+                pipe.incr(key)
+                pipe.expire(key, 60)
+                await pipe.execute()
+
+        Values are not encoded and the local tier is bypassed.
+        """
+        return self.redis_client.pipeline(transaction=False)
+
+    async def delete(self, *keys: str) -> bool:
+        """
+        Delete keys from both tiers
+
+        While Redis is unreachable only the local tier is cleared; the Redis
+        copies expire on their own.
+        """
+        self.local.delete(*keys)
+
+        if not self.available or not keys:
             return False
 
         try:
-            keys = self.redis_client.keys(pattern)
-            if keys:
-                self.redis_client.delete(*keys)
+            await self.redis_client.delete(*keys)
             return True
         except Exception as e:
-            logger.error(f"Cache clear error: {str(e)}")
+            self._failed("delete", e)
             return False
 
+    async def clear_pattern(self, pattern: str) -> bool:
+        """
+        Delete all keys matching pattern
+
+        Walks the keyspace with SCAN rather than KEYS, so Redis keeps serving
+        other clients, but it still visits every key: prefer namespaces and
+        invalidate_namespace() for anything on a request path.
+        """
+        self.local.clear_pattern(pattern)
+
+        if not self.available:
+            return False
+
+        try:
+            await self._scan_unlink(pattern)
+            return True
+        except Exception as e:
+            self._failed("clear", e)
+            return False
+
+    async def _scan_unlink(self, pattern: str, keep: Optional[Callable[[bytes], bool]] = None) -> int:
+        """UNLINK keys matching pattern (except those keep() accepts), a batch at a time"""
+        removed, batch = 0, []
+        async for key in self.redis_client.scan_iter(match=pattern, count=self.sweep_batch_size):
+            if keep is not None and keep(key):
+                continue
+            batch.append(key)
+            if len(batch) >= self.sweep_batch_size:
+                removed += await self.redis_client.unlink(*batch)
+                batch = []
+        if batch:
+            removed += await self.redis_client.unlink(*batch)
+        return removed
+
+    async def generation(self, namespace: str) -> int:
+        """
+        Current generation of a namespace
+
+        Read from Redis at most every generation_ttl seconds per worker; while
+        Redis is down the last known value is used.
+        """
+        known = self._generations.get(namespace)
+        now = time.monotonic()
+        if known is not None and (known[0] > now or not self.available):
+            return known[1]
+
+        generation = known[1] if known is not None else 0
+        if self.available and namespace not in self._pending_bumps:
+            try:
+                generation = int(await self.redis_client.get(GENERATION_PREFIX + namespace) or 0)
+            except Exception as e:
+                self._failed("generation", e)
+
+        self._generations[namespace] = (now + self.generation_ttl, generation)
+        return generation
+
+    async def namespace_key(self, namespace: str, key: Any) -> str:
+        """Key for a value in namespace, valid until the namespace is invalidated"""
+        return f"{namespace}:v{await self.generation(namespace)}:{key}"
+
+    def known_namespace_key(self, namespace: str, key: Any) -> str:
+        """namespace_key() from this worker's last known generation, without a round trip"""
+        known = self._generations.get(namespace)
+        return f"{namespace}:v{known[1] if known is not None else 0}:{key}"
+
+    async def invalidate_namespace(self, namespace: str) -> int:
+        """
+        Invalidate every key in a namespace in O(1)
+
+        Bumps the namespace's generation, so namespace_key() returns new keys
+        and the old ones are never read again. Takes effect at once in this
+        worker and within generation_ttl seconds in the others. While Redis
+        is down the bump is local and applied to Redis on reconnect.
+
+        Returns:
+            The new generation
+        """
+        known = self._generations.get(namespace)
+        generation = (known[1] if known is not None else 0) + 1
+
+        if self.available:
+            try:
+                generation = await self.redis_client.incr(GENERATION_PREFIX + namespace)
+            except Exception as e:
+                self._failed("invalidate", e)
+                self._pending_bumps.add(namespace)
+        else:
+            self._pending_bumps.add(namespace)
+
+        self._generations[namespace] = (time.monotonic() + self.generation_ttl, generation)
+        self.local.clear_pattern(f"{namespace}:*")
+        logger.info(f"Cache namespace {namespace} invalidated (generation {generation})")
+        return generation
+
+    async def sweep(self) -> int:
+        """
+        Delete the Redis keys of old generations of the namespaces this worker uses
+
+        Returns:
+            Number of keys removed
+        """
+        removed = 0
+        for namespace in list(self._generations):
+            current = await self.generation(namespace)
+            prefix = f"{namespace}:v".encode()
+
+            def is_current(key: bytes) -> bool:
+                version = key[len(prefix):].split(b":", 1)[0]
+                return not version.isdigit() or int(version) >= current
+
+            removed += await self._scan_unlink(f"{namespace}:v*", keep=is_current)
+        return removed
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            if not self.available:
+                continue
+            try:
+                # One worker sweeps per interval
+                if not await self.redis_client.set(SWEEP_LOCK_KEY, b"1", nx=True, ex=self.sweep_interval):
+                    continue
+                removed = await self.sweep()
+                if removed:
+                    logger.info(f"Cache sweeper removed {removed} stale keys")
+            except Exception as e:
+                self._failed("sweep", e)
+
 
-# Singleton instance
-cache_service = CacheService()
+# Singleton instance (connected in the app lifespan)
+cache_service = CacheService(
+    settings.REDIS_URL,
+    max_connections=settings.REDIS_MAX_CONNECTIONS,
+    socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+    codec=ValueCodec(
+        serializer=settings.CACHE_SERIALIZER,
+        compress_min_bytes=settings.CACHE_COMPRESS_MIN_BYTES
+    ),
+    local_max_entries=settings.CACHE_LOCAL_MAX_ENTRIES,
+    local_ttl=settings.CACHE_LOCAL_TTL,
+    early_refresh_beta=settings.CACHE_EARLY_REFRESH_BETA,
+    reconnect_max_delay=settings.REDIS_RECONNECT_MAX_DELAY,
+    generation_ttl=settings.CACHE_GENERATION_TTL,
+    sweep_interval=settings.CACHE_SWEEP_INTERVAL_SECONDS,
+    sweep_batch_size=settings.CACHE_SWEEP_BATCH_SIZE
+)
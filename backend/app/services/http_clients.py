@@ -0,0 +1,106 @@
+import importlib.util
+from dataclasses import dataclass
+from typing import Dict, Optional
+import httpx
+from loguru import logger
+
+from app.config import settings
+from app.utils.metrics import HTTP_CLIENT_CONNECTIONS, HTTP_CLIENT_REQUESTS
+
+# HTTP/2 needs the h2 package (httpx[http2]); without it clients use HTTP/1.1
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+@dataclass
+class Upstream:
+    """An external service called over HTTP"""
+    base_url: str = ""
+    timeout: float = 10.0  # Read/write/pool timeout, seconds
+
+
+class HTTPClientManager:
+    """
+    Shared outbound HTTP clients, one keep-alive pool per upstream
+
+    Opened in the app lifespan (start()) and closed on shutdown (close());
+    get() also creates a client on first use, for scripts. Every request is
+    traced, so medivoice_http_client_connections_total against
+    medivoice_http_client_requests_total shows how often connections are
+    reused.
+    """
+
+    def __init__(
+        self,
+        upstreams: Dict[str, Upstream],
+        http2: bool = True,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        connect_timeout: float = 5.0
+    ):
+        self.upstreams = upstreams
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.connect_timeout = connect_timeout
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+
+        if http2 and not HTTP2_AVAILABLE:
+            logger.warning("h2 is not installed; outbound HTTP clients use HTTP/1.1")
+
+    def start(self):
+        """Open a client for every upstream"""
+        for name in self.upstreams:
+            self.get(name)
+        logger.info(f"HTTP clients ready: {', '.join(self.upstreams)} ({'HTTP/2' if self.http2 else 'HTTP/1.1'})")
+
+    def get(self, name: str) -> httpx.AsyncClient:
+        """The shared client for an upstream"""
+        client = self._clients.get(name)
+        if client is None or client.is_closed:
+            client = self._clients[name] = self._create(name, self.upstreams[name])
+        return client
+
+    def _create(self, name: str, upstream: Upstream) -> httpx.AsyncClient:
+        async def trace(event: str, info: dict):
+            # Emitted by httpcore only when the pool has no reusable connection
+            if event == "connection.connect_tcp.complete":
+                HTTP_CLIENT_CONNECTIONS.labels(name, "tcp").inc()
+            elif event == "connection.start_tls.complete":
+                HTTP_CLIENT_CONNECTIONS.labels(name, "tls").inc()
+
+        async def on_request(request: httpx.Request):
+            request.extensions["trace"] = trace
+
+        async def on_response(response: httpx.Response):
+            HTTP_CLIENT_REQUESTS.labels(name, response.http_version).inc()
+
+        return httpx.AsyncClient(
+            base_url=upstream.base_url,
+            http2=self.http2,
+            limits=self.limits,
+            timeout=httpx.Timeout(upstream.timeout, connect=self.connect_timeout),
+            event_hooks={"request": [on_request], "response": [on_response]}
+        )
+
+    async def close(self):
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+
+# Singleton instance (opened in the app lifespan)
+http_clients = HTTPClientManager(
+    upstreams={
+        "n8n": Upstream(timeout=settings.N8N_WEBHOOK_TIMEOUT),
+        "telegram": Upstream(base_url=settings.TELEGRAM_API_BASE, timeout=settings.TELEGRAM_TIMEOUT),
+    },
+    http2=settings.HTTP_CLIENT_HTTP2,
+    max_connections=settings.HTTP_CLIENT_MAX_CONNECTIONS,
+    max_keepalive_connections=settings.HTTP_CLIENT_MAX_KEEPALIVE,
+    keepalive_expiry=settings.HTTP_CLIENT_KEEPALIVE_EXPIRY,
+    connect_timeout=settings.HTTP_CLIENT_CONNECT_TIMEOUT
+)
@@ -1,14 +1,15 @@
 import time
 import httpx
-from typing import Optional, Tuple
+from typing import AsyncIterator, List, Optional, Tuple
 from loguru import logger
-from openai import OpenAI
+from openai import AsyncOpenAI
 import google.generativeai as genai
-from groq import Groq
+from groq import AsyncGroq
 
 from app.config import settings
 from app.db.models import LLMLog
-from sqlalchemy.orm import Session
+from app.utils.metrics import observe_provider_call
+from sqlalchemy.ext.asyncio import AsyncSession
 
 
 class LLMService:
@@ -17,18 +18,23 @@ class LLMService:
     def __init__(self):
         self.disclaimer = "\n\n⚠️ **DISCLAIMER**: This is not medical advice. Please consult a qualified healthcare professional for proper diagnosis and treatment."
 
+        # Async clients, reused so their connections stay warm across calls; created on first use
+        self._grok_client: Optional[AsyncOpenAI] = None
+        self._groq_client: Optional[AsyncGroq] = None
+
     async def generate_response(
         self,
         prompt: str,
         medical_context: str = "",
-        db: Optional[Session] = None
+        db: Optional[AsyncSession] = None,
+        history: str = ""
     ) -> Tuple[str, str]:
         """
         Generate response with fallback chain
         Returns: (response_text, provider_used)
         """
 
-        full_prompt = self._build_prompt(prompt, medical_context)
+        full_prompt = self._build_prompt(prompt, medical_context, history)
 
         # Try Grok (xAI) first
         if settings.XAI_API_KEY:
@@ -52,8 +58,88 @@ class LLMService:
         logger.error("All LLM providers failed")
         return "I apologize, but I'm experiencing technical difficulties. Please try again later." + self.disclaimer, "none"
 
-    def _build_prompt(self, user_message: str, medical_context: str = "") -> str:
-        """Build the full prompt with system instructions and context"""
+    async def generate_response_stream(
+        self,
+        prompt: str,
+        medical_context: str = "",
+        db: Optional[AsyncSession] = None,
+        history: str = ""
+    ) -> AsyncIterator[Tuple[str, str]]:
+        """
+        Stream response text with the same fallback chain as generate_response
+
+        A provider is only skipped if it fails before producing any text;
+        text already sent to the client cannot be taken back.
+
+        Yields: (text_delta, provider_used)
+        """
+
+        full_prompt = self._build_prompt(prompt, medical_context, history)
+
+        providers = []
+        if settings.XAI_API_KEY:
+            providers.append(("grok", self._stream_grok))
+        if settings.GROQ_API_KEY:
+            providers.append(("groq", self._stream_groq))
+        if settings.GOOGLE_API_KEY:
+            providers.append(("gemini", self._stream_gemini))
+
+        for provider, stream in providers:
+            produced_text = False
+            try:
+                async for delta in stream(full_prompt, db):
+                    produced_text = True
+                    yield delta, provider
+            except Exception as e:
+                if not produced_text:
+                    continue
+                logger.error(f"{provider} stream interrupted: {str(e)}")
+
+            if produced_text:
+                yield self.disclaimer, provider
+                return
+
+        # All failed
+        logger.error("All LLM providers failed")
+        yield "I apologize, but I'm experiencing technical difficulties. Please try again later." + self.disclaimer, "none"
+
+    async def generate_completion(self, prompt: str, db: Optional[AsyncSession] = None) -> Tuple[Optional[str], str]:
+        """
+        Complete a raw prompt with the fallback chain (no system prompt or disclaimer)
+
+        Used for internal tasks such as summarizing conversations.
+        Returns: (text or None if all providers failed, provider_used)
+        """
+        if settings.XAI_API_KEY:
+            response = await self._try_grok(prompt, db)
+            if response:
+                return response, "grok"
+
+        if settings.GROQ_API_KEY:
+            response = await self._try_groq(prompt, db)
+            if response:
+                return response, "groq"
+
+        if settings.GOOGLE_API_KEY:
+            response = await self._try_gemini(prompt, db)
+            if response:
+                return response, "gemini"
+
+        return None, "none"
+
+    @property
+    def configured_providers(self) -> List[str]:
+        """Providers with an API key, in fallback order"""
+        return [
+            provider for provider, key in (
+                ("grok", settings.XAI_API_KEY),
+                ("groq", settings.GROQ_API_KEY),
+                ("gemini", settings.GOOGLE_API_KEY)
+            ) if key
+        ]
+
+    def _build_prompt(self, user_message: str, medical_context: str = "", history: str = "") -> str:
+        """Build the full prompt with system instructions, conversation history and context"""
 
         system_prompt = """You are MediVoice GH, an AI health advisor for Ghana.
 
@@ -73,6 +159,12 @@ Guidelines:
 
 Remember: You are an information tool, not a replacement for medical professionals."""
 
+        if history:
+            system_prompt = f"""{system_prompt}
+
+CONVERSATION SO FAR (use it to understand follow-up questions):
+{history}"""
+
         if medical_context:
             return f"""{system_prompt}
 
@@ -91,32 +183,31 @@ USER MESSAGE:
 
 Provide a helpful response:"""
 
-    async def _try_grok(self, prompt: str, db: Optional[Session]) -> Optional[str]:
+    async def _try_grok(self, prompt: str, db: Optional[AsyncSession]) -> Optional[str]:
         """Try Grok (xAI) API"""
         start_time = time.time()
         try:
-            client = OpenAI(
-                api_key=settings.XAI_API_KEY,
-                base_url=settings.XAI_API_BASE
-            )
-
-            response = client.chat.completions.create(
-                model="grok-beta",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7,
-                max_tokens=500
-            )
+            with observe_provider_call("llm", "grok"):
+                response = await self._grok().chat.completions.create(
+                    model="grok-beta",
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0.7,
+                    max_tokens=500
+                )
 
             response_time_ms = int((time.time() - start_time) * 1000)
 
             # Log success
             if db:
-                self._log_llm_call(
+                await self._log_llm_call(
                     db=db,
                     provider="grok",
                     model="grok-beta",
                     response_time_ms=response_time_ms,
-                    success=True
+                    success=True,
+                    prompt_tokens=getattr(response.usage, "prompt_tokens", None),
+                    completion_tokens=getattr(response.usage, "completion_tokens", None),
+                    total_tokens=getattr(response.usage, "total_tokens", None)
                 )
 
             logger.info(f"Grok response generated in {response_time_ms}ms")
@@ -128,7 +219,7 @@ Provide a helpful response:"""
 
             # Log failure
             if db:
-                self._log_llm_call(
+                await self._log_llm_call(
                     db=db,
                     provider="grok",
                     model="grok-beta",
@@ -138,29 +229,31 @@ Provide a helpful response:"""
                 )
             return None
 
-    async def _try_groq(self, prompt: str, db: Optional[Session]) -> Optional[str]:
+    async def _try_groq(self, prompt: str, db: Optional[AsyncSession]) -> Optional[str]:
         """Try Groq API"""
         start_time = time.time()
         try:
-            client = Groq(api_key=settings.GROQ_API_KEY)
-
-            response = client.chat.completions.create(
-                model="llama-3.1-70b-versatile",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.7,
-                max_tokens=500
-            )
+            with observe_provider_call("llm", "groq"):
+                response = await self._groq().chat.completions.create(
+                    model="llama-3.1-70b-versatile",
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0.7,
+                    max_tokens=500
+                )
 
             response_time_ms = int((time.time() - start_time) * 1000)
 
             # Log success
             if db:
-                self._log_llm_call(
+                await self._log_llm_call(
                     db=db,
                     provider="groq",
                     model="llama-3.1-70b-versatile",
                     response_time_ms=response_time_ms,
-                    success=True
+                    success=True,
+                    prompt_tokens=getattr(response.usage, "prompt_tokens", None),
+                    completion_tokens=getattr(response.usage, "completion_tokens", None),
+                    total_tokens=getattr(response.usage, "total_tokens", None)
                 )
 
             logger.info(f"Groq response generated in {response_time_ms}ms")
@@ -172,7 +265,7 @@ Provide a helpful response:"""
 
             # Log failure
             if db:
-                self._log_llm_call(
+                await self._log_llm_call(
                     db=db,
                     provider="groq",
                     model="llama-3.1-70b-versatile",
@@ -182,31 +275,36 @@ Provide a helpful response:"""
                 )
             return None
 
-    async def _try_gemini(self, prompt: str, db: Optional[Session]) -> Optional[str]:
+    async def _try_gemini(self, prompt: str, db: Optional[AsyncSession]) -> Optional[str]:
         """Try Gemini API"""
         start_time = time.time()
         try:
             genai.configure(api_key=settings.GOOGLE_API_KEY)
             model = genai.GenerativeModel('gemini-1.5-flash')
 
-            response = model.generate_content(
-                prompt,
-                generation_config=genai.GenerationConfig(
-                    temperature=0.7,
-                    max_output_tokens=500
+            with observe_provider_call("llm", "gemini"):
+                response = await model.generate_content_async(
+                    prompt,
+                    generation_config=genai.GenerationConfig(
+                        temperature=0.7,
+                        max_output_tokens=500
+                    )
                 )
-            )
 
             response_time_ms = int((time.time() - start_time) * 1000)
 
             # Log success
             if db:
-                self._log_llm_call(
+                usage = getattr(response, "usage_metadata", None)
+                await self._log_llm_call(
                     db=db,
                     provider="gemini",
                     model="gemini-1.5-flash",
                     response_time_ms=response_time_ms,
-                    success=True
+                    success=True,
+                    prompt_tokens=getattr(usage, "prompt_token_count", None),
+                    completion_tokens=getattr(usage, "candidates_token_count", None),
+                    total_tokens=getattr(usage, "total_token_count", None)
                 )
 
             logger.info(f"Gemini response generated in {response_time_ms}ms")
@@ -218,7 +316,7 @@ Provide a helpful response:"""
 
             # Log failure
             if db:
-                self._log_llm_call(
+                await self._log_llm_call(
                     db=db,
                     provider="gemini",
                     model="gemini-1.5-flash",
@@ -228,26 +326,158 @@ Provide a helpful response:"""
                 )
             return None
 
-    def _log_llm_call(
+    def _grok(self) -> AsyncOpenAI:
+        """The shared Grok (xAI) client"""
+        if self._grok_client is None:
+            self._grok_client = AsyncOpenAI(
+                api_key=settings.XAI_API_KEY,
+                base_url=settings.XAI_API_BASE
+            )
+        return self._grok_client
+
+    def _groq(self) -> AsyncGroq:
+        """The shared Groq client"""
+        if self._groq_client is None:
+            self._groq_client = AsyncGroq(api_key=settings.GROQ_API_KEY)
+        return self._groq_client
+
+    async def _stream_grok(self, prompt: str, db: Optional[AsyncSession]) -> AsyncIterator[str]:
+        """Stream from Grok (xAI) API"""
+        async for delta in self._stream_chat_completion(self._grok(), "grok", "grok-beta", prompt, db):
+            yield delta
+
+    async def _stream_groq(self, prompt: str, db: Optional[AsyncSession]) -> AsyncIterator[str]:
+        """Stream from Groq API"""
+        async for delta in self._stream_chat_completion(self._groq(), "groq", "llama-3.1-70b-versatile", prompt, db):
+            yield delta
+
+    async def _stream_chat_completion(
+        self,
+        client,
+        provider: str,
+        model: str,
+        prompt: str,
+        db: Optional[AsyncSession]
+    ) -> AsyncIterator[str]:
+        """Stream an OpenAI-compatible chat completion, logging the call"""
+        start_time = time.time()
+        try:
+            with observe_provider_call("llm", provider):
+                stream = await client.chat.completions.create(
+                    model=model,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=0.7,
+                    max_tokens=500,
+                    stream=True
+                )
+
+                async for chunk in stream:
+                    if chunk.choices and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+
+        except Exception as e:
+            response_time_ms = int((time.time() - start_time) * 1000)
+            logger.warning(f"{provider} stream failed: {str(e)}")
+
+            if db:
+                await self._log_llm_call(
+                    db=db,
+                    provider=provider,
+                    model=model,
+                    response_time_ms=response_time_ms,
+                    success=False,
+                    error_message=str(e)
+                )
+            raise
+
+        response_time_ms = int((time.time() - start_time) * 1000)
+
+        if db:
+            await self._log_llm_call(
+                db=db,
+                provider=provider,
+                model=model,
+                response_time_ms=response_time_ms,
+                success=True
+            )
+
+        logger.info(f"{provider} response streamed in {response_time_ms}ms")
+
+    async def _stream_gemini(self, prompt: str, db: Optional[AsyncSession]) -> AsyncIterator[str]:
+        """Stream from Gemini API"""
+        start_time = time.time()
+        try:
+            genai.configure(api_key=settings.GOOGLE_API_KEY)
+            model = genai.GenerativeModel('gemini-1.5-flash')
+
+            with observe_provider_call("llm", "gemini"):
+                response = await model.generate_content_async(
+                    prompt,
+                    generation_config=genai.GenerationConfig(
+                        temperature=0.7,
+                        max_output_tokens=500
+                    ),
+                    stream=True
+                )
+
+                async for chunk in response:
+                    if chunk.text:
+                        yield chunk.text
+
+        except Exception as e:
+            response_time_ms = int((time.time() - start_time) * 1000)
+            logger.warning(f"Gemini stream failed: {str(e)}")
+
+            if db:
+                await self._log_llm_call(
+                    db=db,
+                    provider="gemini",
+                    model="gemini-1.5-flash",
+                    response_time_ms=response_time_ms,
+                    success=False,
+                    error_message=str(e)
+                )
+            raise
+
+        response_time_ms = int((time.time() - start_time) * 1000)
+
+        if db:
+            await self._log_llm_call(
+                db=db,
+                provider="gemini",
+                model="gemini-1.5-flash",
+                response_time_ms=response_time_ms,
+                success=True
+            )
+
+        logger.info(f"Gemini response streamed in {response_time_ms}ms")
+
+    async def _log_llm_call(
         self,
-        db: Session,
+        db: AsyncSession,
         provider: str,
         model: str,
         response_time_ms: int,
         success: bool,
-        error_message: Optional[str] = None
+        error_message: Optional[str] = None,
+        prompt_tokens: Optional[int] = None,
+        completion_tokens: Optional[int] = None,
+        total_tokens: Optional[int] = None
     ):
         """Log LLM API call"""
         try:
             log_entry = LLMLog(
                 provider=provider,
                 model=model,
+                prompt_tokens=prompt_tokens,
+                completion_tokens=completion_tokens,
+                total_tokens=total_tokens,
                 response_time_ms=response_time_ms,
                 success=success,
                 error_message=error_message
             )
             db.add(log_entry)
-            db.commit()
+            await db.commit()
         except Exception as e:
             logger.error(f"Failed to log LLM call: {str(e)}")
 
@@ -0,0 +1,245 @@
+import asyncio
+from dataclasses import dataclass, field
+from typing import List, Set, Tuple
+from loguru import logger
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.db.database import AsyncSessionLocal
+from app.db.models import Conversation
+from app.services.cache_service import cache_service
+from app.services.llm_service import llm_service
+from app.utils.text import estimate_tokens, truncate_to_tokens
+
+SUMMARY_PROMPT = """You maintain a running summary of a conversation between a user and MediVoice GH, a health advisor.
+
+Update the summary with the new exchanges below. Keep only what matters for answering follow-up questions:
+who the symptoms concern (e.g. the user, their child), symptoms and how long they have lasted, conditions
+discussed, advice given and any appointments. Write plain sentences, at most {max_words} words.
+
+CURRENT SUMMARY:
+{summary}
+
+NEW EXCHANGES:
+{exchanges}
+
+UPDATED SUMMARY:"""
+
+
+@dataclass
+class ConversationHistory:
+    """What the LLM is told about earlier turns"""
+    summary: str = ""
+    turns: List[Tuple[str, str]] = field(default_factory=list)  # (user, assistant), oldest first
+
+
+class MemoryService:
+    """
+    Bounded multi-turn conversation memory
+
+    The prompt gets the last K turns verbatim plus a rolling summary of
+    everything older, cut to a fixed token budget so prompt size (and LLM
+    latency) does not grow with the length of a user's history.
+
+    The summary lives in Redis with the id of the newest conversation it
+    covers. After each turn, turns that have dropped out of the recent window
+    are folded into it in the background.
+    """
+
+    def __init__(
+        self,
+        recent_turns: int = 4,
+        token_budget: int = 800,
+        summary_max_words: int = 120,
+        summary_ttl: int = 604800,
+        summary_batch: int = 20
+    ):
+        self.recent_turns = recent_turns
+        self.token_budget = token_budget
+        self.summary_max_words = summary_max_words
+        self.summary_ttl = summary_ttl
+        self.summary_batch = summary_batch  # Max turns folded per refresh
+
+        # Users with a summary refresh in flight, so a burst of turns folds once
+        self._refreshing: Set[int] = set()
+        self._tasks: Set[asyncio.Task] = set()
+
+    def _summary_key(self, user_id: int) -> str:
+        return f"memory:summary:{user_id}"
+
+    async def _recent(self, db: AsyncSession, user_id: int, limit: int):
+        result = await db.execute(
+            select(Conversation.id, Conversation.user_message, Conversation.ai_response)
+            .where(Conversation.user_id == user_id)
+            .order_by(Conversation.created_at.desc(), Conversation.id.desc())
+            .limit(limit)
+        )
+        return result.all()
+
+    async def load_history(self, user_id: int) -> ConversationHistory:
+        """
+        Fetch the last K turns and the cached summary
+
+        Uses its own session, so it can run concurrently with other work on
+        the request's session.
+
+        Args:
+            user_id: Owner of the conversation
+
+        Returns:
+            Summary and recent turns, oldest first
+        """
+        if self.recent_turns <= 0:
+            return ConversationHistory()
+
+        async with AsyncSessionLocal() as db:
+            rows, cached = await asyncio.gather(
+                self._recent(db, user_id, self.recent_turns),
+                cache_service.get(self._summary_key(user_id))
+            )
+        cached = cached or {}
+
+        return ConversationHistory(
+            summary=cached.get("summary", ""),
+            turns=[(row.user_message, row.ai_response) for row in reversed(rows)]
+        )
+
+    def format_history(self, history: ConversationHistory) -> str:
+        """
+        Render history for the prompt within the token budget
+
+        The summary gets at most a third of the budget; recent turns fill the
+        rest, newest first. Only the newest turn is ever truncated; older turns
+        that do not fit are left out.
+        """
+        budget = self.token_budget
+        parts = []
+
+        if history.summary:
+            summary = truncate_to_tokens(history.summary, budget // 3)
+            budget -= estimate_tokens(summary)
+
+        for user_message, ai_response in reversed(history.turns):
+            ai_response = ai_response.replace(llm_service.disclaimer, "").strip()
+            turn = f"User: {user_message}\nAssistant: {ai_response}"
+            if estimate_tokens(turn) > budget:
+                if parts:
+                    break
+                turn = truncate_to_tokens(turn, budget)
+            budget -= estimate_tokens(turn)
+            parts.append(turn)
+
+        parts.reverse()
+        if history.summary:
+            parts.insert(0, f"Summary of earlier conversation: {summary}")
+
+        return "\n\n".join(parts)
+
+    async def get_history(self, user_id: int) -> str:
+        """Prompt-ready history for a user's next message"""
+        history = await self.load_history(user_id)
+        return self.format_history(history)
+
+    async def get_session_history(self, user_id: int, turns: List[Tuple[str, str]]) -> str:
+        """
+        Prompt-ready history from turns the caller already holds (a voice session)
+
+        Only the cached summary is fetched; the database is not queried.
+
+        Args:
+            user_id: Owner of the conversation
+            turns: Recent (user, assistant) turns, oldest first
+        """
+        if self.recent_turns <= 0:
+            return ""
+
+        cached = await cache_service.get(self._summary_key(user_id)) or {}
+        return self.format_history(ConversationHistory(summary=cached.get("summary", ""), turns=list(turns)))
+
+    async def refresh_summary(self, user_id: int):
+        """
+        Fold turns that left the recent window into the cached summary
+
+        Runs after the turn has been saved (as a background task). Does nothing
+        if Redis is unavailable or no turn has left the window.
+        """
+        if not cache_service.available or user_id in self._refreshing:
+            return
+
+        self._refreshing.add(user_id)
+        try:
+            key = self._summary_key(user_id)
+            cached = await cache_service.get(key) or {}
+            through_id = cached.get("through_id", 0)
+
+            rows = await self._unsummarized_turns(user_id, through_id)
+            if not rows:
+                return
+
+            exchanges = "\n\n".join(
+                truncate_to_tokens(
+                    f"User: {row.user_message}\nAssistant: {row.ai_response.replace(llm_service.disclaimer, '').strip()}",
+                    self.token_budget // 2
+                )
+                for row in rows
+            )
+            prompt = SUMMARY_PROMPT.format(
+                max_words=self.summary_max_words,
+                summary=cached.get("summary") or "(none yet)",
+                exchanges=exchanges
+            )
+
+            async with AsyncSessionLocal() as db:
+                summary, provider = await llm_service.generate_completion(prompt, db)
+
+            if not summary:
+                logger.warning(f"Conversation summary refresh failed for user {user_id}")
+                return
+
+            await cache_service.set(
+                key,
+                {"summary": summary.strip(), "through_id": max(row.id for row in rows)},
+                self.summary_ttl
+            )
+            logger.info(f"Conversation summary for user {user_id} updated with {len(rows)} turns ({provider})")
+
+        except Exception as e:
+            logger.error(f"Conversation summary refresh error: {str(e)}")
+
+        finally:
+            self._refreshing.discard(user_id)
+
+    async def _unsummarized_turns(self, user_id: int, through_id: int):
+        """Turns newer than the summary that are no longer in the recent window, oldest first"""
+        async with AsyncSessionLocal() as db:
+            window_ids = [row.id for row in await self._recent(db, user_id, self.recent_turns)]
+            query = select(Conversation.id, Conversation.user_message, Conversation.ai_response).where(
+                Conversation.user_id == user_id,
+                Conversation.id > through_id
+            )
+            if window_ids:
+                query = query.where(Conversation.id.notin_(window_ids))
+
+            # Most recent first, bounded; anything older is left out of the summary
+            result = await db.execute(
+                query.order_by(Conversation.created_at.desc(), Conversation.id.desc())
+                .limit(self.summary_batch)
+            )
+            return list(reversed(result.all()))
+
+    def schedule_refresh(self, user_id: int):
+        """Refresh the summary without waiting for it (from streaming handlers)"""
+        task = asyncio.create_task(self.refresh_summary(user_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+# Singleton instance
+memory_service = MemoryService(
+    recent_turns=settings.MEMORY_RECENT_TURNS,
+    token_budget=settings.MEMORY_TOKEN_BUDGET,
+    summary_max_words=settings.MEMORY_SUMMARY_MAX_WORDS,
+    summary_ttl=settings.MEMORY_SUMMARY_TTL,
+    summary_batch=settings.MEMORY_SUMMARY_BATCH
+)
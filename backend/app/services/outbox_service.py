@@ -0,0 +1,253 @@
+import random
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, List, Optional, Tuple
+import httpx
+from loguru import logger
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.db.database import AsyncSessionLocal
+from app.db.models import Appointment, OutboxMessage
+from app.services.http_clients import http_clients
+from app.utils.metrics import OUTBOX_DELIVERIES, observe_provider_call
+
+APPOINTMENT_BOOKED = "appointment.booked"
+
+# (message, delivered, workflow response, error)
+DeliveryResult = Tuple[OutboxMessage, bool, Any, Optional[str]]
+
+
+def appointment_booked(appointment: Appointment, user_email: str) -> OutboxMessage:
+    """
+    Outbox message announcing a new appointment to the n8n workflow
+
+    Add it to the session that adds the appointment (after a flush, so the
+    appointment has its id), so both are committed together.
+    """
+    return OutboxMessage(
+        topic=APPOINTMENT_BOOKED,
+        appointment_id=appointment.id,
+        payload={
+            "appointment_id": appointment.id,
+            "user_email": user_email,
+            "full_name": appointment.full_name,
+            "phone": appointment.phone,
+            "preferred_date": appointment.preferred_date,
+            "preferred_time": appointment.preferred_time,
+            "reason": appointment.reason
+        }
+    )
+
+
+class OutboxDispatcher:
+    """
+    Background delivery of outbox messages to the n8n webhook
+
+    - Due messages are claimed batch_size at a time. Claiming moves their
+      next_attempt_at past the lease, so no other poll picks them up while
+      they are in flight (FOR UPDATE SKIP LOCKED keeps concurrent claims
+      apart on Postgres). If a worker dies mid-delivery the message is sent
+      again once the lease expires, so delivery is at least once; the
+      appointment_id in the payload and the X-Outbox-Id header let the
+      workflow drop duplicates.
+    - At most `concurrency` webhook requests are in flight, over the shared
+      n8n client (app.services.http_clients). With
+      webhook_batch_size > 1, up to that many messages share one request as
+      {"appointments": [...]}; the shipped workflow takes one per request.
+    - Failures are retried with exponential backoff (and jitter) up to
+      max_attempts, then the message is marked failed.
+    - Appointment.n8n_response follows each message: queued, retrying,
+      delivered (with the workflow's response) or failed.
+
+    Polls every poll_interval seconds; notify() wakes it at once.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        api_key: str = "",
+        session_factory: Callable[[], AsyncSession] = AsyncSessionLocal,
+        concurrency: int = 4,
+        batch_size: int = 50,
+        webhook_batch_size: int = 1,
+        poll_interval: float = 2.0,
+        max_attempts: int = 8,
+        backoff_base: float = 5.0,
+        backoff_max: float = 900.0,
+        lease: float = 120.0
+    ):
+        self.url = url
+        self.api_key = api_key
+        self.session_factory = session_factory
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.webhook_batch_size = max(1, webhook_batch_size)
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease = lease
+
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+
+    def notify(self):
+        """Deliver new messages now rather than at the next poll"""
+        self._wakeup.set()
+
+    async def dispatch_once(self) -> int:
+        """
+        Claim and deliver one batch of due messages
+
+        Returns:
+            Number of messages claimed
+        """
+        messages = await self._claim()
+        if not messages:
+            return 0
+
+        groups = [messages[i:i + self.webhook_batch_size] for i in range(0, len(messages), self.webhook_batch_size)]
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def deliver(group: List[OutboxMessage]) -> List[DeliveryResult]:
+            async with semaphore:
+                return await self._deliver(group)
+
+        results = await asyncio.gather(*(deliver(group) for group in groups))
+        await self._record([result for group in results for result in group])
+        return len(messages)
+
+    async def _claim(self) -> List[OutboxMessage]:
+        now = datetime.now(timezone.utc)
+
+        async with self.session_factory() as db:
+            query = (
+                select(OutboxMessage)
+                .where(OutboxMessage.status == "pending", OutboxMessage.next_attempt_at <= now)
+                .order_by(OutboxMessage.next_attempt_at, OutboxMessage.id)
+                .limit(self.batch_size)
+            )
+            if db.bind.dialect.name == "postgresql":
+                query = query.with_for_update(skip_locked=True)
+
+            messages = list((await db.execute(query)).scalars().all())
+            for message in messages:
+                message.next_attempt_at = now + timedelta(seconds=self.lease)
+            await db.commit()
+
+        return messages
+
+    async def _deliver(self, group: List[OutboxMessage]) -> List[DeliveryResult]:
+        """POST one message, or a batch of them, to the webhook"""
+        body = group[0].payload if len(group) == 1 else {"appointments": [message.payload for message in group]}
+        headers = {"X-Outbox-Id": ",".join(str(message.id) for message in group)}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+
+        try:
+            with observe_provider_call("webhook", "n8n"):
+                response = await http_clients.get("n8n").post(self.url, json=body, headers=headers)
+                response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            error = f"HTTP {e.response.status_code}: {e.response.text[:200]}"
+            return [(message, False, None, error) for message in group]
+        except Exception as e:
+            error = str(e) or type(e).__name__
+            return [(message, False, None, error) for message in group]
+
+        try:
+            data = response.json()
+        except ValueError:
+            data = response.text or None
+
+        # A batched workflow may answer with one result per appointment
+        if len(group) > 1 and isinstance(data, list) and len(data) == len(group):
+            return [(message, True, item, None) for message, item in zip(group, data)]
+        return [(message, True, data, None) for message in group]
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.backoff_base * 2 ** (attempts - 1), self.backoff_max)
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _record(self, results: List[DeliveryResult]):
+        """Store each outcome on the message and its appointment, in one transaction"""
+        now = datetime.now(timezone.utc)
+
+        async with self.session_factory() as db:
+            for message, delivered, response, error in results:
+                attempts = message.attempts + 1
+
+                if delivered:
+                    outcome = "delivered"
+                    values = {"status": "delivered", "delivered_at": now, "last_error": None}
+                    status = {"status": "delivered", "attempts": attempts, "response": response}
+                    logger.info(f"Outbox message {message.id} ({message.topic}) delivered")
+                elif attempts >= self.max_attempts:
+                    outcome = "failed"
+                    values = {"status": "failed", "last_error": error}
+                    status = {"status": "failed", "attempts": attempts, "error": error}
+                    logger.error(f"Outbox message {message.id} ({message.topic}) failed after {attempts} attempts: {error}")
+                else:
+                    outcome = "retry"
+                    retry_at = now + timedelta(seconds=self._backoff(attempts))
+                    values = {"next_attempt_at": retry_at, "last_error": error}
+                    status = {"status": "retrying", "attempts": attempts, "error": error, "next_attempt_at": retry_at.isoformat()}
+                    logger.warning(f"Outbox message {message.id} ({message.topic}) attempt {attempts} failed: {error}")
+
+                OUTBOX_DELIVERIES.labels(message.topic, outcome).inc()
+                await db.execute(
+                    update(OutboxMessage).where(OutboxMessage.id == message.id).values(attempts=attempts, **values)
+                )
+                if message.appointment_id is not None:
+                    await db.execute(
+                        update(Appointment).where(Appointment.id == message.appointment_id).values(n8n_response=status)
+                    )
+
+            await db.commit()
+
+    async def _run(self):
+        while True:
+            try:
+                claimed = await self.dispatch_once()
+            except Exception as e:
+                logger.error(f"Outbox dispatch failed: {str(e)}")
+                claimed = 0
+
+            # A full batch means more may be due; otherwise wait for a poll or notify()
+            if claimed < self.batch_size:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    def start(self):
+        """Start delivering on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info("Outbox dispatcher started")
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+
+# Singleton instance (started in the app lifespan)
+outbox_dispatcher = OutboxDispatcher(
+    settings.N8N_WEBHOOK_URL,
+    api_key=settings.N8N_API_KEY,
+    concurrency=settings.OUTBOX_CONCURRENCY,
+    batch_size=settings.OUTBOX_BATCH_SIZE,
+    webhook_batch_size=settings.N8N_WEBHOOK_BATCH_SIZE,
+    poll_interval=settings.OUTBOX_POLL_INTERVAL,
+    max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+    backoff_base=settings.OUTBOX_BACKOFF_BASE,
+    backoff_max=settings.OUTBOX_BACKOFF_MAX
+)
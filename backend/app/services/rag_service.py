@@ -1,13 +1,48 @@
+import asyncio
+import hashlib
 import chromadb
+from chromadb.api.types import Documents, EmbeddingFunction, Embeddings
 from chromadb.config import Settings
-from typing import List, Dict
+from typing import List, Dict, Optional
 from loguru import logger
 from sentence_transformers import SentenceTransformer
+from app.config import settings
+from app.services.cache_service import cache_service
+
+
+class EmbeddingModelFunction(EmbeddingFunction[Documents]):
+    """
+    Chroma embedding function running a SentenceTransformer, loaded on the first call
+
+    Vectors are normalized, like those of Chroma's default (ONNX) function
+    for the same model.
+    """
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
+        self.model_name = model_name
+        self._model: Optional[SentenceTransformer] = None
+
+    @property
+    def model(self) -> SentenceTransformer:
+        """The model, loaded on first use (it is downloaded on first load)"""
+        if self._model is None:
+            self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    def __call__(self, input: Documents) -> Embeddings:
+        return list(self.model.encode(list(input), convert_to_numpy=True, normalize_embeddings=True))
 
 
 class RAGService:
     """RAG service for medical knowledge retrieval using ChromaDB"""
 
+    # Cache namespace for search results; invalidated when the knowledge base changes
+    CACHE_NAMESPACE = "rag"
+
     def __init__(self, persist_directory: str = "./data/chromadb"):
         # Initialize ChromaDB client
         self.client = chromadb.Client(
@@ -17,17 +52,37 @@ class RAGService:
             )
         )
 
-        # Initialize embedding model
-        self.embedding_model = SentenceTransformer('all-MiniLM-L6-v2')
+        # Documents and queries are embedded by this model (lazily loaded)
+        self.embedding_function = EmbeddingModelFunction("all-MiniLM-L6-v2")
 
         # Get or create collection
         self.collection = self.client.get_or_create_collection(
             name="medical_knowledge",
-            metadata={"description": "Medical knowledge base for Ghana"}
+            metadata={"description": "Medical knowledge base for Ghana"},
+            embedding_function=self.embedding_function
         )
 
         logger.info("RAG service initialized")
 
+    @property
+    def embedding_model(self) -> SentenceTransformer:
+        """The model the collection embeds documents and queries with"""
+        return self.embedding_function.model
+
+    def warm_up(self):
+        """
+        Load the collection's embedding model now instead of on the first search
+
+        Called in the server's master process before workers are forked, so
+        they share the loaded weights copy-on-write. Only loads; nothing is
+        run through the model before the fork.
+        """
+        try:
+            self.embedding_model
+            logger.info(f"Embedding model {self.embedding_function.model_name} loaded")
+        except Exception as e:
+            logger.warning(f"Embedding model not preloaded (loaded on first use instead): {str(e)}")
+
     def add_documents(self, documents: List[Dict[str, str]]):
         """
         Add documents to the knowledge base
@@ -71,15 +126,7 @@ class RAGService:
             if not results["documents"] or not results["documents"][0]:
                 return ""
 
-            # Format results into context
-            context_parts = []
-            for i, doc in enumerate(results["documents"][0]):
-                metadata = results["metadatas"][0][i] if results["metadatas"] else {}
-                source = metadata.get("source", "Medical Database")
-
-                context_parts.append(f"[{source}]\n{doc}")
-
-            context = "\n\n".join(context_parts)
+            context = self._format_context(results, 0)
             logger.info(f"Found {len(results['documents'][0])} relevant documents")
 
             return context
@@ -88,6 +135,75 @@ class RAGService:
             logger.error(f"Search failed: {str(e)}")
             return ""
 
+    async def search_cached(self, query: str, n_results: int = 3) -> str:
+        """
+        search() through the cache, for repeated questions
+
+        Results are cached per normalized query for RAG_CACHE_TTL seconds, or
+        until the knowledge base is reloaded. Empty results (including failed
+        searches) are not cached.
+        """
+        if settings.RAG_CACHE_TTL <= 0:
+            return await asyncio.to_thread(self.search, query, n_results)
+
+        normalized = " ".join(query.lower().split())
+        digest = hashlib.sha1(f"{n_results}:{normalized}".encode()).hexdigest()
+        key = await cache_service.namespace_key(self.CACHE_NAMESPACE, digest)
+
+        async def load():
+            return await asyncio.to_thread(self.search, query, n_results) or None
+
+        return await cache_service.get_or_set(key, load, settings.RAG_CACHE_TTL) or ""
+
+    async def invalidate_cache(self):
+        """Drop all cached search results (after the knowledge base changes)"""
+        await cache_service.invalidate_namespace(self.CACHE_NAMESPACE)
+
+    def search_batch(self, queries: List[str], n_results: int = 3) -> List[str]:
+        """
+        Search for several queries at once
+
+        All queries are embedded and looked up in a single collection query.
+
+        Args:
+            queries: User queries or symptoms
+            n_results: Number of results per query
+
+        Returns:
+            Formatted context string per query, in the same order
+        """
+        if not queries:
+            return []
+
+        try:
+            results = self.collection.query(
+                query_texts=queries,
+                n_results=n_results
+            )
+
+            contexts = [self._format_context(results, i) for i in range(len(queries))]
+            logger.info(f"Batch search for {len(queries)} queries")
+
+            return contexts
+
+        except Exception as e:
+            logger.error(f"Batch search failed: {str(e)}")
+            return [""] * len(queries)
+
+    def _format_context(self, results: Dict, query_index: int) -> str:
+        """Format the documents found for one query into a context string"""
+        if not results["documents"] or not results["documents"][query_index]:
+            return ""
+
+        context_parts = []
+        for i, doc in enumerate(results["documents"][query_index]):
+            metadata = results["metadatas"][query_index][i] if results["metadatas"] else {}
+            source = metadata.get("source", "Medical Database")
+
+            context_parts.append(f"[{source}]\n{doc}")
+
+        return "\n\n".join(context_parts)
+
     def extract_symptoms(self, text: str) -> List[str]:
         """
         Extract symptoms from user text using keyword matching
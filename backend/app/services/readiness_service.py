@@ -0,0 +1,159 @@
+import time
+import asyncio
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from loguru import logger
+from sqlalchemy import text
+
+from app.config import settings
+from app.db.database import async_engine
+from app.models.schemas import DependencyStatus, ReadinessCheck
+from app.services.cache_service import cache_service
+from app.services.llm_service import llm_service
+from app.services.rag_service import rag_service
+from app.utils.provider_health import provider_health
+
+# Providers other than the LLMs whose recent calls are reported: (service, provider)
+OTHER_PROVIDERS = [("stt", "groq_whisper"), ("tts", "google"), ("webhook", "n8n")]
+
+Probe = Callable[[], Awaitable[Tuple[str, Optional[str]]]]
+
+
+class ReadinessService:
+    """
+    Deep readiness check for load balancers
+
+    The database, Redis, the vector index and its embedding model are probed
+    in parallel, each with a timeout; external providers are judged by their
+    recent calls (see ProviderHealth), so they are not called here. Results
+    are cached for cache_ttl seconds and concurrent checks wait for the same
+    run, so health checks add at most one round of probes per cache_ttl per
+    worker.
+
+    The instance is not ready if a critical dependency is down: the database,
+    the vector index, or every configured LLM provider. Redis (the cache falls
+    back to its in-process tier) and STT/TTS/n8n failures make it degraded.
+    """
+
+    def __init__(self, cache_ttl: float = 5.0, probe_timeout: float = 2.0):
+        self.cache_ttl = cache_ttl
+        self.probe_timeout = probe_timeout
+        self._cached: Optional[ReadinessCheck] = None
+        self._expires_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def check(self) -> ReadinessCheck:
+        """Current readiness, probing at most once per cache_ttl"""
+        async with self._lock:
+            if self._cached is None or time.monotonic() >= self._expires_at:
+                previous = self._cached.status if self._cached is not None else "ready"
+                self._cached = await self._run()
+                self._expires_at = time.monotonic() + self.cache_ttl
+
+                if self._cached.status != previous:
+                    failing = [name for name, dep in self._cached.dependencies.items() if dep.status in ("down", "degraded")]
+                    logger.warning(f"Readiness changed from {previous} to {self._cached.status}: {', '.join(failing) or 'all ok'}")
+
+            return self._cached
+
+    async def _run(self) -> ReadinessCheck:
+        probes: Dict[str, Tuple[Probe, bool]] = {
+            "database": (self._probe_database, True),
+            "redis": (self._probe_redis, False),
+            "vector_index": (self._probe_vector_index, True),
+            "embedding_model": (self._probe_embedding_model, False),
+        }
+        results = await asyncio.gather(*(self._timed(probe, critical) for probe, critical in probes.values()))
+        dependencies = dict(zip(probes, results))
+        dependencies.update(self._providers())
+
+        if any(dep.critical and dep.status == "down" for dep in dependencies.values()):
+            overall = "not_ready"
+        elif any(dep.status in ("down", "degraded") for dep in dependencies.values()):
+            overall = "degraded"
+        else:
+            overall = "ready"
+
+        return ReadinessCheck(status=overall, checked_at=datetime.utcnow(), dependencies=dependencies)
+
+    async def _timed(self, probe: Probe, critical: bool) -> DependencyStatus:
+        start = time.perf_counter()
+        try:
+            status, detail = await asyncio.wait_for(probe(), self.probe_timeout)
+        except asyncio.TimeoutError:
+            status, detail = "down", f"No answer within {self.probe_timeout}s"
+        except Exception as e:
+            status, detail = "down", str(e)[:200]
+
+        return DependencyStatus(
+            status=status,
+            critical=critical,
+            latency_ms=round((time.perf_counter() - start) * 1000, 1),
+            detail=detail
+        )
+
+    async def _probe_database(self) -> Tuple[str, Optional[str]]:
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        return "ok", None
+
+    async def _probe_redis(self) -> Tuple[str, Optional[str]]:
+        if not cache_service.available:
+            return "degraded", "Unreachable, reconnecting; using the in-process cache tier only"
+        try:
+            await cache_service.redis_client.ping()
+        except Exception as e:
+            return "degraded", str(e)[:200]
+        return "ok", None
+
+    async def _probe_vector_index(self) -> Tuple[str, Optional[str]]:
+        count = await asyncio.to_thread(rag_service.collection.count)
+        if not count:
+            return "degraded", "Empty knowledge base (run python -m app.utils.load_data)"
+        return "ok", f"{count} documents"
+
+    async def _probe_embedding_model(self) -> Tuple[str, Optional[str]]:
+        """Whether the model the collection embeds queries with is loaded, or will load on the next search"""
+        embedding_function = rag_service.embedding_function
+        if embedding_function.loaded:
+            return "ok", f"{embedding_function.model_name} loaded"
+        return "cold", f"{embedding_function.model_name} loads on the first search"
+
+    def _providers(self) -> Dict[str, DependencyStatus]:
+        """Provider states from recent calls; the LLM entry is down only if every LLM provider is"""
+        dependencies = {}
+
+        llm_statuses = []
+        for provider in llm_service.configured_providers:
+            status, failures = provider_health.status("llm", provider)
+            llm_statuses.append(status)
+            dependencies[f"llm_{provider}"] = DependencyStatus(
+                status=status, critical=False, detail=f"{failures} consecutive failures" if failures else None
+            )
+
+        if not llm_statuses:
+            llm_status, detail = "down", "No LLM provider configured"
+        elif all(status == "down" for status in llm_statuses):
+            llm_status, detail = "down", "Every provider is failing"
+        elif "down" in llm_statuses:
+            llm_status, detail = "degraded", "Falling back past failing providers"
+        elif "ok" in llm_statuses:
+            llm_status, detail = "ok", None
+        else:
+            llm_status, detail = "unknown", "No recent calls"
+        dependencies["llm"] = DependencyStatus(status=llm_status, critical=True, detail=detail)
+
+        for service, provider in OTHER_PROVIDERS:
+            status, failures = provider_health.status(service, provider)
+            dependencies[f"{service}_{provider}"] = DependencyStatus(
+                status=status, critical=False, detail=f"{failures} consecutive failures" if failures else None
+            )
+
+        return dependencies
+
+
+# Singleton instance
+readiness_service = ReadinessService(
+    cache_ttl=settings.READINESS_CACHE_TTL,
+    probe_timeout=settings.READINESS_PROBE_TIMEOUT
+)
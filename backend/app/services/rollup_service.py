@@ -0,0 +1,270 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, Optional
+from loguru import logger
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.db.database import AsyncSessionLocal
+from app.db.models import LLMLog, LLMLogRollup, StageTimingRollup
+
+GRANULARITIES = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+}
+
+# Held for the duration of a rollup transaction, so only one worker aggregates
+ROLLUP_LOCK_ID = 4_700_039
+
+# Upserts are idempotent: re-aggregating a bucket replaces its row, so the
+# current (partial) bucket and late rows are picked up by the next run
+LLM_ROLLUP_SQL = """
+    INSERT INTO llm_log_rollups (
+        granularity, bucket_start, provider, model,
+        calls, errors, total_ms, max_ms, p50_ms, p95_ms, p99_ms,
+        prompt_tokens, completion_tokens, total_tokens, updated_at
+    )
+    SELECT
+        '{unit}',
+        date_trunc('{unit}', created_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC' AS bucket,
+        provider,
+        model,
+        count(*),
+        count(*) FILTER (WHERE success IS FALSE),
+        sum(response_time_ms),
+        max(response_time_ms),
+        percentile_cont(0.50) WITHIN GROUP (ORDER BY response_time_ms),
+        percentile_cont(0.95) WITHIN GROUP (ORDER BY response_time_ms),
+        percentile_cont(0.99) WITHIN GROUP (ORDER BY response_time_ms),
+        coalesce(sum(prompt_tokens), 0),
+        coalesce(sum(completion_tokens), 0),
+        coalesce(sum(total_tokens), 0),
+        now()
+    FROM llm_logs
+    WHERE created_at >= :since AND created_at < :until
+    GROUP BY bucket, provider, model
+    ON CONFLICT (granularity, bucket_start, provider, model) DO UPDATE SET
+        calls = EXCLUDED.calls,
+        errors = EXCLUDED.errors,
+        total_ms = EXCLUDED.total_ms,
+        max_ms = EXCLUDED.max_ms,
+        p50_ms = EXCLUDED.p50_ms,
+        p95_ms = EXCLUDED.p95_ms,
+        p99_ms = EXCLUDED.p99_ms,
+        prompt_tokens = EXCLUDED.prompt_tokens,
+        completion_tokens = EXCLUDED.completion_tokens,
+        total_tokens = EXCLUDED.total_tokens,
+        updated_at = EXCLUDED.updated_at
+"""
+
+# Per stage, overall ("" provider) and per LLM provider, as in /stage-latency
+STAGE_ROLLUP_SQL = """
+    INSERT INTO stage_timing_rollups (
+        granularity, bucket_start, stage, provider,
+        samples, max_ms, p50_ms, p95_ms, p99_ms, updated_at
+    )
+    SELECT
+        '{unit}',
+        c.bucket,
+        s.key,
+        CASE WHEN GROUPING(c.provider) = 1 THEN '' ELSE c.provider END,
+        count(*),
+        max(s.value::float),
+        percentile_cont(0.50) WITHIN GROUP (ORDER BY s.value::float),
+        percentile_cont(0.95) WITHIN GROUP (ORDER BY s.value::float),
+        percentile_cont(0.99) WITHIN GROUP (ORDER BY s.value::float),
+        now()
+    FROM (
+        SELECT
+            date_trunc('{unit}', created_at AT TIME ZONE 'UTC') AT TIME ZONE 'UTC' AS bucket,
+            coalesce(llm_provider, 'unknown') AS provider,
+            stage_timings
+        FROM conversations
+        WHERE stage_timings IS NOT NULL
+          AND created_at >= :since AND created_at < :until
+    ) c
+    CROSS JOIN LATERAL json_each_text(c.stage_timings) AS s(key, value)
+    GROUP BY GROUPING SETS ((c.bucket, s.key), (c.bucket, s.key, c.provider))
+    ON CONFLICT (granularity, bucket_start, stage, provider) DO UPDATE SET
+        samples = EXCLUDED.samples,
+        max_ms = EXCLUDED.max_ms,
+        p50_ms = EXCLUDED.p50_ms,
+        p95_ms = EXCLUDED.p95_ms,
+        p99_ms = EXCLUDED.p99_ms,
+        updated_at = EXCLUDED.updated_at
+"""
+
+
+def bucket_floor(moment: datetime, granularity: str) -> datetime:
+    """Start of the minute or hour bucket containing a moment (UTC)"""
+    moment = moment.astimezone(timezone.utc)
+    if granularity == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(second=0, microsecond=0)
+
+
+class RollupService:
+    """
+    Periodic aggregation of llm_logs and conversation stage timings
+
+    - Every ROLLUP_INTERVAL_SECONDS, per-minute and per-hour buckets from the
+      newest existing rollup bucket onwards are (re)aggregated into
+      llm_log_rollups and stage_timing_rollups, catching up at most
+      ROLLUP_BACKFILL_HOURS. Aggregation uses Postgres percentile functions
+      and is skipped on other databases.
+    - Every RETENTION_INTERVAL_SECONDS, raw llm_logs and per-minute rollups
+      past their retention age are deleted in small batches, each in its own
+      transaction, so deletes never hold long locks.
+
+    Conversations are never deleted; they are users' history.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], AsyncSession] = AsyncSessionLocal,
+        interval: int = 60,
+        backfill_hours: int = 24,
+        retention_interval: int = 3600,
+        llm_log_retention_days: int = 30,
+        minute_retention_days: int = 14,
+        batch_size: int = 1000
+    ):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.backfill_hours = backfill_hours
+        self.retention_interval = retention_interval
+        self.llm_log_retention_days = llm_log_retention_days
+        self.minute_retention_days = minute_retention_days
+        self.batch_size = batch_size
+
+        self._task: Optional[asyncio.Task] = None
+
+    async def rollup(self, now: Optional[datetime] = None) -> bool:
+        """
+        Aggregate new llm_logs and conversations into the rollup tables
+
+        Returns:
+            False if skipped: not Postgres, or another worker holds the lock
+        """
+        now = now or datetime.now(timezone.utc)
+
+        async with self.session_factory() as db:
+            if db.bind.dialect.name != "postgresql":
+                return False
+
+            locked = await db.scalar(text("SELECT pg_try_advisory_xact_lock(:id)"), {"id": ROLLUP_LOCK_ID})
+            if not locked:
+                return False
+
+            for granularity in GRANULARITIES:
+                for model, sql in ((LLMLogRollup, LLM_ROLLUP_SQL), (StageTimingRollup, STAGE_ROLLUP_SQL)):
+                    since = await self._resume_from(db, model, granularity, now)
+                    await db.execute(text(sql.format(unit=granularity)), {"since": since, "until": now})
+
+            await db.commit()
+
+        return True
+
+    async def _resume_from(self, db: AsyncSession, model, granularity: str, now: datetime) -> datetime:
+        """
+        Where aggregation resumes: the bucket before the newest rollup
+
+        Kept in the database rather than in memory, so it is shared by workers
+        and survives restarts. The newest bucket may be partial, and the one
+        before it may still receive rows committed after the last run.
+        """
+        oldest = bucket_floor(now - timedelta(hours=self.backfill_hours), granularity)
+        newest = await db.scalar(
+            select(func.max(model.bucket_start)).where(model.granularity == granularity)
+        )
+        if newest is None:
+            return oldest
+        return max(newest - GRANULARITIES[granularity], oldest)
+
+    async def apply_retention(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """
+        Delete raw LLM logs and per-minute rollups past their retention age
+
+        Returns:
+            Rows deleted per table
+        """
+        now = now or datetime.now(timezone.utc)
+        deleted = {"llm_logs": 0, "llm_log_rollups": 0, "stage_timing_rollups": 0}
+
+        if self.llm_log_retention_days > 0:
+            cutoff = now - timedelta(days=self.llm_log_retention_days)
+            deleted["llm_logs"] = await self._delete_in_batches(LLMLog, LLMLog.created_at < cutoff)
+
+        if self.minute_retention_days > 0:
+            cutoff = now - timedelta(days=self.minute_retention_days)
+            for model in (LLMLogRollup, StageTimingRollup):
+                deleted[model.__tablename__] = await self._delete_in_batches(
+                    model,
+                    (model.granularity == "minute") & (model.bucket_start < cutoff)
+                )
+
+        return deleted
+
+    async def _delete_in_batches(self, model, condition) -> int:
+        """Delete matching rows batch_size at a time, committing after each batch"""
+        total = 0
+        while True:
+            async with self.session_factory() as db:
+                ids = select(model.id).where(condition).order_by(model.id).limit(self.batch_size)
+                result = await db.execute(delete(model).where(model.id.in_(ids)))
+                await db.commit()
+
+            total += result.rowcount
+            if result.rowcount < self.batch_size:
+                return total
+
+            # Let other queries in between batches
+            await asyncio.sleep(0.05)
+
+    async def _run(self):
+        last_retention = None
+        loop = asyncio.get_running_loop()
+
+        while True:
+            try:
+                if await self.rollup():
+                    logger.debug("Analytics rollups updated")
+            except Exception as e:
+                logger.error(f"Analytics rollup failed: {str(e)}")
+
+            if last_retention is None or loop.time() - last_retention >= self.retention_interval:
+                last_retention = loop.time()
+                try:
+                    deleted = await self.apply_retention()
+                    if any(deleted.values()):
+                        logger.info(f"Retention deleted {deleted}")
+                except Exception as e:
+                    logger.error(f"Retention job failed: {str(e)}")
+
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Start the periodic jobs on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        task, self._task = self._task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+
+# Singleton instance
+rollup_service = RollupService(
+    interval=settings.ROLLUP_INTERVAL_SECONDS,
+    backfill_hours=settings.ROLLUP_BACKFILL_HOURS,
+    retention_interval=settings.RETENTION_INTERVAL_SECONDS,
+    llm_log_retention_days=settings.LLM_LOG_RETENTION_DAYS,
+    minute_retention_days=settings.ROLLUP_MINUTE_RETENTION_DAYS,
+    batch_size=settings.RETENTION_BATCH_SIZE
+)
@@ -0,0 +1,113 @@
+import asyncio
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+from loguru import logger
+
+from app.config import settings
+from app.services.tts_service import tts_service
+from app.utils.text import SentenceSplitter
+
+
+@dataclass
+class SpeechEvent:
+    """Event emitted by the speech pipeline"""
+    type: str  # "text" or "audio"
+    text: str
+    index: Optional[int] = None  # Audio segment number, in playback order
+    audio: Optional[bytes] = None  # MP3 bytes for audio events
+
+
+class SpeechPipeline:
+    """
+    Sentence-pipelined TTS
+
+    Splits streamed text into sentences as it arrives and synthesizes them
+    concurrently (bounded) while the text is still being generated. Audio
+    segments are emitted strictly in sentence order, so time-to-first-audio is
+    roughly the time to generate and synthesize the first sentence.
+    """
+
+    def __init__(self, tts=tts_service, max_concurrency: int = 3, min_sentence_chars: int = 40):
+        self.tts = tts
+        self.max_concurrency = max_concurrency
+        self.min_sentence_chars = min_sentence_chars
+
+    async def stream(self, text_stream: AsyncIterator[str]) -> AsyncIterator[SpeechEvent]:
+        """
+        Consume a text stream and yield text and audio events
+
+        Text events are forwarded as soon as they arrive; audio events follow
+        in order as each sentence finishes synthesizing.
+        """
+        events: asyncio.Queue = asyncio.Queue()
+        segments: asyncio.Queue = asyncio.Queue()  # (sentence, synthesis task) in order
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        synthesis_tasks = []
+
+        async def synthesize(sentence: str) -> Optional[bytes]:
+            async with semaphore:
+                return await self.tts.synthesize_audio(sentence)
+
+        async def schedule(sentence: str):
+            task = asyncio.create_task(synthesize(sentence))
+            synthesis_tasks.append(task)
+            await segments.put((sentence, task))
+
+        async def produce_text():
+            splitter = SentenceSplitter(min_chars=self.min_sentence_chars)
+            try:
+                async for delta in text_stream:
+                    await events.put(SpeechEvent(type="text", text=delta))
+                    for sentence in splitter.feed(delta):
+                        await schedule(sentence)
+
+                tail = splitter.flush()
+                if tail:
+                    await schedule(tail)
+            finally:
+                await segments.put(None)
+
+        async def emit_audio():
+            index = 0
+            while True:
+                item = await segments.get()
+                if item is None:
+                    break
+
+                sentence, task = item
+                audio = await task
+                if not audio:
+                    logger.debug(f"No audio for segment: {sentence[:50]}...")
+                    continue
+
+                await events.put(SpeechEvent(type="audio", text=sentence, index=index, audio=audio))
+                index += 1
+
+        async def run():
+            try:
+                await asyncio.gather(produce_text(), emit_audio())
+            finally:
+                await events.put(None)
+
+        runner = asyncio.create_task(run())
+
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                yield event
+
+            # Surface errors from the text stream
+            await runner
+        finally:
+            for task in [runner, *synthesis_tasks]:
+                if not task.done():
+                    task.cancel()
+
+
+# Singleton instance
+speech_pipeline = SpeechPipeline(
+    max_concurrency=settings.TTS_PIPELINE_CONCURRENCY,
+    min_sentence_chars=settings.TTS_SENTENCE_MIN_CHARS
+)
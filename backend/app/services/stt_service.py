@@ -2,9 +2,10 @@ import base64
 import io
 from typing import Optional
 from loguru import logger
-from groq import Groq
+from groq import Groq, AsyncGroq
 
 from app.config import settings
+from app.utils.metrics import observe_provider_call
 
 
 class STTService:
@@ -12,6 +13,8 @@ class STTService:
 
     def __init__(self):
         self.client = Groq(api_key=settings.GROQ_WHISPER_API_KEY)
+        # Keeps its connection pool between requests
+        self.async_client = AsyncGroq(api_key=settings.GROQ_WHISPER_API_KEY)
 
     async def transcribe_audio(self, audio_data: str) -> Optional[str]:
         """
@@ -27,17 +30,36 @@ class STTService:
             # Decode base64 audio
             audio_bytes = base64.b64decode(audio_data)
 
+        except Exception as e:
+            logger.error(f"STT transcription failed: {str(e)}")
+            return None
+
+        return await self.transcribe_bytes(audio_bytes)
+
+    async def transcribe_bytes(self, audio_bytes: bytes, filename: str = "audio.webm") -> Optional[str]:
+        """
+        Transcribe raw audio bytes
+
+        Args:
+            audio_bytes: Complete audio file (webm, mp3, wav, etc.)
+            filename: Name with an extension matching the audio format
+
+        Returns:
+            Transcribed text or None if failed
+        """
+        try:
             # Create a file-like object
             audio_file = io.BytesIO(audio_bytes)
-            audio_file.name = "audio.webm"  # Groq needs a filename
+            audio_file.name = filename  # Groq needs a filename
 
             # Transcribe using Groq Whisper
-            transcription = self.client.audio.transcriptions.create(
-                file=audio_file,
-                model="whisper-large-v3",
-                language="en",  # English only for now
-                response_format="text"
-            )
+            with observe_provider_call("stt", "groq_whisper"):
+                transcription = await self.async_client.audio.transcriptions.create(
+                    file=audio_file,
+                    model="whisper-large-v3",
+                    language="en",  # English only for now
+                    response_format="text"
+                )
 
             logger.info(f"Audio transcribed successfully: {transcription[:50]}...")
             return transcription
@@ -57,7 +79,7 @@ class STTService:
             Transcribed text or None if failed
         """
         try:
-            with open(file_path, "rb") as audio_file:
+            with open(file_path, "rb") as audio_file, observe_provider_call("stt", "groq_whisper"):
                 transcription = self.client.audio.transcriptions.create(
                     file=audio_file,
                     model="whisper-large-v3",
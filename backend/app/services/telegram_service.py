@@ -0,0 +1,375 @@
+import json
+import time
+import uuid
+import asyncio
+from typing import Dict, List, Optional, Set
+from loguru import logger
+
+from app.config import settings
+from app.services.cache_service import cache_service
+from app.services.http_clients import http_clients
+from app.services.llm_service import llm_service
+from app.services.rag_service import rag_service
+from app.utils.metrics import TELEGRAM_UPDATES
+from app.utils.timing import StageTimer
+
+EMERGENCY_REPLY = (
+    "🚨 EMERGENCY DETECTED 🚨\n\n"
+    "Your symptoms suggest a medical emergency. "
+    "Please call 112 immediately or visit the nearest hospital. "
+    "Do not delay seeking professional medical care."
+)
+
+# Reserve the next send slot for a chat: after its last message plus the
+# chat interval, and after the global next slot (Redis clock, so every
+# worker process agrees). Returns the seconds to wait.
+THROTTLE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local chat_interval = tonumber(ARGV[1])
+local at = math.max(
+    now,
+    tonumber(redis.call('GET', KEYS[2]) or 0) + chat_interval,
+    tonumber(redis.call('GET', KEYS[1]) or 0)
+)
+redis.call('SET', KEYS[1], tostring(at + tonumber(ARGV[2])), 'EX', 60)
+redis.call('SET', KEYS[2], tostring(at), 'EX', math.ceil(chat_interval) + 60)
+return tostring(at - now)
+"""
+
+# Append an update to a chat's pending list, unless the list is full, and take
+# the chat if no process owns it. Returns -1 (full), 1 (taken) or 0.
+ENQUEUE_SCRIPT = """
+if redis.call('LLEN', KEYS[1]) >= tonumber(ARGV[2]) then
+    return -1
+end
+redis.call('RPUSH', KEYS[1], ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+if redis.call('SET', KEYS[2], ARGV[4], 'NX', 'EX', ARGV[5]) then
+    return 1
+end
+return 0
+"""
+
+# Release a chat only if this process still owns it
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class TelegramService:
+    """
+    Background processing of Telegram bot updates
+
+    The webhook only deduplicates and enqueues (enqueue()), so Telegram gets
+    its 200 at once and does not redeliver while the LLM is working. Updates
+    are spread over `workers` queues by chat id: chats are handled
+    concurrently, and each chat's messages in the order they arrived.
+    Replies are throttled to at most one message per chat every
+    chat_min_interval seconds and global_rate messages per second overall,
+    below Telegram's limits; a 429 from Telegram is waited out and retried.
+
+    Under several worker processes, a chat's updates may reach any of them,
+    so ordering and throttling go through Redis: each update is appended to
+    the chat's pending list, and the process that takes the chat's owner key
+    answers the list in order, releasing the key once it is empty. Send slots
+    are reserved in Redis, so the rates hold across all processes. While
+    Redis is unreachable, each process queues and throttles on its own.
+
+    Workers are tasks on the request event loop, so everything handle_message
+    does must await or run in a thread: a blocking call would stall the
+    other workers and the webhook itself.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        workers: int = 8,
+        queue_size: int = 100,
+        dedup_ttl: int = 86400,
+        chat_min_interval: float = 1.0,
+        global_rate: float = 30.0,
+        chat_lock_ttl: int = 300
+    ):
+        self.token = token
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.dedup_ttl = dedup_ttl
+        self.chat_min_interval = chat_min_interval
+        self.global_rate = global_rate
+        self.chat_lock_ttl = chat_lock_ttl
+
+        self._queues: List[asyncio.Queue] = []
+        self._tasks: List[asyncio.Task] = []
+        self._owner_id = uuid.uuid4().hex  # This process, as the value of the chat owner keys
+        self._owned: Set[int] = set()  # Chats whose pending list this process is answering
+        self._last_sent: Dict[int, float] = {}  # chat id -> monotonic time of the last message
+        self._next_global_slot = 0.0
+        self._send_lock = asyncio.Lock()
+        self._enqueue_script = cache_service.redis_client.register_script(ENQUEUE_SCRIPT)
+        self._throttle_script = cache_service.redis_client.register_script(THROTTLE_SCRIPT)
+        self._release_script = cache_service.redis_client.register_script(RELEASE_SCRIPT)
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    def start(self):
+        """Start the worker tasks on the running event loop"""
+        if self._tasks:
+            return
+        self._queues = [asyncio.Queue() for _ in range(self.workers)]
+        self._tasks = [asyncio.create_task(self._worker(queue)) for queue in self._queues]
+        self._tasks.append(asyncio.create_task(self._claim_orphaned_chats()))
+        logger.info(f"Telegram workers started ({self.workers})")
+
+    async def stop(self):
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        # Let another process take over the chats that still have pending updates
+        for chat_id in list(self._owned):
+            try:
+                await self._release(chat_id)
+            except Exception as e:
+                logger.warning(f"Could not release Telegram chat {chat_id}: {str(e)}")
+        self._owned.clear()
+
+    @staticmethod
+    def _pending_key(chat_id: int) -> str:
+        return f"telegram:chat:{chat_id}:pending"
+
+    @staticmethod
+    def _owner_key(chat_id: int) -> str:
+        return f"telegram:chat:{chat_id}:owner"
+
+    async def enqueue(self, update: dict) -> bool:
+        """
+        Queue an update for processing
+
+        Updates whose update_id was already seen (by any worker, via Redis)
+        are dropped.
+
+        Returns:
+            False if the update could not be queued (queue or the chat's
+            pending list full); the webhook should then fail so Telegram
+            retries later
+        """
+        update_id = update.get("update_id")
+        message = update.get("message") or {}
+        chat_id = (message.get("chat") or {}).get("id")
+
+        if chat_id is None or not message.get("text"):
+            TELEGRAM_UPDATES.labels("ignored").inc()
+            return True
+
+        queue = self._queues[chat_id % self.workers]
+        if queue.qsize() >= self.queue_size:
+            TELEGRAM_UPDATES.labels("rejected").inc()
+            logger.warning(f"Telegram queue full, update {update_id} rejected")
+            return False
+
+        dedup_key = f"telegram:update:{update_id}"
+        if update_id is not None and not await cache_service.add(dedup_key, 1, self.dedup_ttl):
+            TELEGRAM_UPDATES.labels("duplicate").inc()
+            logger.debug(f"Telegram update {update_id} already seen")
+            return True
+
+        if cache_service.available:
+            try:
+                result = await self._enqueue_script(
+                    keys=[self._pending_key(chat_id), self._owner_key(chat_id)],
+                    args=[
+                        json.dumps({"update_id": update_id, "text": message["text"]}),
+                        self.queue_size,
+                        self.dedup_ttl,
+                        self._owner_id,
+                        self.chat_lock_ttl
+                    ]
+                )
+            except Exception as e:
+                logger.warning(f"Telegram update {update_id} queued in this process only: {str(e)}")
+            else:
+                if result < 0:
+                    # Not processed, so Telegram's retry must not count as a duplicate
+                    await cache_service.delete(dedup_key)
+                    TELEGRAM_UPDATES.labels("rejected").inc()
+                    logger.warning(f"Telegram chat {chat_id} has too many pending updates, update {update_id} rejected")
+                    return False
+                if result:
+                    self._owned.add(chat_id)
+                    queue.put_nowait((chat_id, None))
+                TELEGRAM_UPDATES.labels("queued").inc()
+                return True
+
+        queue.put_nowait((chat_id, (update_id, message["text"])))
+        TELEGRAM_UPDATES.labels("queued").inc()
+        return True
+
+    async def _release(self, chat_id: int):
+        """Give up the chat's owner key, if this process still holds it"""
+        self._owned.discard(chat_id)
+        await self._release_script(keys=[self._owner_key(chat_id)], args=[self._owner_id])
+
+    async def _claim_orphaned_chats(self):
+        """Take chats left with pending updates by a process that stopped"""
+        try:
+            if not cache_service.available:
+                return
+            redis = cache_service.redis_client
+            async for key in redis.scan_iter(match=self._pending_key("*"), count=500):
+                chat_id = int(key.decode().split(":")[2])
+                if await redis.set(self._owner_key(chat_id), self._owner_id, nx=True, ex=self.chat_lock_ttl):
+                    self._owned.add(chat_id)
+                    self._queues[chat_id % self.workers].put_nowait((chat_id, None))
+        except Exception as e:
+            logger.warning(f"Could not check for pending Telegram chats: {str(e)}")
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            chat_id, item = await queue.get()
+            try:
+                if item is None:
+                    await self._answer_pending(chat_id)
+                else:
+                    await self._process(item[0], chat_id, item[1])
+            except Exception as e:
+                logger.error(f"Telegram chat {chat_id} failed: {str(e)}")
+            finally:
+                queue.task_done()
+
+    async def _answer_pending(self, chat_id: int):
+        """Answer the chat's pending list in order, then release the chat"""
+        redis = cache_service.redis_client
+        pending, owner = self._pending_key(chat_id), self._owner_key(chat_id)
+
+        while True:
+            data = await redis.lpop(pending)
+            if data is None:
+                await self._release(chat_id)
+                # An update pushed while the chat was still owned found no new owner
+                if not await redis.llen(pending) or not await redis.set(
+                    owner, self._owner_id, nx=True, ex=self.chat_lock_ttl
+                ):
+                    return
+                self._owned.add(chat_id)
+                continue
+
+            await redis.expire(owner, self.chat_lock_ttl)
+            update = json.loads(data)
+            await self._process(update["update_id"], chat_id, update["text"])
+
+    async def _process(self, update_id: Optional[int], chat_id: int, text: str):
+        try:
+            await self.handle_message(chat_id, text)
+            TELEGRAM_UPDATES.labels("processed").inc()
+        except Exception as e:
+            TELEGRAM_UPDATES.labels("failed").inc()
+            logger.error(f"Telegram update {update_id} failed: {str(e)}")
+
+    async def handle_message(self, chat_id: int, text: str):
+        """Answer one chat message: emergency check, knowledge retrieval, LLM, reply"""
+        timer = StageTimer()
+
+        with timer.stage("emergency"):
+            is_emergency = rag_service.is_emergency(text)
+
+        if is_emergency:
+            response_text, provider_used = EMERGENCY_REPLY, "emergency_detection"
+        else:
+            with timer.stage("retrieval"):
+                medical_context = await rag_service.search_cached(text, 3)
+
+            with timer.stage("llm"):
+                response_text, provider_used = await llm_service.generate_response(
+                    prompt=text,
+                    medical_context=medical_context,
+                    db=None  # No DB session for telegram
+                )
+
+        with timer.stage("telegram_send"):
+            await self.send_message(chat_id, response_text)
+
+        # Telegram chats have no user account, so timings are logged rather than stored
+        logger.info(f"Telegram message handled via {provider_used}: {timer.as_dict()}")
+
+    async def _throttle(self, chat_id: int):
+        """Wait for this chat's next send slot and the next global slot"""
+        if cache_service.available:
+            try:
+                delay = float(await self._throttle_script(
+                    keys=["telegram:send:next", f"telegram:chat:{chat_id}:sent"],
+                    args=[self.chat_min_interval, 1.0 / self.global_rate]
+                ))
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                return
+            except Exception as e:
+                logger.warning(f"Telegram throttled in this process only: {str(e)}")
+
+        async with self._send_lock:
+            now = time.monotonic()
+            at = max(
+                now,
+                self._last_sent.get(chat_id, 0.0) + self.chat_min_interval,
+                self._next_global_slot
+            )
+            self._next_global_slot = at + 1.0 / self.global_rate
+            self._last_sent[chat_id] = at
+
+            # Forget chats whose interval has long passed
+            if len(self._last_sent) > 10000:
+                cutoff = now - self.chat_min_interval
+                self._last_sent = {chat: sent for chat, sent in self._last_sent.items() if sent > cutoff}
+
+        if at > now:
+            await asyncio.sleep(at - now)
+
+    async def send_message(self, chat_id: int, text: str, parse_mode: Optional[str] = "Markdown", retries: int = 3):
+        """
+        sendMessage, within the rate limits
+
+        Retries after Telegram's retry_after on 429, and once without
+        parse_mode if the text is not valid Markdown.
+        """
+        client = http_clients.get("telegram")
+
+        for _ in range(retries + 1):
+            await self._throttle(chat_id)
+
+            payload = {"chat_id": chat_id, "text": text}
+            if parse_mode:
+                payload["parse_mode"] = parse_mode
+            response = await client.post(f"/bot{self.token}/sendMessage", json=payload)
+
+            if response.status_code == 429:
+                retry_after = response.json().get("parameters", {}).get("retry_after", 1)
+                logger.warning(f"Telegram rate limit hit, retrying in {retry_after}s")
+                await asyncio.sleep(retry_after)
+                continue
+
+            if response.status_code == 400 and parse_mode and "parse entities" in response.text:
+                parse_mode = None
+                continue
+
+            response.raise_for_status()
+            return
+
+        raise RuntimeError(f"sendMessage to chat {chat_id} still rate limited after {retries} retries")
+
+
+# Singleton instance (started in the app lifespan when a bot token is set)
+telegram_service = TelegramService(
+    settings.TELEGRAM_BOT_TOKEN,
+    workers=settings.TELEGRAM_WORKERS,
+    queue_size=settings.TELEGRAM_QUEUE_SIZE,
+    dedup_ttl=settings.TELEGRAM_DEDUP_TTL,
+    chat_min_interval=settings.TELEGRAM_CHAT_MIN_INTERVAL,
+    global_rate=settings.TELEGRAM_GLOBAL_RATE,
+    chat_lock_ttl=settings.TELEGRAM_CHAT_LOCK_TTL
+)
@@ -1,10 +1,13 @@
 import os
 import base64
+import asyncio
 from typing import Optional
 from loguru import logger
 from google.cloud import texttospeech
 
 from app.config import settings
+from app.utils.metrics import observe_provider_call
+from app.utils.text import normalize_for_speech, chunk_text
 
 
 class TTSService:
@@ -15,7 +18,13 @@ class TTSService:
         if settings.GOOGLE_APPLICATION_CREDENTIALS:
             os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = settings.GOOGLE_APPLICATION_CREDENTIALS
 
-        self.client = texttospeech.TextToSpeechClient()
+        # The async (non-blocking) client binds to the running event loop,
+        # so it is created on first use
+        self._client: Optional[texttospeech.TextToSpeechAsyncClient] = None
+
+        # Google TTS rejects inputs over 5000 bytes per request
+        self.max_chunk_bytes = settings.TTS_MAX_CHUNK_BYTES
+        self.max_concurrency = settings.TTS_MAX_CONCURRENCY
 
         # Configure voice (Ghanaian English)
         self.voice = texttospeech.VoiceSelectionParams(
@@ -31,6 +40,12 @@ class TTSService:
             pitch=0.0
         )
 
+    @property
+    def client(self) -> texttospeech.TextToSpeechAsyncClient:
+        if self._client is None:
+            self._client = texttospeech.TextToSpeechAsyncClient()
+        return self._client
+
     async def synthesize_speech(self, text: str) -> Optional[str]:
         """
         Convert text to speech
@@ -41,22 +56,52 @@ class TTSService:
         Returns:
             Base64 encoded audio (MP3) or None if failed
         """
-        try:
-            # Prepare input
-            synthesis_input = texttospeech.SynthesisInput(text=text)
+        audio_content = await self.synthesize_audio(text)
+        if audio_content is None:
+            return None
+
+        # Encode audio to base64
+        return base64.b64encode(audio_content).decode('utf-8')
 
-            # Perform the text-to-speech request
-            response = self.client.synthesize_speech(
-                input=synthesis_input,
-                voice=self.voice,
-                audio_config=self.audio_config
-            )
+    async def synthesize_audio(self, text: str) -> Optional[bytes]:
+        """
+        Convert text to speech
 
-            # Encode audio to base64
-            audio_base64 = base64.b64encode(response.audio_content).decode('utf-8')
+        Markdown and emojis are stripped, the text is split on sentence
+        boundaries into chunks under the per-request limit, chunks are
+        synthesized in parallel and the MP3s are joined in order.
 
-            logger.info(f"TTS generated for text: {text[:50]}...")
-            return audio_base64
+        Args:
+            text: Text to convert to speech
+
+        Returns:
+            Raw MP3 bytes or None if failed
+        """
+        speech_text = normalize_for_speech(text)
+        if not speech_text:
+            logger.debug("TTS skipped: nothing to speak after normalization")
+            return None
+
+        chunks = chunk_text(speech_text, self.max_chunk_bytes)
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def synthesize_chunk(chunk: str) -> bytes:
+            async with semaphore:
+                with observe_provider_call("tts", "google"):
+                    response = await self.client.synthesize_speech(
+                        input=texttospeech.SynthesisInput(text=chunk),
+                        voice=self.voice,
+                        audio_config=self.audio_config
+                    )
+                return response.audio_content
+
+        try:
+            audio_chunks = await asyncio.gather(*(synthesize_chunk(chunk) for chunk in chunks))
+
+            logger.info(f"TTS generated for text ({len(chunks)} chunks): {speech_text[:50]}...")
+
+            # MP3 frames are self-delimiting, so chunks can be joined byte-for-byte
+            return b"".join(audio_chunks)
 
         except Exception as e:
             logger.error(f"TTS synthesis failed: {str(e)}")
@@ -73,20 +118,14 @@ class TTSService:
         Returns:
             True if successful, False otherwise
         """
-        try:
-            # Prepare input
-            synthesis_input = texttospeech.SynthesisInput(text=text)
-
-            # Perform the text-to-speech request
-            response = self.client.synthesize_speech(
-                input=synthesis_input,
-                voice=self.voice,
-                audio_config=self.audio_config
-            )
+        audio_content = await self.synthesize_audio(text)
+        if audio_content is None:
+            return False
 
+        try:
             # Save to file
             with open(output_path, "wb") as out:
-                out.write(response.audio_content)
+                out.write(audio_content)
 
             logger.info(f"TTS saved to file: {output_path}")
             return True
@@ -0,0 +1,148 @@
+import asyncio
+from dataclasses import asdict, dataclass
+from typing import Awaitable, Callable, Optional, Set
+from loguru import logger
+from sqlalchemy import event
+from sqlalchemy.orm import ORMExecuteState, Session, object_session
+
+from app.config import settings
+from app.db.models import User
+from app.services.cache_service import cache_service
+
+
+@dataclass
+class UserPrincipal:
+    """What request handlers need to know about the authenticated user"""
+    id: int
+    email: str
+    is_active: bool
+    token_version: int = 0
+
+    @classmethod
+    def from_user(cls, user: User) -> "UserPrincipal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            is_active=bool(user.is_active),
+            token_version=user.token_version or 0
+        )
+
+
+class UserCache:
+    """
+    Short-TTL cache of user principals, keyed by user id
+
+    Stored through cache_service.get_or_set: the in-process tier first, then
+    Redis (shared by all workers) if enabled, and concurrent requests for the
+    same uncached user share one database query. Entries are dropped when a
+    User row is updated or deleted through the ORM and the transaction
+    commits; other workers' in-process entries expire within CACHE_LOCAL_TTL.
+    ORM bulk UPDATE/DELETE statements on users invalidate every cached user
+    at once (invalidate_all()).
+    """
+
+    NAMESPACE = "auth:user"
+
+    def __init__(self, ttl: int = 60, use_redis: bool = True):
+        self.ttl = ttl
+        self.use_redis = use_redis
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def get_or_load(
+        self,
+        user_id: int,
+        loader: Callable[[], Awaitable[Optional[UserPrincipal]]]
+    ) -> Optional[UserPrincipal]:
+        """
+        Cached principal for a user, calling loader (a database lookup) on a miss
+
+        Returns:
+            The principal, or None if loader found no such user
+        """
+        if self.ttl <= 0:
+            return await loader()
+
+        async def load():
+            principal = await loader()
+            return asdict(principal) if principal is not None else None
+
+        key = await cache_service.namespace_key(self.NAMESPACE, user_id)
+        cached = await cache_service.get_or_set(key, load, self.ttl, shared=self.use_redis)
+        return UserPrincipal(**cached) if cached is not None else None
+
+    def invalidate(self, user_id: int):
+        """
+        Drop a user's cached principal from both tiers
+
+        Called from (sync) session events; the Redis delete is scheduled on
+        the running event loop. Outside one, the Redis entry expires within
+        the TTL.
+        """
+        cache_service.local.delete(cache_service.known_namespace_key(self.NAMESPACE, user_id))
+
+        if self.use_redis and cache_service.available:
+            self._schedule(self._delete(user_id))
+
+        logger.debug(f"User {user_id} principal invalidated")
+
+    async def _delete(self, user_id: int):
+        await cache_service.delete(await cache_service.namespace_key(self.NAMESPACE, user_id))
+
+    async def invalidate_all(self):
+        """Drop every cached principal, e.g. after a bulk update of users"""
+        await cache_service.invalidate_namespace(self.NAMESPACE)
+
+    def _schedule(self, coro):
+        """Run a coroutine on the running loop from sync code; dropped outside one"""
+        try:
+            task = asyncio.get_running_loop().create_task(coro)
+        except RuntimeError:
+            coro.close()
+            return
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+# Singleton instance
+user_cache = UserCache(
+    ttl=settings.AUTH_USER_CACHE_TTL,
+    use_redis=settings.AUTH_USER_CACHE_REDIS
+)
+
+
+# Invalidate once changes to users are committed, so a concurrent request
+# cannot re-cache the old row between the flush and the commit
+_PENDING_KEY = "user_cache_invalidate"
+_PENDING_ALL_KEY = "user_cache_invalidate_all"
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _mark_user_changed(mapper, connection, target: User):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_PENDING_KEY, set()).add(target.id)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_users_bulk_changed(state: ORMExecuteState):
+    # update(User)/delete(User) statements do not load rows or fire the events above
+    if (state.is_update or state.is_delete) and any(mapper.class_ is User for mapper in state.all_mappers):
+        state.session.info[_PENDING_ALL_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_users(session: Session):
+    if session.info.pop(_PENDING_ALL_KEY, False):
+        session.info.pop(_PENDING_KEY, None)
+        user_cache._schedule(user_cache.invalidate_all())
+        return
+
+    for user_id in session.info.pop(_PENDING_KEY, ()):
+        user_cache.invalidate(user_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_users(session: Session):
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_PENDING_ALL_KEY, None)
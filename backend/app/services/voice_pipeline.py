@@ -0,0 +1,420 @@
+import random
+import asyncio
+from dataclasses import dataclass
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from fastapi import BackgroundTasks
+from loguru import logger
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.database import AsyncSessionLocal, allocate_ids
+from app.db.models import Conversation
+from app.utils.metrics import CONVERSATION_SAVES
+from app.utils.timing import StageTimer
+
+EMERGENCY_RESPONSE = (
+    "🚨 EMERGENCY DETECTED 🚨\n\n"
+    "Your symptoms suggest a medical emergency. "
+    "Please call 112 immediately or visit the nearest hospital. "
+    "Do not delay seeking professional medical care.\n\n"
+    "If you are unable to get to a hospital, ask someone nearby to help you."
+)
+
+
+@dataclass
+class TurnContext:
+    """Everything known about a user message before the LLM runs"""
+    user_message: str
+    is_emergency: bool
+    symptoms: List[str]
+    medical_context: str
+    conversation_id: Optional[int] = None  # Pre-allocated, if the database supports it
+    history: str = ""  # Earlier turns, formatted for the prompt
+
+
+@dataclass
+class TurnResult:
+    """Outcome of one voice interaction"""
+    context: TurnContext
+    ai_response: str
+    provider: str
+    audio_url: Optional[str]
+    conversation_id: int
+    response_time_ms: int
+    stage_timings: Dict[str, int]
+
+
+@dataclass
+class BatchItemResult:
+    """Outcome for one message of a batch"""
+    index: int
+    ai_response: str
+    provider: str
+    is_emergency: bool
+    symptoms: List[str]
+    conversation_id: Optional[int]  # None until saved, on databases without sequences
+
+
+class VoicePipeline:
+    """
+    Voice interaction as a small stage graph
+
+        user message
+            ├── emergency check (keyword match, inline)
+            ├── symptom extraction ─┐
+            ├── knowledge retrieval ├── concurrent; CPU-bound work runs in threads
+            ├── conversation memory │
+            └── conversation id ────┘   (id pre-allocated from the Postgres sequence)
+                        │
+            emergency ? canned reply : LLM
+                        │
+            TTS now, or deferred until the audio URL is fetched
+                        │
+            conversation persisted in a background task after the response,
+            then the rolling memory summary is refreshed
+
+    Services are injected so the pipeline can be benchmarked with stand-ins.
+    """
+
+    def __init__(
+        self,
+        rag,
+        llm,
+        prepare_audio: Callable[[str, bool], Awaitable[Optional[str]]],
+        session_factory: Callable[[], AsyncSession] = AsyncSessionLocal,
+        memory=None,
+        background_save: bool = True,
+        save_attempts: int = 4,
+        save_backoff: float = 0.5
+    ):
+        self.rag = rag
+        self.llm = llm
+        self.prepare_audio = prepare_audio
+        self.session_factory = session_factory
+        self.memory = memory
+        self.background_save = background_save
+        self.save_attempts = max(1, save_attempts)
+        self.save_backoff = save_backoff
+
+    async def gather_context(
+        self,
+        user_message: str,
+        db: AsyncSession,
+        timer: Optional[StageTimer] = None,
+        user_id: Optional[int] = None,
+        session_turns: Optional[List[Tuple[str, str]]] = None
+    ) -> TurnContext:
+        """
+        Run the pre-LLM stages
+
+        Conversation memory is loaded when user_id is given: the recent turns
+        from the database, or session_turns when the caller keeps them (a
+        voice session), plus the cached summary.
+        """
+        timer = timer or StageTimer()
+
+        with timer.stage("emergency"):
+            is_emergency = self.rag.is_emergency(user_message)
+
+        async def reserve_id() -> Optional[int]:
+            with timer.stage("db"):
+                ids = await allocate_ids(db, "conversations")
+            return ids[0] if ids else None
+
+        if is_emergency:
+            conversation_id = await reserve_id()
+            return TurnContext(
+                user_message=user_message,
+                is_emergency=True,
+                symptoms=[],
+                medical_context="",
+                conversation_id=conversation_id
+            )
+
+        async def retrieve() -> str:
+            with timer.stage("retrieval"):
+                return await self.rag.search_cached(user_message, 3)
+
+        async def load_history() -> str:
+            if self.memory is None or user_id is None:
+                return ""
+            with timer.stage("memory"):
+                if session_turns is not None:
+                    return await self.memory.get_session_history(user_id, session_turns)
+                return await self.memory.get_history(user_id)
+
+        symptoms, medical_context, conversation_id, history = await asyncio.gather(
+            asyncio.to_thread(timer.wrap("symptoms", self.rag.extract_symptoms), user_message),
+            retrieve(),
+            reserve_id(),
+            load_history()
+        )
+        logger.info(f"Retrieved medical context ({len(medical_context)} chars)")
+
+        return TurnContext(
+            user_message=user_message,
+            is_emergency=False,
+            symptoms=symptoms,
+            medical_context=medical_context,
+            conversation_id=conversation_id,
+            history=history
+        )
+
+    async def run(
+        self,
+        user_message: str,
+        user_id: int,
+        db: AsyncSession,
+        background_tasks: Optional[BackgroundTasks] = None,
+        generate_audio: bool = True,
+        transcribed: bool = False,
+        timer: Optional[StageTimer] = None
+    ) -> TurnResult:
+        """
+        Run a full interaction for one user message
+
+        Args:
+            user_message: Text (or transcription) from the user
+            user_id: Owner of the conversation
+            db: Request database session
+            background_tasks: Where to schedule persistence; saved inline if None
+            generate_audio: Synthesize now rather than on first fetch
+            transcribed: The message came from speech-to-text
+            timer: Started when the request arrived; earlier stages (e.g. STT)
+                may already be recorded on it
+        """
+        timer = timer or StageTimer()
+
+        context = await self.gather_context(user_message, db, timer, user_id=user_id)
+
+        if context.is_emergency:
+            ai_response, provider = EMERGENCY_RESPONSE, "emergency_detection"
+        else:
+            with timer.stage("llm"):
+                ai_response, provider = await self.llm.generate_response(
+                    prompt=user_message,
+                    medical_context=context.medical_context,
+                    db=db,
+                    history=context.history
+                )
+            logger.info(f"AI response generated using {provider}")
+
+        with timer.stage("tts"):
+            audio_url = await self.prepare_audio(ai_response, generate_audio)
+
+        # Persistence happens after the response, so it is not part of these timings
+        stage_timings = timer.as_dict()
+        response_time_ms = stage_timings["total"]
+
+        conversation_id = await self.save_conversation(
+            db=db,
+            background_tasks=background_tasks,
+            conversation_id=context.conversation_id,
+            user_id=user_id,
+            user_message=user_message,
+            transcription=user_message if transcribed else None,
+            symptoms_extracted=context.symptoms,
+            ai_response=ai_response,
+            response_audio_url=audio_url,
+            is_emergency=context.is_emergency,
+            llm_provider=provider,
+            response_time_ms=response_time_ms,
+            stage_timings=stage_timings
+        )
+
+        logger.info(f"Conversation {conversation_id} handled in {response_time_ms}ms: {stage_timings}")
+
+        return TurnResult(
+            context=context,
+            ai_response=ai_response,
+            provider=provider,
+            audio_url=audio_url,
+            conversation_id=conversation_id,
+            response_time_ms=response_time_ms,
+            stage_timings=stage_timings
+        )
+
+    async def save_conversation(
+        self,
+        db: AsyncSession,
+        background_tasks: Optional[BackgroundTasks],
+        conversation_id: Optional[int],
+        **values
+    ) -> int:
+        """
+        Persist a conversation and return its id
+
+        With a pre-allocated id (and background_save) the insert runs as a
+        background task after the response is sent, retried if it fails;
+        otherwise it runs now, so the id resolves before it is returned. The
+        memory summary is refreshed once the conversation is stored.
+        """
+        if conversation_id is not None and background_tasks is not None and self.background_save:
+            background_tasks.add_task(self._persist_conversation, {"id": conversation_id, **values})
+        else:
+            conversation = Conversation(id=conversation_id, **values)
+            db.add(conversation)
+            await db.flush()  # Assigns the id without a refresh round trip after commit
+            conversation_id = conversation.id
+            await db.commit()
+
+        if self.memory is not None:
+            if background_tasks is not None:
+                # Background tasks run in order, so this sees the new row
+                background_tasks.add_task(self.memory.refresh_summary, values["user_id"])
+            else:
+                self.memory.schedule_refresh(values["user_id"])
+
+        return conversation_id
+
+    async def _persist_conversation(self, values: dict):
+        """
+        Background task: insert the conversation with its own session
+
+        Retried with exponential backoff (and jitter) up to save_attempts
+        times. If the row then turns out to exist, an earlier attempt was
+        committed after all (its id was reserved for this row).
+        """
+        for attempt in range(1, self.save_attempts + 1):
+            async with self.session_factory() as db:
+                try:
+                    db.add(Conversation(**values))
+                    await db.commit()
+                    CONVERSATION_SAVES.labels("saved").inc()
+                    return
+                except IntegrityError as e:
+                    await db.rollback()
+                    if await db.get(Conversation, values["id"]) is None:
+                        # Not a duplicate (e.g. the user is gone): retrying cannot help
+                        CONVERSATION_SAVES.labels("failed").inc()
+                        logger.error(f"Failed to persist conversation {values['id']}: {str(e)}")
+                        return
+                    CONVERSATION_SAVES.labels("saved").inc()
+                    return
+                except Exception as e:
+                    error = e
+
+            if attempt < self.save_attempts:
+                CONVERSATION_SAVES.labels("retry").inc()
+                delay = self.save_backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.0)
+                logger.warning(f"Saving conversation {values.get('id')} failed, retrying in {delay:.1f}s: {str(error)}")
+                await asyncio.sleep(delay)
+
+        CONVERSATION_SAVES.labels("failed").inc()
+        logger.error(
+            f"Failed to persist conversation {values.get('id')} of user {values.get('user_id')} "
+            f"after {self.save_attempts} attempts: {str(error)}"
+        )
+
+    async def run_batch(
+        self,
+        messages: List[str],
+        user_id: int,
+        db: AsyncSession,
+        llm_concurrency: int = 4
+    ) -> AsyncIterator[BatchItemResult]:
+        """
+        Run text messages as one batch, yielding results in input order
+
+        - Emergency detection and symptom extraction for the whole batch
+        - One batched embedding + retrieval call for all non-emergency messages
+        - LLM calls fanned out with bounded concurrency
+        - All conversations bulk-inserted once the batch completes
+        """
+        batch_timer = StageTimer()
+
+        with batch_timer.stage("emergency"):
+            emergencies = [self.rag.is_emergency(message) for message in messages]
+
+        pending = [i for i, is_emergency in enumerate(emergencies) if not is_emergency]
+        queries = [messages[i] for i in pending]
+
+        async def reserve_ids() -> Optional[List[int]]:
+            with batch_timer.stage("db"):
+                return await allocate_ids(db, "conversations", len(messages))
+
+        symptoms, contexts, ids = await asyncio.gather(
+            asyncio.to_thread(batch_timer.wrap("symptoms", lambda: [self.rag.extract_symptoms(q) for q in queries])),
+            asyncio.to_thread(batch_timer.wrap("retrieval", self.rag.search_batch), queries, 3),
+            reserve_ids()
+        )
+        symptoms_by_index = dict(zip(pending, symptoms))
+        context_by_index = dict(zip(pending, contexts))
+        shared_timings = dict(batch_timer.stages)
+
+        semaphore = asyncio.Semaphore(llm_concurrency)
+
+        async def respond(index: int):
+            timer = StageTimer()
+            if emergencies[index]:
+                return EMERGENCY_RESPONSE, "emergency_detection", timer
+
+            # Concurrent calls cannot share a session; each logs through its own
+            async with semaphore, self.session_factory() as llm_db:
+                with timer.stage("llm"):
+                    ai_response, provider = await self.llm.generate_response(
+                        prompt=messages[index],
+                        medical_context=context_by_index[index],
+                        db=llm_db
+                    )
+            return ai_response, provider, timer
+
+        tasks = [asyncio.create_task(respond(i)) for i in range(len(messages))]
+        rows, results = [], []
+
+        try:
+            for index, task in enumerate(tasks):
+                ai_response, provider, timer = await task
+                stage_timings = {**shared_timings, **timer.stages, "total": batch_timer.elapsed_ms()}
+
+                result = BatchItemResult(
+                    index=index,
+                    ai_response=ai_response,
+                    provider=provider,
+                    is_emergency=emergencies[index],
+                    symptoms=symptoms_by_index.get(index, []),
+                    conversation_id=ids[index] if ids else None
+                )
+                results.append(result)
+                rows.append({
+                    "id": result.conversation_id,
+                    "user_id": user_id,
+                    "user_message": messages[index],
+                    "symptoms_extracted": result.symptoms,
+                    "ai_response": ai_response,
+                    "is_emergency": result.is_emergency,
+                    "llm_provider": provider,
+                    "response_time_ms": stage_timings["total"],
+                    "stage_timings": stage_timings
+                })
+
+                yield result
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+        saved_ids = await self.save_conversations(db, rows)
+
+        # Without pre-allocation ids exist only now; results still held by the
+        # caller (non-streaming responses) pick them up
+        for result, conversation_id in zip(results, saved_ids):
+            result.conversation_id = conversation_id
+
+        logger.info(f"Batch of {len(messages)} messages handled in {batch_timer.elapsed_ms()}ms")
+
+    async def save_conversations(self, db: AsyncSession, rows: List[dict]) -> List[int]:
+        """Bulk insert conversations in one statement, returning their ids in order"""
+        if not rows:
+            return []
+
+        if rows[0]["id"] is None:
+            rows = [{k: v for k, v in row.items() if k != "id"} for row in rows]
+
+        ids = await db.scalars(
+            insert(Conversation).returning(Conversation.id, sort_by_parameter_order=True),
+            rows
+        )
+        await db.commit()
+        return list(ids)
@@ -0,0 +1,55 @@
+import asyncio
+import uuid
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+
+class VoiceSession:
+    """
+    State for one WebSocket voice session
+
+    Holds the authenticated user, the audio of the utterance currently being
+    received, the response in progress and the most recent turns, which are
+    the conversation memory given to the LLM for the session's next turn.
+    """
+
+    def __init__(self, user_id: int, max_audio_bytes: int, history_turns: int = 6):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.max_audio_bytes = max_audio_bytes
+
+        self.generate_audio = True
+        self.audio_format = "webm"
+
+        self._audio = bytearray()
+        self.turns: Deque[Tuple[str, str]] = deque(maxlen=history_turns)  # (user, assistant)
+        self.turn_task: Optional[asyncio.Task] = None
+
+    def append_audio(self, chunk: bytes) -> bool:
+        """Buffer an audio frame; False if the utterance would exceed the size limit"""
+        if len(self._audio) + len(chunk) > self.max_audio_bytes:
+            return False
+        self._audio.extend(chunk)
+        return True
+
+    def take_audio(self) -> bytes:
+        """Return the buffered utterance and start a new one"""
+        audio = bytes(self._audio)
+        self._audio.clear()
+        return audio
+
+    def add_turn(self, user_message: str, ai_response: str):
+        self.turns.append((user_message, ai_response))
+
+    def recent_turns(self) -> List[Tuple[str, str]]:
+        return list(self.turns)
+
+    async def cancel_turn(self):
+        """Stop the response in progress, if any"""
+        task, self.turn_task = self.turn_task, None
+        if task is not None and not task.done():
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
@@ -1,18 +1,37 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.config import settings
 from app.db.database import get_db
 from app.db.models import User
 from app.models.schemas import TokenData
+from app.services.user_cache import UserPrincipal, user_cache
 
 # Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Hashes with a different work factor are flagged for rehashing in either
+# direction, so changing BCRYPT_ROUNDS migrates users as they log in
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS
+)
+
+# bcrypt releases the GIL, so a few threads hash in parallel while the event
+# loop keeps serving other requests; the pool bounds CPU spent on logins
+_password_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    thread_name_prefix="password-hash"
+)
 
 # Bearer token scheme
 security = HTTPBearer()
@@ -28,6 +47,26 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def hash_password(password: str) -> str:
+    """Hash a password on the password hashing pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_password_executor, pwd_context.hash, password)
+
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verify a password on the password hashing pool
+
+    Returns:
+        (valid, new_hash) - new_hash is set when the stored hash uses an
+        outdated work factor and should be replaced
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _password_executor, pwd_context.verify_and_update, plain_password, hashed_password
+    )
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token"""
     to_encode = data.copy()
@@ -49,6 +88,30 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
+def create_user_token(user: User) -> str:
+    """
+    Create an access token for a user
+
+    The subject is the user id as a string (as JWT requires). The token
+    version lets every token issued so far be revoked by bumping it. With
+    AUTH_TRUST_TOKEN_CLAIMS the token also carries what get_current_user
+    needs, so requests can be authenticated without a lookup; since neither
+    revocation nor deactivation is then checked, such tokens only live for
+    AUTH_TRUSTED_TOKEN_EXPIRE_MINUTES.
+    """
+    claims = {"sub": str(user.id), "ver": user.token_version or 0}
+
+    if settings.AUTH_TRUST_TOKEN_CLAIMS:
+        claims.update({"email": user.email, "act": bool(user.is_active)})
+        return create_access_token(data=claims, expires_delta=_trusted_token_lifetime())
+
+    return create_access_token(data=claims)
+
+
+def _trusted_token_lifetime() -> timedelta:
+    return timedelta(minutes=min(settings.AUTH_TRUSTED_TOKEN_EXPIRE_MINUTES, settings.ACCESS_TOKEN_EXPIRE_MINUTES))
+
+
 def decode_access_token(token: str) -> Optional[TokenData]:
     """Decode JWT access token"""
     try:
@@ -57,22 +120,97 @@ def decode_access_token(token: str) -> Optional[TokenData]:
             settings.JWT_SECRET_KEY,
             algorithms=[settings.JWT_ALGORITHM]
         )
-        user_id: int = payload.get("sub")
+        user_id = payload.get("sub")
 
         if user_id is None:
             return None
 
-        return TokenData(user_id=user_id)
+        return TokenData(
+            user_id=user_id,
+            token_version=payload.get("ver", 0),
+            email=payload.get("email"),
+            is_active=payload.get("act"),
+            expires_at=datetime.utcfromtimestamp(payload["exp"]) if "exp" in payload else None
+        )
+
+    except (JWTError, ValueError):
+        return None
+
+
+async def resolve_principal(token_data: TokenData, db: AsyncSession) -> Optional[UserPrincipal]:
+    """
+    Look up the user a decoded token refers to
+
+    Uses trusted token claims when enabled and present, then the user cache,
+    and only then the database. Returns None if the user does not exist or the
+    token was revoked (its version is older than the user's).
+
+    Claims are only trusted in tokens that expire within
+    AUTH_TRUSTED_TOKEN_EXPIRE_MINUTES; longer-lived ones (issued before the
+    setting was enabled or lowered) are checked like any other token.
+    """
+    if _claims_trusted(token_data):
+        return UserPrincipal(
+            id=token_data.user_id,
+            email=token_data.email,
+            is_active=token_data.is_active,
+            token_version=token_data.token_version
+        )
+
+    async def load() -> Optional[UserPrincipal]:
+        result = await db.execute(
+            select(User.id, User.email, User.is_active, User.token_version)
+            .where(User.id == token_data.user_id)
+        )
+        row = result.one_or_none()
+        if row is None:
+            return None
+
+        return UserPrincipal(
+            id=row.id,
+            email=row.email,
+            is_active=bool(row.is_active),
+            token_version=row.token_version or 0
+        )
+
+    principal = await user_cache.get_or_load(token_data.user_id, load)
+    if principal is None:
+        return None
+
+    if token_data.token_version != principal.token_version:
+        return None
+
+    return principal
 
-    except JWTError:
+
+def _claims_trusted(token_data: TokenData) -> bool:
+    if not settings.AUTH_TRUST_TOKEN_CLAIMS or token_data.email is None or token_data.is_active is None:
+        return False
+    # A minute of slack for clock differences between workers
+    latest = datetime.utcnow() + _trusted_token_lifetime() + timedelta(minutes=1)
+    return token_data.expires_at is not None and token_data.expires_at <= latest
+
+
+async def get_user_from_token(token: str, db: AsyncSession) -> Optional[UserPrincipal]:
+    """Resolve an access token to an active user, or None"""
+    token_data = decode_access_token(token)
+
+    if token_data is None or token_data.user_id is None:
         return None
 
+    principal = await resolve_principal(token_data, db)
+
+    if principal is None or not principal.is_active:
+        return None
+
+    return principal
+
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    """Get current authenticated user"""
+    db: AsyncSession = Depends(get_db)
+) -> UserPrincipal:
+    """Get current authenticated user (id, email and status; load the User row if more is needed)"""
 
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -86,7 +224,7 @@ async def get_current_user(
     if token_data is None or token_data.user_id is None:
         raise credentials_exception
 
-    user = db.query(User).filter(User.id == token_data.user_id).first()
+    user = await resolve_principal(token_data, db)
 
     if user is None:
         raise credentials_exception
@@ -98,3 +236,15 @@ async def get_current_user(
         )
 
     return user
+
+
+async def get_current_admin(current_user: UserPrincipal = Depends(get_current_user)) -> UserPrincipal:
+    """Get current user, requiring admin access"""
+
+    if current_user.email.lower() not in settings.admin_emails_list:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+
+    return current_user
@@ -0,0 +1,207 @@
+"""
+Streaming export of conversations for clinical review
+
+Rows are read through a server-side cursor (yield_per) and encoded as NDJSON
+or CSV, optionally gzipped, a chunk at a time, so memory use stays constant
+however many rows are exported. Used by GET /api/conversations/export and
+from the command line:
+
+    python -m app.utils.export --since 2026-01-01 --emergency-only --format csv --gzip -o export.csv.gz
+"""
+import io
+import csv
+import sys
+import json
+import zlib
+import asyncio
+import argparse
+from datetime import datetime, timezone
+from typing import AsyncIterator, Callable, Iterable, Optional
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.db.database import AsyncSessionLocal, async_engine
+from app.db.models import Conversation
+
+FORMATS = ("ndjson", "csv")
+
+EXPORT_COLUMNS = [
+    Conversation.id,
+    Conversation.user_id,
+    Conversation.created_at,
+    Conversation.user_message,
+    Conversation.transcription,
+    Conversation.symptoms_extracted,
+    Conversation.ai_response,
+    Conversation.is_emergency,
+    Conversation.llm_provider,
+    Conversation.response_time_ms,
+]
+FIELDS = [column.key for column in EXPORT_COLUMNS]
+
+# Encoded output is flushed in chunks of about this size
+CHUNK_BYTES = 64 * 1024
+
+
+def export_query(
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    emergency: Optional[bool] = None
+) -> Select:
+    """Conversations in [since, until), optionally only (non-)emergencies, oldest first"""
+    query = select(*EXPORT_COLUMNS)
+
+    if since is not None:
+        query = query.where(Conversation.created_at >= since)
+    if until is not None:
+        query = query.where(Conversation.created_at < until)
+    if emergency is not None:
+        query = query.where(Conversation.is_emergency.is_(emergency))
+
+    return query.order_by(Conversation.created_at, Conversation.id)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _ndjson_lines(rows: Iterable) -> Iterable[str]:
+    for row in rows:
+        yield json.dumps(dict(row._mapping), default=_json_default, ensure_ascii=False) + "\n"
+
+
+def _csv_lines(rows: Iterable, header: bool = False) -> Iterable[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def take() -> str:
+        line = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate(0)
+        return line
+
+    if header:
+        writer.writerow(FIELDS)
+        yield take()
+
+    for row in rows:
+        writer.writerow([
+            json.dumps(value) if isinstance(value, (list, dict)) else
+            value.isoformat() if isinstance(value, datetime) else
+            value
+            for value in row
+        ])
+        yield take()
+
+
+async def export_conversations(
+    format: str = "ndjson",
+    compress: bool = False,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    emergency: Optional[bool] = None,
+    session_factory: Callable[[], AsyncSession] = AsyncSessionLocal,
+    batch_size: int = 1000
+) -> AsyncIterator[bytes]:
+    """
+    Stream matching conversations as encoded (and optionally gzipped) bytes
+
+    Uses its own session, so it can back a StreamingResponse after the
+    request's dependencies have been closed.
+
+    Args:
+        format: "ndjson" (one JSON object per line) or "csv" (with a header row)
+        compress: gzip the output
+        since, until: created_at range, until exclusive
+        emergency: Only emergencies (True), only non-emergencies (False), or all
+        session_factory: Where to get the database session
+        batch_size: Rows fetched from the server-side cursor at a time
+
+    Returns:
+        Chunks of about CHUNK_BYTES (before compression)
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Unknown export format: {format}")
+
+    encode = _ndjson_lines if format == "ndjson" else _csv_lines
+    compressor = zlib.compressobj(wbits=31) if compress else None  # wbits=31: gzip container
+
+    def output(data: bytes) -> bytes:
+        return compressor.compress(data) if compressor else data
+
+    query = export_query(since, until, emergency).execution_options(yield_per=batch_size)
+    pending, size = [], 0
+
+    if format == "csv":
+        pending.append("".join(_csv_lines([], header=True)).encode())
+
+    async with session_factory() as db:
+        result = await db.stream(query)
+
+        async for partition in result.partitions():
+            for line in encode(partition):
+                data = line.encode()
+                pending.append(data)
+                size += len(data)
+
+            if size >= CHUNK_BYTES:
+                chunk = output(b"".join(pending))
+                pending, size = [], 0
+                if chunk:
+                    yield chunk
+
+    chunk = output(b"".join(pending))
+    if compressor:
+        chunk += compressor.flush()
+    if chunk:
+        yield chunk
+
+
+def export_filename(format: str, compress: bool) -> str:
+    name = f"conversations-{datetime.utcnow():%Y%m%d-%H%M%S}.{format}"
+    return name + ".gz" if compress else name
+
+
+def _utc_datetime(value: str) -> datetime:
+    """ISO date or datetime from the command line; UTC unless it has an offset"""
+    moment = datetime.fromisoformat(value)
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+async def _main(args):
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    emergency = True if args.emergency_only else False if args.non_emergency_only else None
+
+    try:
+        async for chunk in export_conversations(
+            format=args.format,
+            compress=args.gzip,
+            since=args.since,
+            until=args.until,
+            emergency=emergency,
+            batch_size=args.batch_size
+        ):
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+        # Close pooled connections before the event loop goes away
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export conversations as NDJSON or CSV")
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("--gzip", action="store_true", help="gzip the output")
+    parser.add_argument("--since", type=_utc_datetime, help="ISO date/datetime (UTC), inclusive")
+    parser.add_argument("--until", type=_utc_datetime, help="ISO date/datetime (UTC), exclusive")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--emergency-only", action="store_true")
+    group.add_argument("--non-emergency-only", action="store_true")
+    parser.add_argument("--batch-size", type=int, default=settings.EXPORT_BATCH_SIZE)
+    parser.add_argument("-o", "--output", help="File to write (default: stdout)")
+
+    asyncio.run(_main(parser.parse_args()))
@@ -1,9 +1,20 @@
 import json
+import asyncio
 from pathlib import Path
 from loguru import logger
+from app.services.cache_service import cache_service
 from app.services.rag_service import rag_service
 
 
+async def invalidate_cached_searches():
+    """Make every worker drop search results cached from the old knowledge base"""
+    await cache_service.connect()
+    try:
+        await rag_service.invalidate_cache()
+    finally:
+        await cache_service.close()
+
+
 def load_medical_knowledge():
     """Load medical knowledge into ChromaDB"""
 
@@ -30,6 +41,8 @@ def load_medical_knowledge():
         rag_service.add_documents(documents)
         logger.info(f"Successfully loaded {len(documents)} medical documents")
 
+        asyncio.run(invalidate_cached_searches())
+
     except Exception as e:
         logger.error(f"Failed to load medical knowledge: {str(e)}")
 
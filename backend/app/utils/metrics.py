@@ -0,0 +1,257 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.requests import Request
+from starlette.responses import Response
+
+from app.utils.provider_health import provider_health
+
+# Buckets sized for this app: sub-ms cache/DB calls up to multi-second LLM calls
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# HTTP
+HTTP_REQUEST_DURATION = Histogram(
+    "medivoice_http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS
+)
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "medivoice_http_requests_in_flight",
+    "HTTP requests currently being handled",
+    multiprocess_mode="livesum"
+)
+
+# External providers (LLM, STT, TTS)
+PROVIDER_CALL_DURATION = Histogram(
+    "medivoice_provider_call_duration_seconds",
+    "Provider call latency",
+    ["service", "provider", "outcome"],
+    buckets=LATENCY_BUCKETS
+)
+PROVIDER_CALL_ERRORS = Counter(
+    "medivoice_provider_call_errors_total",
+    "Failed provider calls",
+    ["service", "provider"]
+)
+PROVIDER_CALLS_IN_FLIGHT = Gauge(
+    "medivoice_provider_calls_in_flight",
+    "Provider calls currently in progress",
+    ["service", "provider"],
+    multiprocess_mode="livesum"
+)
+
+# Cache
+CACHE_REQUESTS = Counter(
+    "medivoice_cache_requests_total",
+    "Cache lookups by tier and result (hit ratio = hit / (hit + miss))",
+    ["tier", "result"]
+)
+CACHE_LOADS = Counter(
+    "medivoice_cache_loads_total",
+    "get_or_set outcomes on a miss: loader ran (miss, early_refresh) or waited on a concurrent load (collapsed)",
+    ["reason"]
+)
+CACHE_REDIS_UP = Gauge(
+    "medivoice_cache_redis_up",
+    "1 while Redis is reachable, 0 while the cache runs from the local tier only",
+    multiprocess_mode="livemin"
+)
+
+# Outbound HTTP (connection reuse = 1 - tcp connections / requests)
+HTTP_CLIENT_REQUESTS = Counter(
+    "medivoice_http_client_requests_total",
+    "Outbound HTTP requests by upstream and protocol version",
+    ["upstream", "http_version"]
+)
+HTTP_CLIENT_CONNECTIONS = Counter(
+    "medivoice_http_client_connections_total",
+    "New outbound connections (tcp) and TLS handshakes (tls) by upstream",
+    ["upstream", "kind"]
+)
+
+# Telegram
+TELEGRAM_UPDATES = Counter(
+    "medivoice_telegram_updates_total",
+    "Telegram updates by result (queued, duplicate, ignored, rejected, processed, failed)",
+    ["result"]
+)
+
+# Conversations saved after the response
+CONVERSATION_SAVES = Counter(
+    "medivoice_conversation_saves_total",
+    "Background conversation inserts by outcome (saved, retry, failed)",
+    ["outcome"]
+)
+
+# Outbox
+OUTBOX_DELIVERIES = Counter(
+    "medivoice_outbox_deliveries_total",
+    "Outbox message delivery attempts by outcome (delivered, retry, failed)",
+    ["topic", "outcome"]
+)
+
+# Database connection pool
+DB_POOL_CHECKOUTS = Counter(
+    "medivoice_db_pool_checkouts_total",
+    "Connections checked out of the pool",
+    ["engine"]
+)
+DB_POOL_WAIT = Histogram(
+    "medivoice_db_pool_wait_seconds",
+    "Time spent waiting to check out a pooled connection",
+    ["engine"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+)
+
+
+@contextmanager
+def observe_provider_call(service: str, provider: str) -> Iterator[None]:
+    """
+    Time a provider call and count failures
+
+    Exceptions are recorded and re-raised, so callers keep their own handling.
+    The outcome also feeds provider_health, which readiness reports.
+    """
+    in_flight = PROVIDER_CALLS_IN_FLIGHT.labels(service, provider)
+    in_flight.inc()
+    start = time.perf_counter()
+    outcome = "success"
+    try:
+        yield
+    except Exception:
+        outcome = "error"
+        PROVIDER_CALL_ERRORS.labels(service, provider).inc()
+        raise
+    finally:
+        in_flight.dec()
+        PROVIDER_CALL_DURATION.labels(service, provider, outcome).observe(time.perf_counter() - start)
+        provider_health.record(service, provider, outcome == "success")
+
+
+def record_cache_lookup(tier: str, hit: bool):
+    CACHE_REQUESTS.labels(tier, "hit" if hit else "miss").inc()
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request latency per route template
+
+    Uses the matched route's path (e.g. /api/audio/{audio_id}.mp3), not the raw
+    URL, to keep label cardinality bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.dec()
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                str(status_code)
+            ).observe(time.perf_counter() - start)
+
+
+class _PoolWaitTiming:
+    """Records how long checkouts wait for a connection"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT.labels(self._metrics_name).observe(time.perf_counter() - start)
+
+
+class InstrumentedQueuePool(_PoolWaitTiming, QueuePool):
+    _metrics_name = "sync"
+
+
+class InstrumentedAsyncQueuePool(_PoolWaitTiming, AsyncAdaptedQueuePool):
+    _metrics_name = "async"
+
+
+class DatabasePoolCollector(Collector):
+    """Reads pool occupancy at scrape time, so it costs nothing per request"""
+
+    def __init__(self):
+        self.engines = {}
+
+    def add(self, name: str, engine: Engine):
+        self.engines[name] = engine
+
+    def collect(self):
+        size = GaugeMetricFamily("medivoice_db_pool_size", "Configured pool size", labels=["engine"])
+        checked_out = GaugeMetricFamily("medivoice_db_pool_checked_out", "Connections in use", labels=["engine"])
+        overflow = GaugeMetricFamily(
+            "medivoice_db_pool_overflow",
+            "Connections open beyond pool_size (negative while the pool is still filling)",
+            labels=["engine"]
+        )
+
+        for name, engine in self.engines.items():
+            pool = engine.pool
+            if not isinstance(pool, QueuePool):
+                continue
+            size.add_metric([name], pool.size())
+            checked_out.add_metric([name], pool.checkedout())
+            overflow.add_metric([name], pool.overflow())
+
+        yield size
+        yield checked_out
+        yield overflow
+
+
+_pool_collector = DatabasePoolCollector()
+REGISTRY.register(_pool_collector)
+
+
+def instrument_engine(engine: Engine, name: str):
+    """Export connection pool metrics for an engine (the sync engine of an AsyncEngine)"""
+    event.listen(engine, "checkout", lambda *args: DB_POOL_CHECKOUTS.labels(name).inc())
+    _pool_collector.add(name, engine)
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    """
+    Prometheus scrape endpoint
+
+    Under the multi-worker server (PROMETHEUS_MULTIPROC_DIR set, see
+    gunicorn.conf.py) metrics are aggregated over all workers; pool
+    occupancy is then that of the worker answering the scrape.
+    """
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return Response(generate_latest(REGISTRY), media_type=CONTENT_TYPE_LATEST)
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(_pool_collector)
+    return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
@@ -0,0 +1,84 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+from fastapi import HTTPException, Response, status
+from sqlalchemy import DateTime, Select, String, literal, tuple_
+from sqlalchemy.types import TypeDecorator
+
+from app.config import settings
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class CursorTimestamp(TypeDecorator):
+    """
+    A cursor's created_at, bound so it compares like the stored values
+
+    SQLite keeps timestamps as text, and created_at comes from
+    CURRENT_TIMESTAMP ('YYYY-MM-DD HH:MM:SS'); a datetime bound the default
+    way ('...THH:MM:SS.ffffff' or '... HH:MM:SS.000000') sorts after every
+    row of the same second, so the page would never advance. Other databases
+    compare real timestamps and get the value unchanged.
+    """
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "sqlite":
+            return dialect.type_descriptor(String())
+        return dialect.type_descriptor(DateTime(timezone=True))
+
+    def process_bind_param(self, value: Optional[datetime], dialect):
+        if value is None or dialect.name != "sqlite":
+            return value
+        text = value.strftime("%Y-%m-%d %H:%M:%S")
+        return f"{text}.{value.microsecond:06d}" if value.microsecond else text
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Opaque cursor for the row a page ended on"""
+    payload = json.dumps([created_at.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor; raises a 400 for cursors we did not issue"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def page_size(limit: int) -> int:
+    return max(1, min(limit, settings.PAGE_SIZE_MAX))
+
+
+def keyset_page(query: Select, model, cursor: Optional[str], limit: int) -> Select:
+    """
+    Newest-first page of a query, continuing after the cursor
+
+    Orders by (created_at, id) descending, which the (user_id, created_at, id)
+    indexes serve directly, and fetches one extra row to detect a next page.
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        after = tuple_(literal(created_at, CursorTimestamp()), literal(row_id, model.id.type))
+        query = query.where(tuple_(model.created_at, model.id) < after)
+
+    return query.order_by(model.created_at.desc(), model.id.desc()).limit(page_size(limit) + 1)
+
+
+def finish_page(rows: list, limit: int, response: Response) -> list:
+    """Trim the look-ahead row and set the next-page cursor header"""
+    limit = page_size(limit)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.created_at, last.id)
+    return rows
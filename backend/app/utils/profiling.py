@@ -0,0 +1,191 @@
+import io
+import hmac
+import json
+import time
+import uuid
+import random
+import pstats
+import cProfile
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from html import escape
+from typing import Any, Deque, Dict, List, Optional
+
+from loguru import logger
+
+from app.config import settings
+from app.utils.timing import collect_stage_timers
+
+try:
+    from pyinstrument import Profiler
+    from pyinstrument.renderers import HTMLRenderer, SpeedscopeRenderer
+except ImportError:  # Optional; cProfile is used without it
+    Profiler = None
+
+PROFILE_HEADER = "x-profile"
+PROFILE_ID_HEADER = "x-profile-id"
+
+
+@dataclass
+class RequestProfile:
+    """One profiled request: what it was, how long its stages took, and the profile itself"""
+    id: str
+    method: str
+    path: str
+    trigger: str  # "header" or "sample"
+    engine: str  # "pyinstrument" or "cprofile"
+    started_at: datetime
+    duration_ms: int = 0
+    status_code: int = 500
+    stage_timings: List[Dict[str, int]] = field(default_factory=list)
+    data: Any = None  # pyinstrument Session or cProfile.Profile
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "status_code": self.status_code,
+            "trigger": self.trigger,
+            "engine": self.engine,
+            "started_at": self.started_at.isoformat(),
+            "duration_ms": self.duration_ms,
+            "stage_timings": self.stage_timings,
+        }
+
+    def html(self) -> str:
+        if self.engine == "pyinstrument":
+            return HTMLRenderer().render(self.data)
+
+        output = io.StringIO()
+        stats = pstats.Stats(self.data, stream=output)
+        stats.sort_stats("cumulative").print_stats(60)
+        title = escape(f"{self.method} {self.path} - {self.duration_ms} ms")
+        timings = escape(json.dumps(self.stage_timings))
+        return (
+            f"<html><head><title>{title}</title></head><body>"
+            f"<h3>{title}</h3><p>Stage timings: {timings}</p>"
+            f"<pre>{escape(output.getvalue())}</pre></body></html>"
+        )
+
+    def speedscope(self) -> Optional[str]:
+        """speedscope.app JSON; only pyinstrument profiles keep the call stacks it needs"""
+        if self.engine != "pyinstrument":
+            return None
+        return SpeedscopeRenderer().render(self.data)
+
+
+class ProfileStore:
+    """The last max_profiles request profiles of this worker, oldest dropped first"""
+
+    def __init__(self, max_profiles: int = 20):
+        self._profiles: Deque[RequestProfile] = deque(maxlen=max(1, max_profiles))
+
+    def add(self, profile: RequestProfile):
+        self._profiles.append(profile)
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        for profile in self._profiles:
+            if profile.id == profile_id:
+                return profile
+        return None
+
+    def list(self) -> List[RequestProfile]:
+        """Newest first"""
+        return list(reversed(self._profiles))
+
+
+class ProfilerMiddleware:
+    """
+    ASGI middleware profiling selected requests
+
+    A request is profiled if it carries `X-Profile: <PROFILER_SECRET>`, or at
+    random with probability sample_rate. pyinstrument (if installed) samples
+    only the profiled request's own task, including time spent awaiting;
+    cProfile, the fallback, sees everything on the event loop thread while the
+    request runs, and only one request is profiled at a time with it. The
+    StageTimers the request creates are stored with the profile, whose id is
+    returned in the X-Profile-Id response header. The secret only selects
+    requests: profiles are read through /api/profiles, which needs an admin.
+
+    Only added when PROFILER_ENABLED is set, so it costs nothing otherwise.
+    """
+
+    def __init__(self, app, store: ProfileStore, sample_rate: float = 0.0, secret: str = "", interval: float = 0.001):
+        self.app = app
+        self.store = store
+        self.sample_rate = sample_rate
+        self.secret = secret.encode()
+        self.interval = interval
+        self._cprofile_active = False
+
+    def _trigger(self, scope) -> Optional[str]:
+        if self.secret:
+            for name, value in scope["headers"]:
+                if name == PROFILE_HEADER.encode():
+                    if hmac.compare_digest(value, self.secret):
+                        return "header"
+                    break
+        if self.sample_rate and random.random() < self.sample_rate:
+            return "sample"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        trigger = self._trigger(scope) if scope["type"] == "http" else None
+        if trigger is None or (Profiler is None and self._cprofile_active):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(
+            id=uuid.uuid4().hex[:16],
+            method=scope["method"],
+            path=scope["path"],
+            trigger=trigger,
+            engine="pyinstrument" if Profiler is not None else "cprofile",
+            started_at=datetime.utcnow()
+        )
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                profile.status_code = message["status"]
+                message = {
+                    **message,
+                    "headers": [*message.get("headers", []), (PROFILE_ID_HEADER.encode(), profile.id.encode())]
+                }
+            await send(message)
+
+        if Profiler is not None:
+            profiler = Profiler(interval=self.interval, async_mode="enabled")
+        else:
+            profiler = cProfile.Profile()
+            self._cprofile_active = True
+
+        start = time.perf_counter()
+        with collect_stage_timers() as timers:
+            try:
+                if Profiler is not None:
+                    profiler.start()
+                    try:
+                        await self.app(scope, receive, send_wrapper)
+                    finally:
+                        profile.data = profiler.stop()
+                else:
+                    profiler.enable()
+                    try:
+                        await self.app(scope, receive, send_wrapper)
+                    finally:
+                        profiler.disable()
+                        self._cprofile_active = False
+                        profile.data = profiler
+            finally:
+                profile.duration_ms = int((time.perf_counter() - start) * 1000)
+                profile.stage_timings = [timer.as_dict() for timer in timers]
+                self.store.add(profile)
+                logger.info(
+                    f"Profiled {profile.method} {profile.path} ({trigger}) in {profile.duration_ms}ms: {profile.id}"
+                )
+
+
+# Singleton instance
+profile_store = ProfileStore(settings.PROFILER_MAX_PROFILES)
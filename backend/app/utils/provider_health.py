@@ -0,0 +1,60 @@
+import time
+from dataclasses import dataclass
+from typing import Dict, Tuple
+
+from app.config import settings
+
+
+@dataclass
+class _ProviderState:
+    consecutive_failures: int = 0
+    last_failure: float = 0.0  # monotonic time
+
+
+class ProviderHealth:
+    """
+    Recent outcome of the calls to each external provider
+
+    Fed by observe_provider_call. A provider whose last failure_threshold
+    calls all failed is reported down until a call succeeds, or until window
+    seconds pass without another failure (it is then unknown again). This is
+    what readiness reports; calls are never blocked by it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, window: float = 60.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.window = window
+        self._states: Dict[Tuple[str, str], _ProviderState] = {}
+
+    def record(self, service: str, provider: str, ok: bool):
+        state = self._states.setdefault((service, provider), _ProviderState())
+        if ok:
+            state.consecutive_failures = 0
+        else:
+            state.consecutive_failures += 1
+            state.last_failure = time.monotonic()
+
+    def status(self, service: str, provider: str) -> Tuple[str, int]:
+        """
+        Returns:
+            ("ok" | "down" | "unknown", consecutive failures); unknown until the
+            provider has been called, or after window seconds without a failure
+            while it was down
+        """
+        state = self._states.get((service, provider))
+        if state is None:
+            return "unknown", 0
+
+        if state.consecutive_failures < self.failure_threshold:
+            return "ok", state.consecutive_failures
+
+        if time.monotonic() - state.last_failure > self.window:
+            return "unknown", state.consecutive_failures
+        return "down", state.consecutive_failures
+
+
+# Singleton instance
+provider_health = ProviderHealth(
+    failure_threshold=settings.PROVIDER_FAILURE_THRESHOLD,
+    window=settings.PROVIDER_HEALTH_WINDOW
+)
@@ -0,0 +1,93 @@
+import json
+import zlib
+from typing import Any, Dict
+
+try:
+    import msgpack
+except ImportError:  # Optional; JSON is used without it
+    msgpack = None
+
+
+class Serializer:
+    """Encodes cache values to bytes and back"""
+
+    name = ""
+    code = 0  # Stored in the header byte of each value, so either codec can read it later
+
+    def dumps(self, value: Any) -> bytes:
+        raise NotImplementedError
+
+    def loads(self, data: bytes) -> Any:
+        raise NotImplementedError
+
+
+class JSONSerializer(Serializer):
+    name = "json"
+    code = 1
+
+    def dumps(self, value: Any) -> bytes:
+        return json.dumps(value, separators=(",", ":")).encode()
+
+    def loads(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class MsgpackSerializer(Serializer):
+    """Smaller and faster than JSON; also round-trips bytes and datetimes"""
+
+    name = "msgpack"
+    code = 2
+
+    def dumps(self, value: Any) -> bytes:
+        return msgpack.packb(value, use_bin_type=True, datetime=True)
+
+    def loads(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, raw=False, timestamp=3)
+
+
+SERIALIZERS: Dict[str, Serializer] = {JSONSerializer.name: JSONSerializer()}
+if msgpack is not None:
+    SERIALIZERS[MsgpackSerializer.name] = MsgpackSerializer()
+
+_BY_CODE = {serializer.code: serializer for serializer in SERIALIZERS.values()}
+_COMPRESSED = 0x80
+
+
+class ValueCodec:
+    """
+    Serializer plus optional zlib compression for values over a size threshold
+
+    Each value starts with one header byte: the serializer code, with the high
+    bit set if the payload is compressed. Values written with another codec
+    (e.g. before the serializer setting changed) are still readable.
+    """
+
+    def __init__(self, serializer: str = "msgpack", compress_min_bytes: int = 1024, compress_level: int = 6):
+        self.serializer = SERIALIZERS.get(serializer, SERIALIZERS["json"])
+        self.compress_min_bytes = compress_min_bytes  # 0 disables compression
+        self.compress_level = compress_level
+
+    def encode(self, value: Any) -> bytes:
+        payload = self.serializer.dumps(value)
+        header = self.serializer.code
+
+        if self.compress_min_bytes and len(payload) >= self.compress_min_bytes:
+            compressed = zlib.compress(payload, self.compress_level)
+            if len(compressed) < len(payload):
+                payload, header = compressed, header | _COMPRESSED
+
+        return bytes((header,)) + payload
+
+    def decode(self, data: bytes) -> Any:
+        """Inverse of encode; raises ValueError for data it cannot read"""
+        if not data:
+            raise ValueError("Empty cache value")
+
+        header, payload = data[0], data[1:]
+        serializer = _BY_CODE.get(header & ~_COMPRESSED)
+        if serializer is None:
+            raise ValueError(f"Unknown cache value format {header:#x}")
+
+        if header & _COMPRESSED:
+            payload = zlib.decompress(payload)
+        return serializer.loads(payload)
@@ -0,0 +1,157 @@
+import re
+from typing import List, Optional
+
+# Sentence end: terminal punctuation (optionally followed by closing quotes/brackets)
+# then whitespace, or a blank line
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])[\"')\]]*\s+|\n\s*\n")
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into sentences"""
+    return [part.strip() for part in _SENTENCE_BOUNDARY.split(text) if part and part.strip()]
+
+
+class SentenceSplitter:
+    """
+    Incrementally split streamed text into sentences
+
+    Text is fed in arbitrary deltas (e.g. LLM tokens). Complete sentences are
+    returned as soon as their boundary is seen; very short sentences are merged
+    with the next one so downstream work (e.g. TTS requests) is not too small.
+    """
+
+    def __init__(self, min_chars: int = 40):
+        self.min_chars = min_chars
+        self._buffer = ""
+        self._pending = ""
+
+    def feed(self, delta: str) -> List[str]:
+        """Add text and return any sentences completed by it"""
+        self._buffer += delta
+        sentences = []
+
+        while True:
+            match = _SENTENCE_BOUNDARY.search(self._buffer)
+            if not match:
+                break
+
+            sentence = self._buffer[:match.end()].strip()
+            self._buffer = self._buffer[match.end():]
+
+            if not sentence:
+                continue
+
+            self._pending = f"{self._pending} {sentence}".strip()
+            if len(self._pending) >= self.min_chars:
+                sentences.append(self._pending)
+                self._pending = ""
+
+        return sentences
+
+    def flush(self) -> Optional[str]:
+        """Return whatever text remains once the stream has ended"""
+        remaining = f"{self._pending} {self._buffer.strip()}".strip()
+        self._pending = ""
+        self._buffer = ""
+        return remaining or None
+
+
+_MARKDOWN_LINK = re.compile(r"\[([^\]]+)\]\([^)]+\)")
+_MARKDOWN_EMPHASIS = re.compile(r"(\*{1,3}|_{2,3}|~~|`+)")
+_MARKDOWN_PREFIX = re.compile(r"^\s*(#{1,6}\s+|>\s+|[-*+]\s+)", re.MULTILINE)
+_EMOJI = re.compile(
+    "["
+    "\U0001F000-\U0001FAFF"  # Emoticons, symbols, pictographs, flags
+    "\u2600-\u27BF"  # Misc symbols and dingbats (e.g. warning sign)
+    "\u2B00-\u2BFF"  # Arrows and stars
+    "\uFE0E\uFE0F"  # Variation selectors
+    "\u200D"  # Zero width joiner
+    "]+"
+)
+_WHITESPACE = re.compile(r"[ \t]+")
+
+
+def normalize_for_speech(text: str) -> str:
+    """Strip markdown and emojis so they are not read aloud"""
+    text = _MARKDOWN_LINK.sub(r"\1", text)
+    text = _MARKDOWN_PREFIX.sub("", text)
+    text = _MARKDOWN_EMPHASIS.sub("", text)
+    text = _EMOJI.sub("", text)
+    text = _WHITESPACE.sub(" ", text)
+    lines = [line.strip() for line in text.splitlines()]
+    return "\n".join(lines).strip()
+
+
+def chunk_text(text: str, max_bytes: int) -> List[str]:
+    """
+    Group sentences into chunks of at most max_bytes (UTF-8)
+
+    Sentences longer than the limit are split on word boundaries.
+    """
+    chunks = []
+    current = ""
+
+    for sentence in split_sentences(text):
+        for piece in _split_oversized(sentence, max_bytes):
+            candidate = f"{current} {piece}" if current else piece
+            if len(candidate.encode("utf-8")) <= max_bytes:
+                current = candidate
+            else:
+                chunks.append(current)
+                current = piece
+
+    if current:
+        chunks.append(current)
+
+    return chunks
+
+
+def _split_oversized(sentence: str, max_bytes: int) -> List[str]:
+    if len(sentence.encode("utf-8")) <= max_bytes:
+        return [sentence]
+
+    pieces = []
+    current = ""
+    for word in sentence.split():
+        candidate = f"{current} {word}" if current else word
+        if len(candidate.encode("utf-8")) <= max_bytes:
+            current = candidate
+            continue
+
+        if current:
+            pieces.append(current)
+
+        # A single word over the limit is cut by bytes as a last resort
+        while len(word.encode("utf-8")) > max_bytes:
+            cut = word.encode("utf-8")[:max_bytes].decode("utf-8", errors="ignore")
+            pieces.append(cut)
+            word = word[len(cut):]
+        current = word
+
+    if current:
+        pieces.append(current)
+
+    return pieces
+
+
+# Rough token count for English text; avoids a tokenizer per provider
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of LLM tokens in text"""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to about max_tokens, on a word boundary"""
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    if max_chars <= 0:
+        return ""
+
+    cut = text[:max_chars - 1]
+    if " " in cut:
+        cut = cut.rsplit(" ", 1)[0]
+    return cut.rstrip() + "…"
@@ -0,0 +1,67 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Dict, Iterator, List, Optional
+
+# Timers created while a request is profiled (see collect_stage_timers)
+_collected_timers: ContextVar[Optional[List["StageTimer"]]] = ContextVar("collected_timers", default=None)
+
+
+class StageTimer:
+    """
+    Per-stage latency breakdown for one request
+
+    Stages are timed with `with timer.stage("llm"):` (works around awaits) or by
+    wrapping a function run elsewhere, e.g. in a worker thread:
+    `await asyncio.to_thread(timer.wrap("retrieval", rag_service.search), query)`.
+    Times are in milliseconds; a stage timed more than once is summed.
+    """
+
+    def __init__(self):
+        self._start = time.perf_counter()
+        self.stages: Dict[str, int] = {}
+
+        collected = _collected_timers.get()
+        if collected is not None:
+            collected.append(self)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - start) * 1000)
+
+    def wrap(self, name: str, func: Callable) -> Callable:
+        @wraps(func)
+        def timed(*args, **kwargs):
+            with self.stage(name):
+                return func(*args, **kwargs)
+        return timed
+
+    def record(self, name: str, elapsed_ms: float):
+        self.stages[name] = self.stages.get(name, 0) + int(round(elapsed_ms))
+
+    def mark(self, name: str):
+        """Record the time elapsed since the request started (e.g. time to first audio)"""
+        self.stages[name] = self.elapsed_ms()
+
+    def elapsed_ms(self) -> int:
+        return int((time.perf_counter() - self._start) * 1000)
+
+    def as_dict(self) -> Dict[str, int]:
+        """Stage timings plus the end-to-end total"""
+        return {**self.stages, "total": self.elapsed_ms()}
+
+
+@contextmanager
+def collect_stage_timers() -> Iterator[List[StageTimer]]:
+    """Collect the StageTimers created inside the block (and in tasks it starts)"""
+    collected: List[StageTimer] = []
+    token = _collected_timers.set(collected)
+    try:
+        yield collected
+    finally:
+        _collected_timers.reset(token)
@@ -0,0 +1,181 @@
+"""
+Benchmark: cache get/set throughput and value encoding
+
+Compares, for a few representative cached values:
+- the old path: sync redis client + JSON, called from async code via a thread
+- the async CacheService, one command per key
+- the async CacheService with mget/mset (one round trip per batch)
+- reads served by the in-process tier in front of Redis
+and reports serialized size and encode/decode time for JSON, msgpack and
+msgpack with compression.
+
+Runs against an in-process fakeredis server by default (pip install fakeredis),
+which shows client and serialization overhead but no network latency; pass
+--redis-url to use a real (local) Redis, where batching also saves round trips.
+Keys are written under bench:cache:* and removed afterwards.
+
+Usage (from backend/):
+    python -m benchmarks.bench_cache --ops 5000 --batch 50
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+
+# Settings are required at import time; the benchmark builds its own clients
+for key, value in {
+    "SECRET_KEY": "benchmark",
+    "DATABASE_URL": "sqlite://",
+    "REDIS_URL": "redis://localhost:6379/0",
+    "GROQ_API_KEY": "benchmark",
+    "GOOGLE_API_KEY": "benchmark",
+    "GROQ_WHISPER_API_KEY": "benchmark",
+    "N8N_WEBHOOK_URL": "http://localhost:5678/webhook/appointment-booking",
+    "JWT_SECRET_KEY": "benchmark",
+}.items():
+    os.environ.setdefault(key, value)
+
+import redis  # noqa: E402
+from loguru import logger  # noqa: E402
+
+from app.services.cache_service import CacheService  # noqa: E402
+from app.utils.serialization import ValueCodec  # noqa: E402
+
+logger.remove()
+logger.add(sys.stderr, level="ERROR")
+
+PREFIX = "bench:cache:"
+
+VALUES = {
+    "user principal": {"id": 48213, "email": "ama.mensah@example.com", "is_active": True, "token_version": 0},
+    "memory summary": {
+        "summary": "The user's daughter (6) has had a fever of 38.5C and a cough for three days. "
+                   "Advised fluids, paracetamol dosing by weight and a clinic visit if it lasts "
+                   "beyond five days or breathing becomes difficult.",
+        "through_id": 991234,
+    },
+    "cached answer": {
+        "text": (
+            "Malaria is common in Ghana and often starts with fever, chills, headache and body aches. "
+            "Because symptoms overlap with many other illnesses, a rapid diagnostic test at a clinic "
+            "or pharmacy is the only way to confirm it. "
+        ) * 12,
+        "provider": "groq",
+        "symptoms": ["fever", "chills", "headache"],
+    },
+    "audio metadata": {
+        "audio_id": "5f0c2a9e4b7d4e1c9a3f",
+        "content_type": "audio/mpeg",
+        "bytes": 48211,
+        "segments": [{"index": i, "offset": i * 4017, "length": 4017, "text_chars": 180} for i in range(12)],
+    },
+}
+
+
+def codec_table():
+    codecs = {
+        "json": ValueCodec("json", compress_min_bytes=0),
+        "msgpack": ValueCodec("msgpack", compress_min_bytes=0),
+        "msgpack+zlib": ValueCodec("msgpack", compress_min_bytes=1024),
+    }
+    rounds = 20000
+
+    print(f"{'value':<16}{'codec':<14}{'bytes':>7}{'encode µs':>11}{'decode µs':>11}")
+    for name, value in VALUES.items():
+        for codec_name, codec in codecs.items():
+            data = codec.encode(value)
+            start = time.perf_counter()
+            for _ in range(rounds):
+                codec.encode(value)
+            encode_us = (time.perf_counter() - start) / rounds * 1e6
+            start = time.perf_counter()
+            for _ in range(rounds):
+                codec.decode(data)
+            decode_us = (time.perf_counter() - start) / rounds * 1e6
+            print(f"{name:<16}{codec_name:<14}{len(data):>7}{encode_us:>11.1f}{decode_us:>11.1f}")
+    print()
+
+
+def clients(redis_url):
+    """(sync client, async CacheService) sharing one server; the local tier starts disabled"""
+    if redis_url:
+        sync_client = redis.from_url(redis_url, decode_responses=True)
+        service = CacheService(redis_url, local_max_entries=0)
+        return sync_client, service
+
+    import fakeredis
+
+    server = fakeredis.FakeServer()
+    sync_client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    service = CacheService("redis://localhost:6379/0", local_max_entries=0)
+    service.redis_client = fakeredis.FakeAsyncRedis(server=server)
+    return sync_client, service
+
+
+async def throughput(sync_client, service: CacheService, ops: int, batch: int, concurrency: int):
+    value = VALUES["memory summary"]
+    keys = [f"{PREFIX}{i}" for i in range(ops)]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    # The previous CacheService: sync client and JSON, run in a thread
+    def old_set(key):
+        sync_client.setex(key, 60, json.dumps(value))
+
+    def old_get(key):
+        raw = sync_client.get(key)
+        return json.loads(raw) if raw else None
+
+    async def bounded(coro_fn, key):
+        async with semaphore:
+            return await coro_fn(key)
+
+    async def run(name, op, fn, items):
+        start = time.perf_counter()
+        await asyncio.gather(*(bounded(fn, item) for item in items))
+        elapsed = time.perf_counter() - start
+        print(f"{name:<28}{op:<5}{ops / elapsed:>12.0f}")
+
+    batches = [keys[i:i + batch] for i in range(0, ops, batch)]
+
+    print(f"{'client':<28}{'op':<5}{'keys/s':>12}")
+    await run("sync + thread (old)", "set", lambda key: asyncio.to_thread(old_set, key), keys)
+    await run("sync + thread (old)", "get", lambda key: asyncio.to_thread(old_get, key), keys)
+    await run("async", "set", lambda key: service.set(key, value, 60), keys)
+    await run("async", "get", service.get, keys)
+    await run(f"async mset/mget ({batch}/call)", "set",
+              lambda chunk: service.mset({key: value for key in chunk}, 60), batches)
+    await run(f"async mset/mget ({batch}/call)", "get", service.mget, batches)
+
+    # Two-tier: warm the in-process tier from Redis, then read it back
+    service.local.max_entries = ops
+    await service.mget(keys)
+    await run("two-tier (local hits)", "get", service.get, keys)
+
+    # Clean up in batches
+    for chunk in batches:
+        await service.delete(*chunk)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ops", type=int, default=5000)
+    parser.add_argument("--batch", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--redis-url", default="", help="Real Redis instead of fakeredis")
+    args = parser.parse_args()
+
+    codec_table()
+
+    sync_client, service = clients(args.redis_url)
+    service.available = True
+    try:
+        await throughput(sync_client, service, args.ops, args.batch, args.concurrency)
+    finally:
+        await service.close()
+        sync_client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,164 @@
+"""
+Benchmark: sync Session vs AsyncSession inside async request handlers
+
+Runs the database work of a typical authenticated request (load the user,
+load recent conversations, write an LLM log row) plus an awaited provider call,
+at increasing concurrency, against the database in DATABASE_URL. With the sync
+session every query blocks the event loop, so other requests' provider calls
+and queries cannot overlap with it; the async session yields while waiting.
+
+Event-loop lag (how late a 10 ms ticker fires) is reported alongside latency
+and throughput. Both modes get the same pool limits (DB_POOL_SIZE +
+DB_MAX_OVERFLOW). Keep --concurrency below that total: past it the sync mode
+deadlocks until pool_timeout, since the blocked loop waits for a connection
+that only another coroutine on the same loop can return.
+
+Use a staging Postgres database; a file SQLite database (not :memory:) works
+for a quick local run, though its single-writer lock flattens the comparison.
+A benchmark user is created and the rows it writes are removed afterwards.
+
+Usage (from backend/, with .env or DATABASE_URL etc. set):
+    python -m benchmarks.bench_db_sessions --requests 400 --concurrency 25
+"""
+import time
+import asyncio
+import argparse
+import statistics
+
+from loguru import logger
+from sqlalchemy import create_engine, delete, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.db.database import AsyncSessionLocal, Base, async_engine
+from app.db.models import Conversation, LLMLog, User
+
+logger.remove()
+
+# The sync setup this replaced, with the async engine's pool limits
+# (SQLite gets its default pool, which takes no size arguments)
+pool_args = {}
+if make_url(settings.DATABASE_URL).get_backend_name() != "sqlite":
+    pool_args = dict(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+    )
+engine = create_engine(settings.DATABASE_URL, pool_pre_ping=True, **pool_args)
+SessionLocal = sessionmaker(bind=engine, autoflush=False, expire_on_commit=False)
+
+BENCHMARK_EMAIL = "db-benchmark@medivoice.local"
+BENCHMARK_MODEL = "db-benchmark"
+PROVIDER_S = 0.050  # Awaited provider call per request
+
+
+def setup() -> int:
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        user = db.execute(select(User).where(User.email == BENCHMARK_EMAIL)).scalar_one_or_none()
+        if user is None:
+            user = User(email=BENCHMARK_EMAIL, hashed_password="!")
+            db.add(user)
+            db.flush()
+            db.add_all(
+                Conversation(user_id=user.id, user_message=f"message {i}", ai_response="response")
+                for i in range(50)
+            )
+            db.commit()
+        return user.id
+
+
+def teardown(user_id: int):
+    with SessionLocal() as db:
+        db.execute(delete(LLMLog).where(LLMLog.model == BENCHMARK_MODEL))
+        db.execute(delete(Conversation).where(Conversation.user_id == user_id))
+        db.execute(delete(User).where(User.id == user_id))
+        db.commit()
+
+
+async def sync_request(user_id: int):
+    """Sync session in an async handler: queries block the event loop"""
+    with SessionLocal() as db:
+        db.execute(select(User).where(User.id == user_id)).scalar_one()
+        db.execute(
+            select(Conversation).where(Conversation.user_id == user_id)
+            .order_by(Conversation.created_at.desc()).limit(20)
+        ).scalars().all()
+        await asyncio.sleep(PROVIDER_S)
+        db.add(LLMLog(provider="benchmark", model=BENCHMARK_MODEL, response_time_ms=0, success=True))
+        db.commit()
+
+
+async def async_request(user_id: int):
+    """AsyncSession: the event loop serves other requests while queries run"""
+    async with AsyncSessionLocal() as db:
+        (await db.execute(select(User).where(User.id == user_id))).scalar_one()
+        (await db.execute(
+            select(Conversation).where(Conversation.user_id == user_id)
+            .order_by(Conversation.created_at.desc()).limit(20)
+        )).scalars().all()
+        await asyncio.sleep(PROVIDER_S)
+        db.add(LLMLog(provider="benchmark", model=BENCHMARK_MODEL, response_time_ms=0, success=True))
+        await db.commit()
+
+
+async def measure(handler, user_id: int, requests: int, concurrency: int):
+    latencies = []
+    lags = []
+    semaphore = asyncio.Semaphore(concurrency)
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.010)
+            lags.append((time.perf_counter() - start - 0.010) * 1000)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await handler(user_id)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    ticker_task = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await ticker_task
+
+    latencies.sort()
+    return {
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+        "rps": requests / elapsed,
+        "lag": max(lags) if lags else 0.0,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=25)
+    args = parser.parse_args()
+
+    user_id = await asyncio.to_thread(setup)
+    try:
+        # Warm both pools
+        await measure(sync_request, user_id, 10, 5)
+        await measure(async_request, user_id, 10, 5)
+
+        print(f"{'session':<9}{'concurrency':<13}{'p50 ms':>9}{'p95 ms':>9}{'req/s':>9}{'max lag ms':>12}")
+        for concurrency in sorted({1, 10, args.concurrency}):
+            for name, handler in (("sync", sync_request), ("async", async_request)):
+                stats = await measure(handler, user_id, args.requests, concurrency)
+                print(f"{name:<9}{concurrency:<13}{stats['p50']:>9.0f}{stats['p95']:>9.0f}"
+                      f"{stats['rps']:>9.1f}{stats['lag']:>12.0f}")
+    finally:
+        await asyncio.to_thread(teardown, user_id)
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
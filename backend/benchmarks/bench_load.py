@@ -0,0 +1,389 @@
+"""
+Load test: the real app against local fake providers
+
+Starts the fake providers (benchmarks.fake_providers) and the real FastAPI
+app in separate processes, with a throwaway SQLite database unless
+--database-url is given (SQLite serializes writes; use Postgres for numbers
+comparable to production), Redis pointed at a closed port (the cache runs in
+its degraded, in-process mode) unless --redis-url is given, and every
+provider URL pointing at the fakes. Then each flow is driven with a fixed
+number of requests at a fixed concurrency:
+- text:      POST /api/voice/interact with a text message (retrieval, LLM, TTS)
+- audio:     the same with base64 audio (adds STT)
+- emergency: a text message caught by emergency detection (no LLM)
+- telegram:  POST /api/telegram/webhook; reports the webhook's own latency and,
+             as "telegram e2e", the time until the reply reaches the fake
+             Bot API (bounded by TELEGRAM_GLOBAL_RATE)
+- booking:   POST /api/appointments/book (n8n delivery runs in the background)
+and p50/p95/p99 latency, requests/s and errors are reported per flow.
+Text messages are numbered so retrieval is not answered from its cache.
+
+Needs no network access or API keys, so it can run in CI; --json writes the
+results and --max-error-rate fails the run when a flow has too many errors.
+Provider latencies and failure rates are set with --profile (see
+benchmarks.fake_providers); --latency-scale shrinks them all for a quick run.
+
+Usage (from backend/):
+    python -m benchmarks.bench_load --requests 200 --concurrency 20
+    python -m benchmarks.bench_load --flows text,telegram --profile llm=300:900:0.05
+    python -m benchmarks.bench_load --requests 30 --latency-scale 0.1 --json load.json --max-error-rate 0.01
+"""
+import os
+import sys
+import json
+import math
+import time
+import base64
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.fake_providers import parse_profiles, profile_args
+
+FLOWS = ["text", "audio", "emergency", "telegram", "booking"]
+
+QUESTIONS = [
+    "I have had a fever and chills since yesterday, what should I do",
+    "My child has diarrhoea and is vomiting",
+    "How can I prevent malaria during the rainy season",
+    "I have a cough that will not go away after two weeks",
+    "What are the signs of typhoid fever",
+]
+
+EMERGENCY_MESSAGE = "My father has chest pain and is sweating a lot"
+
+BOT_TOKEN = "123456:benchmark"
+WEBHOOK_SECRET = "benchmark"
+
+
+@dataclass
+class FlowResult:
+    name: str
+    latencies: List[float] = field(default_factory=list)  # seconds, successful requests only
+    errors: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def requests(self) -> int:
+        return len(self.latencies) + self.errors
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / self.requests if self.requests else 0.0
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Nearest-rank percentile, in milliseconds"""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)] * 1000
+
+    def as_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "requests_per_second": len(self.latencies) / self.elapsed if self.elapsed else None,
+        }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def app_environment(
+    workdir: str,
+    providers_url: str,
+    redis_url: str,
+    overrides: List[str],
+    database_url: str = ""
+) -> Dict[str, str]:
+    """Environment for the app process: every external dependency local"""
+    env = dict(os.environ)
+    env.update({
+        "SECRET_KEY": "benchmark",
+        "JWT_SECRET_KEY": "benchmark",
+        # SQLite allows one writer at a time; wait for the lock rather than fail
+        "DATABASE_URL": database_url or f"sqlite:///{workdir}/bench.db?timeout=60",
+        "REDIS_URL": redis_url,
+        "XAI_API_KEY": "benchmark",
+        "XAI_API_BASE": f"{providers_url}/v1",
+        "GROQ_API_KEY": "benchmark",
+        "GROQ_WHISPER_API_KEY": "benchmark",
+        "GROQ_BASE_URL": providers_url,  # Read by the Groq SDK
+        "GOOGLE_API_KEY": "",  # No stand-in for Gemini; it is skipped
+        "N8N_WEBHOOK_URL": f"{providers_url}/webhook/appointment-booking",
+        "TELEGRAM_BOT_TOKEN": BOT_TOKEN,
+        "TELEGRAM_WEBHOOK_SECRET": WEBHOOK_SECRET,
+        "TELEGRAM_API_BASE": providers_url,
+        "AUDIO_STORAGE_BACKEND": "local",
+        "AUDIO_STORAGE_DIR": f"{workdir}/audio",
+        "BCRYPT_ROUNDS": "4",
+        "ROLLUP_ENABLED": "false",
+        "HF_HUB_OFFLINE": "1",  # Models are only used if already downloaded
+    })
+    for override in overrides:
+        key, _, value = override.partition("=")
+        env[key] = value
+    return env
+
+
+async def wait_until_up(client: httpx.AsyncClient, url: str, process: subprocess.Popen, timeout: float = 120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode} before starting")
+        try:
+            if (await client.get(url)).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.25)
+    raise RuntimeError(f"{url} did not start within {timeout:.0f}s")
+
+
+async def login(client: httpx.AsyncClient, app_url: str) -> Dict[str, str]:
+    credentials = {"email": "load@example.com", "password": "benchmark"}
+    await client.post(f"{app_url}/api/auth/register", json={**credentials, "full_name": "Load Test"})
+    response = await client.post(f"{app_url}/api/auth/login", json=credentials)
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def drive(name: str, requests: int, concurrency: int, send) -> FlowResult:
+    """Call send(i) for i in range(requests), at most concurrency at a time"""
+    result = FlowResult(name)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await send(i)
+                ok = response.is_success
+            except httpx.HTTPError:
+                ok = False
+            if ok:
+                result.latencies.append(time.perf_counter() - start)
+            else:
+                result.errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+async def telegram_flow(
+    client: httpx.AsyncClient,
+    app_url: str,
+    providers_url: str,
+    requests: int,
+    concurrency: int,
+    drain_timeout: float
+) -> List[FlowResult]:
+    """Webhook acknowledgement latency, then end-to-end latency to the fake Bot API"""
+    base = int(time.time() * 1000)
+    sent_at: Dict[int, float] = {}
+
+    async def send(i: int):
+        chat_id = base + i  # One chat per update, so per-chat throttling does not serialize them
+        update = {
+            "update_id": base + i,
+            "message": {
+                "message_id": i + 1,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "text": f"{QUESTIONS[i % len(QUESTIONS)]} ({i})"
+            }
+        }
+        sent_at[chat_id] = time.time()
+        response = await client.post(
+            f"{app_url}/api/telegram/webhook",
+            json=update,
+            headers={"X-Telegram-Bot-Api-Secret-Token": WEBHOOK_SECRET}
+        )
+        if not response.is_success:
+            sent_at.pop(chat_id, None)
+        return response
+
+    webhook = await drive("telegram", requests, concurrency, send)
+
+    # Wait for the replies
+    start = time.perf_counter()
+    deadline = time.monotonic() + drain_timeout
+    delivered: Dict[str, float] = {}
+    while time.monotonic() < deadline:
+        delivered = (await client.get(f"{providers_url}/_fake/stats")).json()["telegram_deliveries"]
+        if len(delivered) >= len(sent_at):
+            break
+        await asyncio.sleep(0.2)
+
+    e2e = FlowResult("telegram e2e")
+    for chat_id, sent in sent_at.items():
+        arrived = delivered.get(str(chat_id))
+        if arrived is None:
+            e2e.errors += 1
+        else:
+            e2e.latencies.append(arrived - sent)
+    e2e.errors += webhook.errors
+    e2e.elapsed = webhook.elapsed + (time.perf_counter() - start)
+    return [webhook, e2e]
+
+
+async def run(args, app_url: str, providers_url: str) -> List[FlowResult]:
+    limits = httpx.Limits(max_connections=args.concurrency + 2, max_keepalive_connections=args.concurrency + 2)
+    async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as client:
+        await wait_until_up(client, f"{providers_url}/_fake/stats", args.providers_process)
+        await wait_until_up(client, f"{app_url}/api/health", args.app_process)
+        headers = await login(client, app_url)
+
+        audio = base64.b64encode(os.urandom(16000)).decode()
+
+        def interact(payload: dict):
+            return client.post(f"{app_url}/api/voice/interact", json=payload, headers=headers)
+
+        senders = {
+            "text": lambda i: interact({"text_message": f"{QUESTIONS[i % len(QUESTIONS)]} ({i})"}),
+            "audio": lambda i: interact({"audio_data": audio}),
+            "emergency": lambda i: interact({"text_message": EMERGENCY_MESSAGE}),
+            "booking": lambda i: client.post(f"{app_url}/api/appointments/book", headers=headers, json={
+                "full_name": "Load Test",
+                "phone": "+233200000000",
+                "preferred_date": "2030-01-15",
+                "preferred_time": "10:00",
+                "reason": f"Load test {i}"
+            }),
+        }
+
+        results = []
+        for flow in args.flows:
+            # Warm up connections, imports and caches outside the measurement
+            if flow in senders:
+                send = senders[flow]
+                await drive(flow, min(args.concurrency, 5), args.concurrency, lambda i: send(args.requests + i))
+                results.append(await drive(flow, args.requests, args.concurrency, senders[flow]))
+            else:
+                results += await telegram_flow(
+                    client, app_url, providers_url, args.requests, args.concurrency, args.drain_timeout
+                )
+            print(f"  {flow} done", file=sys.stderr)
+
+        args.provider_calls = (await client.get(f"{providers_url}/_fake/stats")).json()["calls"]
+        return results
+
+
+def fmt(value: Optional[float], spec: str) -> str:
+    return "-" if value is None else format(value, spec)
+
+
+def report(results: List[FlowResult], provider_calls: Dict[str, Dict[str, int]]):
+    print(f"{'flow':<14}{'requests':>9}{'errors':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}")
+    for result in results:
+        stats = result.as_dict()
+        print(
+            f"{result.name:<14}{stats['requests']:>9}{stats['errors']:>8}"
+            f"{fmt(stats['p50_ms'], '.0f'):>9}{fmt(stats['p95_ms'], '.0f'):>9}{fmt(stats['p99_ms'], '.0f'):>9}"
+            f"{fmt(stats['requests_per_second'], '.1f'):>9}"
+        )
+    print()
+    print(f"{'provider':<14}{'calls':>9}{'failed':>8}")
+    for name, counts in provider_calls.items():
+        print(f"{name:<14}{counts['ok'] + counts['failed']:>9}{counts['failed']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--flows", default="text,audio,emergency,telegram",
+                        help=f"Comma-separated, from {','.join(FLOWS)}")
+    parser.add_argument("--requests", type=int, default=100, help="Per flow")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds per request")
+    parser.add_argument("--drain-timeout", type=float, default=120.0,
+                        help="Seconds to wait for Telegram replies after the last webhook")
+    parser.add_argument("--profile", action="append", default=[], metavar="NAME=MEDIAN:P95[:FAILURE_RATE]",
+                        help="Fake provider latency in ms and failure rate, e.g. llm=300:900:0.05")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiplies all provider latencies")
+    parser.add_argument("--redis-url", default="redis://127.0.0.1:1/0",
+                        help="Redis for the app; by default a closed port, so the cache runs in-process only")
+    parser.add_argument("--database-url", default="",
+                        help="Database for the app (e.g. an empty Postgres); by default a temporary SQLite file")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra app setting, e.g. TELEGRAM_WORKERS=16")
+    parser.add_argument("--json", default="", help="Write the results to this file")
+    parser.add_argument("--max-error-rate", type=float, default=None,
+                        help="Exit with status 1 if any flow's error rate is higher")
+    args = parser.parse_args()
+
+    args.flows = [flow.strip() for flow in args.flows.split(",") if flow.strip()]
+    unknown = set(args.flows) - set(FLOWS)
+    if unknown:
+        parser.error(f"unknown flows: {', '.join(sorted(unknown))}")
+    profiles = parse_profiles(args.profile, args.latency_scale)
+
+    providers_port, app_port = free_port(), free_port()
+    providers_url = f"http://127.0.0.1:{providers_port}"
+    app_url = f"http://127.0.0.1:{app_port}"
+
+    with tempfile.TemporaryDirectory(prefix="bench_load_") as workdir:
+        app_log = open(os.path.join(workdir, "app.log"), "w")
+        command = [sys.executable, "-m", "benchmarks.fake_providers"]
+        args.providers_process = subprocess.Popen(
+            command + ["providers", "--port", str(providers_port)] + profile_args(profiles)
+        )
+        args.app_process = subprocess.Popen(
+            command + ["app", "--port", str(app_port)] + profile_args(profiles),
+            env=app_environment(workdir, providers_url, args.redis_url, args.env, args.database_url),
+            stdout=app_log,
+            stderr=subprocess.STDOUT
+        )
+
+        try:
+            results = asyncio.run(run(args, app_url, providers_url))
+        except Exception:
+            app_log.flush()
+            with open(app_log.name) as log:
+                sys.stderr.write("".join(log.readlines()[-40:]))
+            raise
+        finally:
+            for process in (args.app_process, args.providers_process):
+                process.terminate()
+            for process in (args.app_process, args.providers_process):
+                try:
+                    process.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+            app_log.close()
+
+    print(f"\nconcurrency {args.concurrency}, profiles: "
+          + ", ".join(f"{name}={profile}" for name, profile in profiles.items()) + "\n")
+    report(results, args.provider_calls)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "concurrency": args.concurrency,
+                "profiles": {name: str(profile) for name, profile in profiles.items()},
+                "flows": {result.name: result.as_dict() for result in results},
+                "provider_calls": args.provider_calls,
+            }, f, indent=2)
+
+    if args.max_error_rate is not None:
+        failing = [result.name for result in results if result.error_rate > args.max_error_rate]
+        if failing:
+            print(f"\nError rate above {args.max_error_rate:g}: {', '.join(failing)}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
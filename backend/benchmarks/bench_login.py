@@ -0,0 +1,122 @@
+"""
+Benchmark: bcrypt on the event loop vs on the password hashing pool
+
+Runs bursts of concurrent password verifications (the CPU-bound part of a
+login) two ways: inline in the coroutine, as login used to, and through
+verify_and_update_password, which runs them on the bounded thread pool.
+Reports logins per second, latency and event-loop lag (how late a 10 ms
+ticker fires), which is what other requests on the same worker feel during
+a burst of logins.
+
+Runs offline; no database or Redis is needed.
+
+Usage (from backend/):
+    python -m benchmarks.bench_login --logins 64 --concurrency 16 --rounds 12 --workers 2
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+
+# Settings are required at import time; only the password settings are used
+for key, value in {
+    "SECRET_KEY": "benchmark",
+    "DATABASE_URL": "sqlite://",
+    "REDIS_URL": "redis://localhost:6379/0",
+    "GROQ_API_KEY": "benchmark",
+    "GOOGLE_API_KEY": "benchmark",
+    "GROQ_WHISPER_API_KEY": "benchmark",
+    "N8N_WEBHOOK_URL": "http://localhost:5678/webhook/appointment-booking",
+    "JWT_SECRET_KEY": "benchmark",
+}.items():
+    os.environ.setdefault(key, value)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt work factor")
+    parser.add_argument("--workers", type=int, default=2, help="password hashing threads")
+    return parser.parse_args()
+
+
+args = parse_args() if __name__ == "__main__" else None
+if args is not None:
+    # Read by app.config when app.utils.auth is imported below
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    os.environ["PASSWORD_HASH_WORKERS"] = str(args.workers)
+
+from loguru import logger  # noqa: E402
+
+logger.remove()
+logger.add(sys.stderr, level="ERROR")
+
+from app.utils.auth import pwd_context, verify_and_update_password  # noqa: E402
+
+PASSWORD = "correct horse battery staple"
+
+
+async def inline_login(hashed: str):
+    """Old login: verification blocks the event loop"""
+    valid, _ = pwd_context.verify_and_update(PASSWORD, hashed)
+    assert valid
+
+
+async def pooled_login(hashed: str):
+    """Verification on the password hashing pool"""
+    valid, _ = await verify_and_update_password(PASSWORD, hashed)
+    assert valid
+
+
+async def measure(handler, hashed: str, logins: int, concurrency: int):
+    latencies = []
+    lags = []
+    semaphore = asyncio.Semaphore(concurrency)
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.010)
+            lags.append((time.perf_counter() - start - 0.010) * 1000)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await handler(hashed)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    ticker_task = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await ticker_task
+
+    latencies.sort()
+    return {
+        "p50": statistics.median(latencies),
+        "p95": latencies[max(int(len(latencies) * 0.95) - 1, 0)],
+        "rps": logins / elapsed,
+        "lag": max(lags) if lags else elapsed * 1000,
+    }
+
+
+async def main():
+    hashed = pwd_context.hash(PASSWORD)
+
+    print(f"bcrypt rounds={args.rounds}, pool workers={args.workers}, cpus={os.cpu_count()}")
+    print(f"{'mode':<9}{'concurrency':<13}{'p50 ms':>9}{'p95 ms':>9}{'logins/s':>10}{'max lag ms':>12}")
+    for concurrency in (1, args.concurrency):
+        for name, handler in (("inline", inline_login), ("pool", pooled_login)):
+            stats = await measure(handler, hashed, args.logins, concurrency)
+            print(f"{name:<9}{concurrency:<13}{stats['p50']:>9.0f}{stats['p95']:>9.0f}"
+                  f"{stats['rps']:>10.1f}{stats['lag']:>12.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,192 @@
+"""
+Benchmark: one uvicorn process vs the pre-fork gunicorn server
+
+Runs the real app (against the fake providers, as in bench_load) three ways:
+- uvicorn, one process (the previous deployment)
+- gunicorn.conf.py with N workers, each importing the app itself (SERVER_PRELOAD=false)
+- gunicorn.conf.py with N workers forked from a master that preloaded the app
+and drives the text flow through each at the same concurrency. Reports
+throughput and latency, and the memory of the whole process tree after the
+run: RSS (counts shared pages once per process), PSS (shared pages split
+between the processes sharing them, so the sum is the real footprint) and
+USS (private pages only). Preloading shows up as a lower PSS total than
+N separate imports; extra workers as higher req/s, since a worker's event
+loop is blocked while it runs sync work.
+
+Linux only (reads /proc/<pid>/smaps_rollup). The numbers are only
+representative with the full requirements installed, since most of the
+shared memory is the ML libraries and models.
+
+Usage (from backend/):
+    python -m benchmarks.bench_prefork --workers 4 --requests 200 --concurrency 32
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from typing import Dict, List
+
+import httpx
+
+from benchmarks.bench_load import QUESTIONS, app_environment, drive, fmt, free_port, login, wait_until_up
+from benchmarks.fake_providers import PROFILES_ENV, parse_profiles, profile_args, profile_env
+
+
+def process_tree(root: int) -> List[int]:
+    """root and its descendants"""
+    parents: Dict[int, int] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may contain spaces; fields after it are space-separated
+                parents[int(entry)] = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+
+    tree, frontier = [root], [root]
+    while frontier:
+        children = [pid for pid, parent in parents.items() if parent in frontier]
+        tree += children
+        frontier = children
+    return tree
+
+
+def memory_mb(root: int) -> Dict[str, float]:
+    """RSS, PSS and USS summed over a process tree, in MB"""
+    totals = {"rss": 0.0, "pss": 0.0, "uss": 0.0}
+    for pid in process_tree(root):
+        try:
+            with open(f"/proc/{pid}/smaps_rollup") as f:
+                fields = {line.split(":")[0]: int(line.split()[1]) for line in f if line.split()[-1] == "kB"}
+        except OSError:
+            continue
+        totals["rss"] += fields.get("Rss", 0) / 1024
+        totals["pss"] += fields.get("Pss", 0) / 1024
+        totals["uss"] += (fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)) / 1024
+    return totals
+
+
+def server_command(mode: str, port: int, profiles) -> List[str]:
+    if mode == "uvicorn":
+        return [sys.executable, "-m", "benchmarks.fake_providers", "app", "--port", str(port)] + profile_args(profiles)
+    return [
+        sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py",
+        "--bind", f"127.0.0.1:{port}",
+        "benchmarks.fake_providers:patched_app()"
+    ]
+
+
+async def measure(args, mode: str, preload: bool, providers_url: str, providers_process, profiles) -> dict:
+    port = free_port()
+    app_url = f"http://127.0.0.1:{port}"
+
+    with tempfile.TemporaryDirectory(prefix="bench_prefork_") as workdir:
+        env = app_environment(workdir, providers_url, args.redis_url, args.env, args.database_url)
+        env.update({
+            "SERVER_WORKERS": str(args.workers),
+            "SERVER_PRELOAD": str(preload).lower(),
+            "PROMETHEUS_MULTIPROC_DIR": os.path.join(workdir, "metrics"),
+            PROFILES_ENV: profile_env(profiles),
+        })
+        os.makedirs(env["PROMETHEUS_MULTIPROC_DIR"])
+
+        with open(os.path.join(workdir, "server.log"), "w") as log:
+            server = subprocess.Popen(server_command(mode, port, profiles), env=env, stdout=log, stderr=subprocess.STDOUT)
+            try:
+                limits = httpx.Limits(max_connections=args.concurrency + 2, max_keepalive_connections=args.concurrency + 2)
+                async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as client:
+                    await wait_until_up(client, f"{providers_url}/_fake/stats", providers_process)
+                    await wait_until_up(client, f"{app_url}/api/health", server)
+                    headers = await login(client, app_url)
+
+                    def send(i: int):
+                        return client.post(
+                            f"{app_url}/api/voice/interact",
+                            json={"text_message": f"{QUESTIONS[i % len(QUESTIONS)]} ({mode} {preload} {i})"},
+                            headers=headers
+                        )
+
+                    # Every worker handles a few requests first, so lazily loaded state is counted
+                    await drive("warm-up", args.concurrency * 2, args.concurrency, lambda i: send(args.requests + i))
+                    result = await drive("text", args.requests, args.concurrency, send)
+                    memory = memory_mb(server.pid)
+                    processes = len(process_tree(server.pid))
+            except Exception:
+                log.flush()
+                with open(log.name) as f:
+                    sys.stderr.write("".join(f.readlines()[-40:]))
+                raise
+            finally:
+                server.terminate()
+                try:
+                    server.wait(timeout=30)
+                except subprocess.TimeoutExpired:
+                    server.kill()
+
+    return {"processes": processes, **memory, **result.as_dict()}
+
+
+async def run(args, profiles) -> Dict[str, dict]:
+    providers_port = free_port()
+    providers_url = f"http://127.0.0.1:{providers_port}"
+    providers = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_providers", "providers", "--port", str(providers_port)]
+        + profile_args(profiles)
+    )
+
+    configs = {
+        "uvicorn x1": ("uvicorn", False),
+        f"gunicorn x{args.workers}": ("gunicorn", False),
+        f"gunicorn x{args.workers} preload": ("gunicorn", True),
+    }
+    results = {}
+    try:
+        for name, (mode, preload) in configs.items():
+            results[name] = await measure(args, mode, preload, providers_url, providers, profiles)
+            print(f"  {name} done", file=sys.stderr)
+    finally:
+        providers.terminate()
+        providers.wait(timeout=10)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--timeout", type=float, default=120.0, help="Seconds per request")
+    parser.add_argument("--profile", action="append", default=[], metavar="NAME=MEDIAN:P95[:FAILURE_RATE]",
+                        help="Fake provider latency in ms and failure rate (see benchmarks.fake_providers)")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiplies all provider latencies")
+    parser.add_argument("--redis-url", default="redis://127.0.0.1:1/0",
+                        help="Redis for the app; by default a closed port, so the cache runs in-process only")
+    parser.add_argument("--database-url", default="",
+                        help="Database for the app (e.g. an empty Postgres); by default a temporary SQLite file per run")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="Extra app setting")
+    args = parser.parse_args()
+
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        parser.error("needs Linux /proc/<pid>/smaps_rollup")
+
+    profiles = parse_profiles(args.profile, args.latency_scale)
+    start = time.perf_counter()
+    results = asyncio.run(run(args, profiles))
+
+    print(f"\n{args.requests} text requests at concurrency {args.concurrency} ({time.perf_counter() - start:.0f}s)\n")
+    print(f"{'server':<22}{'procs':>6}{'RSS MB':>9}{'PSS MB':>9}{'USS MB':>9}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'errors':>8}")
+    for name, stats in results.items():
+        print(
+            f"{name:<22}{stats['processes']:>6}{stats['rss']:>9.0f}{stats['pss']:>9.0f}{stats['uss']:>9.0f}"
+            f"{fmt(stats['requests_per_second'], '.1f'):>9}{fmt(stats['p50_ms'], '.0f'):>9}"
+            f"{fmt(stats['p95_ms'], '.0f'):>9}{stats['errors']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
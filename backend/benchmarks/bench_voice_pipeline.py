@@ -0,0 +1,221 @@
+"""
+Benchmark: sequential voice_interact vs the VoicePipeline stage graph
+
+Providers and the database are replaced with stand-ins that sleep for
+typical latencies, so this runs offline and measures only orchestration.
+Blocking stand-ins (symptom extraction, retrieval, the old sync DB session)
+use time.sleep, async ones (LLM, TTS, the async DB session) use asyncio.sleep,
+mirroring the real services. --blocking-llm makes the LLM stand-in block the
+event loop instead, as the provider clients did before LLMService used async
+clients; requests then only overlap outside the LLM call.
+
+Usage (from backend/):
+    python -m benchmarks.bench_voice_pipeline --requests 50 --concurrency 20
+"""
+import os
+import time
+import asyncio
+import argparse
+import statistics
+
+# Settings are required at import time; the stand-ins never touch these
+for key, value in {
+    "SECRET_KEY": "benchmark",
+    "DATABASE_URL": "sqlite://",
+    "REDIS_URL": "redis://localhost:6379/0",
+    "GROQ_API_KEY": "benchmark",
+    "GOOGLE_API_KEY": "benchmark",
+    "GROQ_WHISPER_API_KEY": "benchmark",
+    "N8N_WEBHOOK_URL": "http://localhost:5678/webhook/appointment-booking",
+    "JWT_SECRET_KEY": "benchmark",
+}.items():
+    os.environ.setdefault(key, value)
+
+from fastapi import BackgroundTasks  # noqa: E402
+from loguru import logger  # noqa: E402
+
+from app.services.voice_pipeline import VoicePipeline  # noqa: E402
+
+logger.remove()
+
+# Stage latencies in seconds
+SYMPTOMS_S = 0.005
+RETRIEVAL_S = 0.040
+LLM_S = 0.300
+TTS_S = 0.150
+DB_QUERY_S = 0.005
+DB_COMMIT_S = 0.010
+
+
+class StubRAG:
+    def is_emergency(self, text):
+        return "unconscious" in text
+
+    def extract_symptoms(self, text):
+        time.sleep(SYMPTOMS_S)
+        return ["fever"]
+
+    def search(self, query, n_results=3):
+        time.sleep(RETRIEVAL_S)
+        return "[Medical Database]\nMalaria is spread by mosquitoes."
+
+    async def search_cached(self, query, n_results=3):
+        return await asyncio.to_thread(self.search, query, n_results)
+
+
+class StubLLM:
+    blocking = False
+
+    async def generate_response(self, prompt, medical_context="", db=None, history=""):
+        if self.blocking:
+            time.sleep(LLM_S)
+        else:
+            await asyncio.sleep(LLM_S)
+        return "Please see a doctor for a malaria test.", "stub"
+
+
+async def stub_prepare_audio(text, generate_audio=True):
+    if generate_audio:
+        await asyncio.sleep(TTS_S)
+    return "/api/audio/00000000000000000000000000000000.mp3"
+
+
+class _Dialect:
+    name = "postgresql"
+
+
+class _Bind:
+    dialect = _Dialect()
+
+
+class StubSession:
+    """Sync session stand-in with Postgres-like round trip costs"""
+    bind = _Bind()
+    _next_id = 0
+
+    def execute(self, statement, params=None):
+        time.sleep(DB_QUERY_S)
+        StubSession._next_id += 1
+        return [(StubSession._next_id,)]
+
+    def add(self, obj):
+        self._obj = obj
+
+    def flush(self):
+        time.sleep(DB_QUERY_S)
+        StubSession._next_id += 1
+        self._obj.id = StubSession._next_id
+
+    def commit(self):
+        time.sleep(DB_COMMIT_S)
+
+    def refresh(self, obj):
+        time.sleep(DB_QUERY_S)
+
+    def close(self):
+        pass
+
+
+class AsyncStubSession:
+    """AsyncSession stand-in with the same round trip costs"""
+    bind = _Bind()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        pass
+
+    async def execute(self, statement, params=None):
+        await asyncio.sleep(DB_QUERY_S)
+        StubSession._next_id += 1
+        return [(StubSession._next_id,)]
+
+    def add(self, obj):
+        self._obj = obj
+
+    async def flush(self):
+        await asyncio.sleep(DB_QUERY_S)
+        StubSession._next_id += 1
+        self._obj.id = StubSession._next_id
+
+    async def commit(self):
+        await asyncio.sleep(DB_COMMIT_S)
+
+
+rag, llm = StubRAG(), StubLLM()
+
+
+async def sequential_interact(user_message: str, generate_audio: bool) -> None:
+    """The pre-stage-graph voice_interact: every stage in turn, on the event loop"""
+    db = StubSession()
+    rag.is_emergency(user_message)
+    symptoms = rag.extract_symptoms(user_message)
+    medical_context = rag.search(user_message, n_results=3)
+    ai_response, _ = await llm.generate_response(user_message, medical_context, db)
+    await stub_prepare_audio(ai_response, generate_audio)
+    db.add(type("Conversation", (), {})())
+    db.commit()
+    db.refresh(None)
+    return symptoms
+
+
+pipeline = VoicePipeline(rag=rag, llm=llm, prepare_audio=stub_prepare_audio, session_factory=AsyncStubSession)
+
+
+async def pipeline_interact(user_message: str, generate_audio: bool) -> None:
+    """The stage graph; background persistence runs after the response"""
+    background_tasks = BackgroundTasks()
+    await pipeline.run(user_message, user_id=1, db=AsyncStubSession(), background_tasks=background_tasks,
+                       generate_audio=generate_audio)
+    return background_tasks
+
+
+async def measure(handler, requests: int, concurrency: int, generate_audio: bool):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+    background = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            result = await handler("I have fever and headache", generate_audio)
+            latencies.append((time.perf_counter() - start) * 1000)
+            if isinstance(result, BackgroundTasks):
+                background.append(result)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    # Background tasks would run after the response is sent; excluded from latency
+    for tasks in background:
+        await tasks()
+
+    latencies.sort()
+    return {
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95) - 1],
+        "rps": requests / elapsed,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--blocking-llm", action="store_true", help="LLM stand-in blocks the event loop")
+    args = parser.parse_args()
+    llm.blocking = args.blocking_llm
+
+    print(f"{'mode':<12}{'audio':<8}{'concurrency':<13}{'p50 ms':>9}{'p95 ms':>9}{'req/s':>9}")
+    for generate_audio in (True, False):
+        for concurrency in (1, args.concurrency):
+            for name, handler in (("sequential", sequential_interact), ("pipeline", pipeline_interact)):
+                stats = await measure(handler, args.requests, concurrency, generate_audio)
+                print(f"{name:<12}{'yes' if generate_audio else 'lazy':<8}{concurrency:<13}"
+                      f"{stats['p50']:>9.0f}{stats['p95']:>9.0f}{stats['rps']:>9.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,370 @@
+"""
+Local stand-ins for the external providers, for load tests without quota
+
+HTTP providers are served by one small FastAPI app (`providers` mode):
+- OpenAI-compatible chat completions (Grok via XAI_API_BASE=<url>/v1, and
+  Groq via GROQ_BASE_URL=<url>, which uses /openai/v1), streaming included
+- Groq-compatible Whisper transcription (/openai/v1/audio/transcriptions)
+- an n8n webhook sink (/webhook/appointment-booking)
+- a Telegram Bot API sink (/bot<token>/sendMessage, via TELEGRAM_API_BASE)
+Google TTS (gRPC) and the vector store are not HTTP, so `app` mode runs the
+real FastAPI app with them replaced in-process (FakeTTSClient,
+FakeCollection); Gemini is skipped by leaving GOOGLE_API_KEY empty.
+
+Each provider has a latency profile: a lognormal distribution given by its
+median and p95, and a failure rate. Failures look like the real provider's:
+503 for the LLM, STT and n8n, 429 with retry_after for Telegram, exceptions
+for TTS and retrieval. Calls are counted, and Telegram deliveries recorded
+per chat, at GET /_fake/stats.
+
+Usage (from backend/):
+    python -m benchmarks.fake_providers providers --port 9100 --profile llm=800:2000:0.02
+    python -m benchmarks.fake_providers app --port 8100   # real app, with the env set as in bench_load
+    gunicorn -c gunicorn.conf.py "benchmarks.fake_providers:patched_app()"   # profiles from FAKE_PROVIDER_PROFILES
+
+bench_load starts both and sets the environment for you.
+"""
+import os
+import json
+import math
+import time
+import random
+import asyncio
+import argparse
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+
+@dataclass
+class LatencyProfile:
+    """Latency distribution and failure rate of one provider"""
+    median_ms: float
+    p95_ms: float
+    failure_rate: float = 0.0
+
+    @property
+    def sigma(self) -> float:
+        # p95 of a lognormal is median * exp(1.645 * sigma)
+        if self.p95_ms <= self.median_ms or self.median_ms <= 0:
+            return 0.0
+        return math.log(self.p95_ms / self.median_ms) / 1.645
+
+    def sample(self) -> float:
+        """One latency, in seconds"""
+        if self.median_ms <= 0:
+            return 0.0
+        return random.lognormvariate(math.log(self.median_ms), self.sigma) / 1000
+
+    def fails(self) -> bool:
+        return random.random() < self.failure_rate
+
+    def scaled(self, factor: float) -> "LatencyProfile":
+        return LatencyProfile(self.median_ms * factor, self.p95_ms * factor, self.failure_rate)
+
+    def __str__(self):
+        return f"{self.median_ms:g}:{self.p95_ms:g}:{self.failure_rate:g}"
+
+
+# Roughly what the real providers take from Ghana
+DEFAULT_PROFILES: Dict[str, LatencyProfile] = {
+    "llm": LatencyProfile(700, 1800),
+    "stt": LatencyProfile(400, 900),
+    "tts": LatencyProfile(250, 600),
+    "retrieval": LatencyProfile(15, 40),
+    "n8n": LatencyProfile(80, 250),
+    "telegram": LatencyProfile(60, 200),
+}
+
+# Environment variable with the profiles for patched_app() when run under gunicorn
+PROFILES_ENV = "FAKE_PROVIDER_PROFILES"
+
+# Served over HTTP by create_app(); tts and retrieval are replaced in-process by serve_app()
+HTTP_PROVIDERS = ("llm", "stt", "n8n", "telegram")
+
+TRANSCRIPT = "I have had a fever and a headache for two days"
+
+ANSWER = (
+    "Fever with headache can have many causes, including malaria, which is common in Ghana. "
+    "Drink plenty of fluids, rest, and take paracetamol for the fever. Please get a malaria "
+    "test at a clinic or pharmacy, and see a doctor if the fever lasts more than two days."
+)
+
+
+def parse_profiles(specs: List[str], scale: float = 1.0) -> Dict[str, LatencyProfile]:
+    """
+    Defaults overridden by `name=median_ms:p95_ms[:failure_rate]` specs
+
+    Args:
+        specs: e.g. ["llm=300:900:0.05", "telegram=40:120"]
+        scale: Multiplies every latency (e.g. 0.1 for a quick CI run)
+
+    Returns:
+        Profiles by provider name
+    """
+    profiles = dict(DEFAULT_PROFILES)
+    for spec in specs:
+        name, _, values = spec.partition("=")
+        if name not in profiles:
+            raise ValueError(f"Unknown provider '{name}' (one of {', '.join(profiles)})")
+        parts = [float(part) for part in values.split(":")]
+        if len(parts) not in (2, 3):
+            raise ValueError(f"Bad profile '{spec}', expected name=median_ms:p95_ms[:failure_rate]")
+        profiles[name] = LatencyProfile(*parts)
+    return {name: profile.scaled(scale) for name, profile in profiles.items()}
+
+
+def profile_args(profiles: Dict[str, LatencyProfile]) -> List[str]:
+    """Command line that gives another process the same profiles"""
+    args = []
+    for name, profile in profiles.items():
+        args += ["--profile", f"{name}={profile}"]
+    return args
+
+
+def profile_env(profiles: Dict[str, LatencyProfile]) -> str:
+    """FAKE_PROVIDER_PROFILES value giving patched_app() the same profiles"""
+    return " ".join(f"{name}={profile}" for name, profile in profiles.items())
+
+
+# --- HTTP providers ---
+
+def create_app(profiles: Dict[str, LatencyProfile]) -> FastAPI:
+    """The fake HTTP providers, as one app"""
+    app = FastAPI(title="Fake providers")
+    calls: Dict[str, Dict[str, int]] = {name: {"ok": 0, "failed": 0} for name in HTTP_PROVIDERS}
+    telegram_deliveries: Dict[int, float] = {}  # chat id -> wall-clock time of its first message
+    message_ids = iter(range(1, 1 << 62))
+
+    async def simulate(provider: str) -> bool:
+        """Wait one sampled latency; False if this call should fail"""
+        profile = profiles[provider]
+        await asyncio.sleep(profile.sample())
+        failed = profile.fails()
+        calls[provider]["failed" if failed else "ok"] += 1
+        return not failed
+
+    def unavailable(message: str) -> JSONResponse:
+        return JSONResponse({"error": {"message": message, "type": "server_error"}}, status_code=503)
+
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "fake")
+        profile = profiles["llm"]
+
+        if not body.get("stream"):
+            if not await simulate("llm"):
+                return unavailable("Fake LLM failure")
+            prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in body.get("messages", []))
+            completion_tokens = len(ANSWER.split())
+            return {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": ANSWER},
+                    "finish_reason": "stop"
+                }],
+                "usage": {
+                    "prompt_tokens": prompt_tokens,
+                    "completion_tokens": completion_tokens,
+                    "total_tokens": prompt_tokens + completion_tokens
+                }
+            }
+
+        # Streaming: the first token after a third of the sampled latency, the rest spread over the remainder
+        total = profile.sample()
+        if profile.fails():
+            calls["llm"]["failed"] += 1
+            await asyncio.sleep(total / 3)
+            return unavailable("Fake LLM failure")
+        calls["llm"]["ok"] += 1
+        words = ANSWER.split(" ")
+
+        async def events():
+            await asyncio.sleep(total / 3)
+            for i, word in enumerate(words):
+                chunk = {
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion.chunk",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "delta": {"content": word if i == 0 else " " + word},
+                        "finish_reason": None
+                    }]
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(total * 2 / 3 / len(words))
+            done = {
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+            }
+            yield f"data: {json.dumps(done)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    app.add_api_route("/v1/chat/completions", chat_completions, methods=["POST"])
+    app.add_api_route("/openai/v1/chat/completions", chat_completions, methods=["POST"])
+
+    @app.post("/openai/v1/audio/transcriptions")
+    async def transcriptions(request: Request):
+        form = await request.form()
+        if not await simulate("stt"):
+            return unavailable("Fake transcription failure")
+        # Numbered, so transcripts are distinct and not answered from the retrieval cache
+        text = f"{TRANSCRIPT} ({sum(calls['stt'].values())})"
+        if form.get("response_format") == "text":
+            return PlainTextResponse(text)
+        return {"text": text}
+
+    @app.post("/webhook/appointment-booking")
+    async def n8n_webhook(request: Request):
+        await request.body()
+        if not await simulate("n8n"):
+            return JSONResponse({"message": "Fake n8n failure"}, status_code=503)
+        return {"status": "received"}
+
+    @app.post("/bot{token}/sendMessage")
+    async def telegram_send_message(token: str, request: Request):
+        body = await request.json()
+        if not await simulate("telegram"):
+            return JSONResponse({
+                "ok": False,
+                "error_code": 429,
+                "description": "Too Many Requests: retry after 1",
+                "parameters": {"retry_after": 1}
+            }, status_code=429)
+
+        chat_id = body.get("chat_id")
+        telegram_deliveries.setdefault(chat_id, time.time())
+        return {
+            "ok": True,
+            "result": {
+                "message_id": next(message_ids),
+                "chat": {"id": chat_id, "type": "private"},
+                "date": int(time.time()),
+                "text": body.get("text", "")
+            }
+        }
+
+    @app.get("/_fake/stats")
+    async def stats():
+        return {"calls": calls, "telegram_deliveries": telegram_deliveries}
+
+    @app.post("/_fake/reset")
+    async def reset():
+        for counts in calls.values():
+            counts.update(ok=0, failed=0)
+        telegram_deliveries.clear()
+        return {"ok": True}
+
+    return app
+
+
+# --- In-process stand-ins for the real app ---
+
+class FakeCollection:
+    """Vector store collection whose query() takes the retrieval latency (sync, like Chroma)"""
+
+    def __init__(self, profile: LatencyProfile):
+        self.profile = profile
+
+    def query(self, query_texts: List[str], n_results: int = 3, **kwargs) -> dict:
+        time.sleep(self.profile.sample())
+        if self.profile.fails():
+            raise RuntimeError("Fake retrieval failure")
+        documents = [
+            [f"Fake knowledge base entry {i + 1} about: {text[:60]}" for i in range(n_results)]
+            for text in query_texts
+        ]
+        metadatas = [[{"source": "Fake knowledge base"}] * n_results for _ in query_texts]
+        return {"documents": documents, "metadatas": metadatas}
+
+    def count(self) -> int:
+        return 1
+
+    def add(self, **kwargs):
+        pass
+
+
+class _SynthesizeSpeechResponse:
+    def __init__(self, audio_content: bytes):
+        self.audio_content = audio_content
+
+
+class FakeTTSClient:
+    """TextToSpeechAsyncClient stand-in returning a few silent MP3 frames"""
+
+    # One silent MPEG-1 Layer III frame (128 kbit/s, 44.1 kHz)
+    FRAME = b"\xff\xfb\x90\x64" + b"\x00" * 413
+
+    def __init__(self, profile: LatencyProfile):
+        self.profile = profile
+
+    async def synthesize_speech(self, request=None, input=None, **kwargs) -> _SynthesizeSpeechResponse:
+        await asyncio.sleep(self.profile.sample())
+        if self.profile.fails():
+            raise RuntimeError("Fake TTS failure")
+        text = str(getattr(input, "text", "") or "")
+        return _SynthesizeSpeechResponse(self.FRAME * max(1, len(text) // 15))
+
+
+def patched_app(profiles: Optional[Dict[str, LatencyProfile]] = None):
+    """
+    The real app, with TTS and retrieval replaced
+
+    Also usable as a gunicorn app factory ("benchmarks.fake_providers:patched_app()"),
+    which reads the profiles from FAKE_PROVIDER_PROFILES (space-separated specs).
+    """
+    from app.main import app
+    from app.services.rag_service import rag_service
+    from app.services.tts_service import tts_service
+
+    if profiles is None:
+        profiles = parse_profiles(os.environ.get(PROFILES_ENV, "").split())
+
+    rag_service.collection = FakeCollection(profiles["retrieval"])
+    tts_service._client = FakeTTSClient(profiles["tts"])
+    return app
+
+
+def serve_app(port: int, profiles: Dict[str, LatencyProfile]):
+    """Run the real app on port in this process"""
+    import uvicorn
+
+    uvicorn.run(patched_app(profiles), host="127.0.0.1", port=port, log_level="warning")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("mode", choices=["providers", "app"])
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--profile", action="append", default=[], metavar="NAME=MEDIAN:P95[:FAILURE_RATE]")
+    parser.add_argument("--latency-scale", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    profiles = parse_profiles(args.profile, args.latency_scale)
+
+    if args.mode == "app":
+        serve_app(args.port, profiles)
+        return
+
+    import uvicorn
+
+    uvicorn.run(create_app(profiles), host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Production server: gunicorn managing uvicorn workers
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+With SERVER_PRELOAD the app is imported once in the master process (the ML
+libraries, the Chroma client and collection, and with SERVER_PRELOAD_MODELS
+the SentenceTransformer the collection embeds queries with), then workers
+are forked and share that memory copy-on-write instead of each loading its
+own. Garbage collection is kept
+off the preloaded objects (gc.freeze), so it does not copy their pages into
+every worker. Per-worker state is created after the fork: database pools
+are replaced, and Redis, HTTP clients and background tasks start in each
+worker's lifespan.
+
+Prometheus metrics from all workers are aggregated through files in
+PROMETHEUS_MULTIPROC_DIR (from the environment, else SERVER_METRICS_DIR, else
+medivoice-metrics-<port> in the temporary directory). The files are cleared
+when the server starts and removed when it exits.
+
+Workers: SERVER_WORKERS (0 = one per CPU core). Port: $PORT (default 8000).
+For development, run uvicorn directly (python -m app.main or uvicorn --reload).
+"""
+import gc
+import os
+import glob
+import shutil
+import tempfile
+import multiprocessing
+
+from app.config import settings
+
+port = os.environ.get("PORT", "8000")
+
+# Must be set before prometheus_client is imported, i.e. before the app is loaded
+metrics_dir = os.environ["PROMETHEUS_MULTIPROC_DIR"] = (
+    os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    or settings.SERVER_METRICS_DIR
+    or os.path.join(tempfile.gettempdir(), f"medivoice-metrics-{port}")
+)
+os.makedirs(metrics_dir, exist_ok=True)
+
+bind = f"0.0.0.0:{port}"
+workers = settings.SERVER_WORKERS or multiprocessing.cpu_count()
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = settings.SERVER_PRELOAD
+timeout = settings.SERVER_TIMEOUT
+graceful_timeout = settings.SERVER_GRACEFUL_TIMEOUT
+keepalive = settings.SERVER_KEEPALIVE
+max_requests = settings.SERVER_MAX_REQUESTS
+max_requests_jitter = settings.SERVER_MAX_REQUESTS // 10
+accesslog = None  # Requests are logged and measured by the app
+
+if preload_app:
+    # No collections while the app loads, so freed objects do not leave holes in shared pages
+    gc.disable()
+
+
+def _clear_metrics():
+    for path in glob.glob(os.path.join(metrics_dir, "*.db")):
+        os.remove(path)
+
+
+def on_starting(server):
+    """Master, before the first fork (and after the app is preloaded)"""
+    # Files of a previous run, and the master's own: it serves no requests, and its
+    # never-updated live gauges (e.g. Redis up = 0) would otherwise skew the aggregates
+    _clear_metrics()
+
+
+def when_ready(server):
+    """Master, after the app is loaded and before the first fork"""
+    if not preload_app:
+        return
+
+    if settings.SERVER_PRELOAD_MODELS:
+        from app.services.rag_service import rag_service
+        rag_service.warm_up()
+
+    # Everything loaded so far is never scanned by the GC again, in the master or the workers
+    gc.freeze()
+    gc.enable()
+    server.log.info(f"Preloaded app shared with {workers} workers ({gc.get_freeze_count()} objects frozen)")
+
+
+def post_fork(server, worker):
+    """Worker, right after the fork"""
+    if not preload_app:
+        return
+
+    from app.db.database import dispose_inherited_connections
+    dispose_inherited_connections()
+
+
+def child_exit(server, worker):
+    """Master, when a worker exits: drop its live gauges from the aggregated metrics"""
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def on_exit(server):
+    """Master, on shutdown: the metrics files are of no use once every worker is gone"""
+    shutil.rmtree(metrics_dir, ignore_errors=True)
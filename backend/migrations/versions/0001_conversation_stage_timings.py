@@ -0,0 +1,39 @@
+"""Add per-stage latency breakdown to conversations
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+Tables are created by Base.metadata.create_all on startup, so migrations only
+alter existing tables and skip changes that are already present.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_table(table: str) -> bool:
+    # Missing on a fresh database: create_all builds it complete on startup
+    return sa.inspect(op.get_bind()).has_table(table)
+
+
+def _has_column(table: str, column: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return column in [c["name"] for c in inspector.get_columns(table)]
+
+
+def upgrade() -> None:
+    if _has_table("conversations") and not _has_column("conversations", "stage_timings"):
+        op.add_column("conversations", sa.Column("stage_timings", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("conversations", "stage_timings")
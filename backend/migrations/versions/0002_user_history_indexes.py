@@ -0,0 +1,50 @@
+"""Index conversations and appointments by user, newest first
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+Serves the keyset-paginated history and my-appointments lists, which filter by
+user_id and order by (created_at, id) descending.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    "conversations": "ix_conversations_user_id_created_at",
+    "appointments": "ix_appointments_user_id_created_at",
+}
+
+
+def _has_table(table: str) -> bool:
+    # Missing on a fresh database: create_all builds it complete on startup
+    return sa.inspect(op.get_bind()).has_table(table)
+
+
+def _has_index(table: str, name: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return name in [index["name"] for index in inspector.get_indexes(table)]
+
+
+def upgrade() -> None:
+    for table, name in INDEXES.items():
+        if _has_table(table) and not _has_index(table, name):
+            op.create_index(
+                name,
+                table,
+                ["user_id", sa.text("created_at DESC"), sa.text("id DESC")]
+            )
+
+
+def downgrade() -> None:
+    for table, name in INDEXES.items():
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,42 @@
+"""Add token version to users
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+Access tokens carry the user's token version; bumping it revokes every token
+issued before.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_table(table: str) -> bool:
+    # Missing on a fresh database: create_all builds it complete on startup
+    return sa.inspect(op.get_bind()).has_table(table)
+
+
+def _has_column(table: str, column: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return column in [c["name"] for c in inspector.get_columns(table)]
+
+
+def upgrade() -> None:
+    if _has_table("users") and not _has_column("users", "token_version"):
+        op.add_column(
+            "users",
+            sa.Column("token_version", sa.Integer(), nullable=False, server_default="0")
+        )
+
+
+def downgrade() -> None:
+    op.drop_column("users", "token_version")
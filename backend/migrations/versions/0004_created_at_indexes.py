@@ -0,0 +1,47 @@
+"""Index llm_logs and conversations by creation time
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+
+The rollup job scans both tables by time range and the retention job deletes
+old llm_logs rows. The rollup tables themselves are new and are created by
+create_all.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    "llm_logs": "ix_llm_logs_created_at",
+    "conversations": "ix_conversations_created_at",
+}
+
+
+def _has_table(table: str) -> bool:
+    # Missing on a fresh database: create_all builds it complete on startup
+    return sa.inspect(op.get_bind()).has_table(table)
+
+
+def _has_index(table: str, name: str) -> bool:
+    inspector = sa.inspect(op.get_bind())
+    return name in [index["name"] for index in inspector.get_indexes(table)]
+
+
+def upgrade() -> None:
+    for table, name in INDEXES.items():
+        if _has_table(table) and not _has_index(table, name):
+            op.create_index(name, table, ["created_at"])
+
+
+def downgrade() -> None:
+    for table, name in INDEXES.items():
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,14 @@
+import os
+
+# Settings are required at import time; tests only use a throwaway SQLite database
+for key, value in {
+    "SECRET_KEY": "test",
+    "DATABASE_URL": "sqlite://",
+    "REDIS_URL": "redis://127.0.0.1:1/0",
+    "GROQ_API_KEY": "test",
+    "GOOGLE_API_KEY": "test",
+    "GROQ_WHISPER_API_KEY": "test",
+    "N8N_WEBHOOK_URL": "http://localhost:5678/webhook/appointment-booking",
+    "JWT_SECRET_KEY": "test",
+}.items():
+    os.environ.setdefault(key, value)
@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+
+from app.api.routes.analytics import _window
+
+
+def test_naive_times_are_utc():
+    since = datetime.utcnow() - timedelta(hours=2)
+
+    start, end = _window(since, None, hours=24)
+
+    assert start == since.replace(tzinfo=timezone.utc)
+    assert end.tzinfo is not None and end > start
+
+
+def test_mixed_naive_and_aware_times():
+    since = datetime(2026, 1, 1, 8, 0)
+    until = datetime(2026, 1, 1, 10, 0, tzinfo=timezone(timedelta(hours=1)))
+
+    start, end = _window(since, until, hours=24)
+
+    assert end - start == timedelta(hours=1)
+
+
+def test_default_window():
+    start, end = _window(None, None, hours=6)
+
+    assert end - start == timedelta(hours=6)
+
+
+def test_since_after_until():
+    with pytest.raises(HTTPException) as error:
+        _window(datetime(2026, 1, 2), datetime(2026, 1, 1), hours=24)
+
+    assert error.value.status_code == 400
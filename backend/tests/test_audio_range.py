@@ -0,0 +1,36 @@
+import pytest
+from fastapi import HTTPException
+
+from app.api.routes.audio import _parse_range
+
+SIZE = 1000
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=900-", (900, 999)),
+    ("bytes=900-5000", (900, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+])
+def test_satisfiable_ranges(header, expected):
+    assert _parse_range(header, SIZE) == expected
+
+
+@pytest.mark.parametrize("header", [
+    "bytes=500-100",  # end before start: invalid, so ignored
+    "bytes=0-99,200-299",  # multiple ranges are not supported
+    "items=0-99",
+    "bytes=-",
+])
+def test_ignored_ranges_serve_the_full_body(header):
+    assert _parse_range(header, SIZE) is None
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=5000-6000", "bytes=-0"])
+def test_unsatisfiable_ranges(header):
+    with pytest.raises(HTTPException) as error:
+        _parse_range(header, SIZE)
+
+    assert error.value.status_code == 416
+    assert error.value.headers["Content-Range"] == f"bytes */{SIZE}"
@@ -0,0 +1,101 @@
+import asyncio
+
+from fastapi import BackgroundTasks
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.db.models import Base, Conversation
+from app.services.voice_pipeline import VoicePipeline
+
+VALUES = {"user_id": 1, "user_message": "question", "ai_response": "answer"}
+
+
+class FlakySessions:
+    """Session factory whose first `failures` commits fail as if the connection dropped"""
+
+    def __init__(self, engine, failures: int = 0):
+        self.factory = async_sessionmaker(engine, expire_on_commit=False)
+        self.failures = failures
+        self.sessions = 0
+
+    def __call__(self):
+        session = self.factory()
+        self.sessions += 1
+        if self.sessions <= self.failures:
+            async def commit():
+                raise OperationalError("INSERT INTO conversations", {}, ConnectionError("connection lost"))
+            session.commit = commit
+        return session
+
+
+async def persist(failures: int, attempts: int, existing: bool = False):
+    """Run the background insert of conversation 7; returns (stored ids, sessions used)"""
+    engine = create_async_engine("sqlite+aiosqlite://")
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            if existing:
+                await conn.execute(Conversation.__table__.insert().values(id=7, **VALUES))
+
+        sessions = FlakySessions(engine, failures)
+        pipeline = VoicePipeline(
+            rag=None, llm=None, prepare_audio=None,
+            session_factory=sessions, save_attempts=attempts, save_backoff=0
+        )
+        await pipeline._persist_conversation({"id": 7, **VALUES})
+
+        async with engine.connect() as conn:
+            ids = (await conn.execute(select(Conversation.id))).scalars().all()
+        return ids, sessions.sessions
+    finally:
+        await engine.dispose()
+
+
+def test_background_insert_is_retried():
+    ids, sessions = asyncio.run(persist(failures=2, attempts=4))
+
+    assert ids == [7]
+    assert sessions == 3
+
+
+def test_background_insert_gives_up_after_its_attempts():
+    ids, sessions = asyncio.run(persist(failures=10, attempts=3))
+
+    assert ids == []
+    assert sessions == 3
+
+
+def test_already_stored_row_is_not_retried():
+    ids, sessions = asyncio.run(persist(failures=0, attempts=4, existing=True))
+
+    assert ids == [7]
+    assert sessions == 1
+
+
+def test_synchronous_save_stores_before_returning():
+    async def save():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+
+            sessions = async_sessionmaker(engine, expire_on_commit=False)
+            pipeline = VoicePipeline(
+                rag=None, llm=None, prepare_audio=None, session_factory=sessions, background_save=False
+            )
+            background_tasks = BackgroundTasks()
+            async with sessions() as db:
+                conversation_id = await pipeline.save_conversation(db, background_tasks, 7, **VALUES)
+
+            async with engine.connect() as conn:
+                ids = (await conn.execute(select(Conversation.id))).scalars().all()
+            return conversation_id, ids, background_tasks.tasks
+        finally:
+            await engine.dispose()
+
+    conversation_id, ids, tasks = asyncio.run(save())
+
+    assert conversation_id == 7
+    assert ids == [7]
+    assert tasks == []
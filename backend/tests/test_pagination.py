@@ -0,0 +1,60 @@
+import asyncio
+
+from fastapi import Response
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.db.models import Base, Conversation
+from app.utils.pagination import NEXT_CURSOR_HEADER, finish_page, keyset_page
+
+
+async def walk_history(rows: list, limit: int) -> list:
+    """Insert the rows, then follow X-Next-Cursor to the last page; returns the ids of each page"""
+    engine = create_async_engine("sqlite+aiosqlite://")
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            for values in rows:
+                await conn.execute(Conversation.__table__.insert().values(
+                    user_id=1, user_message="question", ai_response="answer", **values
+                ))
+
+        pages, cursor = [], None
+        while len(pages) <= len(rows):
+            response = Response()
+            async with engine.connect() as conn:
+                query = select(Conversation.id, Conversation.created_at).where(Conversation.user_id == 1)
+                result = await conn.execute(keyset_page(query, Conversation, cursor, limit))
+            pages.append([row.id for row in finish_page(result.all(), limit, response)])
+
+            cursor = response.headers.get(NEXT_CURSOR_HEADER)
+            if cursor is None:
+                return pages
+        raise AssertionError(f"Pagination did not end: {pages}")
+    finally:
+        await engine.dispose()
+
+
+def test_walks_rows_created_in_the_same_second():
+    # CURRENT_TIMESTAMP on SQLite: every row shares one second-precision created_at
+    pages = asyncio.run(walk_history([{} for _ in range(12)], limit=5))
+
+    assert pages == [[12, 11, 10, 9, 8], [7, 6, 5, 4, 3], [2, 1]]
+
+
+def test_walks_newest_first_across_timestamps():
+    # Inserted out of order, some sharing a second; stored in CURRENT_TIMESTAMP's format like the server default
+    offsets = [5, 1, 3, 3, 0, 4, 2, 3]
+    rows = [{"created_at": func.datetime("2026-01-01 08:00:00", f"+{offset} seconds")} for offset in offsets]
+
+    pages = asyncio.run(walk_history(rows, limit=3))
+
+    expected = [row_id for _, row_id in sorted(((offset, i + 1) for i, offset in enumerate(offsets)), reverse=True)]
+    assert [row_id for page in pages for row_id in page] == expected
+    assert [len(page) for page in pages] == [3, 3, 2]
+
+
+def test_last_page_has_no_cursor():
+    pages = asyncio.run(walk_history([{} for _ in range(3)], limit=3))
+
+    assert pages == [[3, 2, 1]]
@@ -0,0 +1,58 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.routes import profiles
+from app.config import settings
+from app.services.user_cache import UserPrincipal
+from app.utils.auth import get_current_user
+from app.utils.profiling import PROFILE_HEADER, PROFILE_ID_HEADER, ProfilerMiddleware, ProfileStore
+
+SECRET = "profiler-secret"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    store = ProfileStore()
+    monkeypatch.setattr(profiles, "profile_store", store)
+    monkeypatch.setattr(settings, "ADMIN_EMAILS", "admin@example.com")
+
+    app = FastAPI()
+    app.add_middleware(ProfilerMiddleware, store=store, secret=SECRET)
+    app.include_router(profiles.router, prefix="/api/profiles")
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    return TestClient(app)
+
+
+def profile_id(client: TestClient) -> str:
+    response = client.get("/ping", headers={PROFILE_HEADER: SECRET})
+    return response.headers[PROFILE_ID_HEADER]
+
+
+def signed_in(client: TestClient, email: str):
+    client.app.dependency_overrides[get_current_user] = lambda: UserPrincipal(id=1, email=email, is_active=True)
+
+
+def test_secret_alone_does_not_read_profiles(client):
+    profile = profile_id(client)
+
+    for path in ("/api/profiles", f"/api/profiles/{profile}", f"/api/profiles/{profile}.html"):
+        response = client.get(path, headers={PROFILE_HEADER: SECRET})
+        assert response.status_code in (401, 403), path
+        assert profile not in response.text
+
+
+def test_profiles_need_an_admin(client):
+    profile = profile_id(client)
+
+    signed_in(client, "user@example.com")
+    assert client.get(f"/api/profiles/{profile}").status_code == 403
+
+    signed_in(client, "admin@example.com")
+    response = client.get(f"/api/profiles/{profile}")
+    assert response.status_code == 200
+    assert response.json()["id"] == profile
@@ -82,7 +82,7 @@ export default function HistoryPage() {
                     <p className="text-sm font-semibold text-green-800 mb-2">
                       MediVoice Response:
                     </p>
-                    <p className="text-gray-800 whitespace-pre-wrap">{conversation.ai_response}</p>
+                    <p className="text-gray-800 whitespace-pre-wrap">{conversation.ai_response ?? conversation.ai_response_preview}</p>
                   </div>
 
                   {conversation.symptoms_extracted && conversation.symptoms_extracted.length > 0 && (